@@ -5,6 +5,9 @@ from .schools import router as schools_router
 from .students import router as students_router
 from .points import router as points_router
 from .settings import router as settings_router
+from .qualifiers import router as qualifiers_router
+from .printing import router as printing_router
+from .metrics import router as metrics_router
 from ..maintenance import router as maintenance_router
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -14,4 +17,7 @@ router.include_router(schools_router)
 router.include_router(students_router)
 router.include_router(points_router)
 router.include_router(settings_router)
+router.include_router(qualifiers_router)
+router.include_router(printing_router)
+router.include_router(metrics_router)
 router.include_router(maintenance_router)
@@ -3,22 +3,23 @@ from fastapi import APIRouter, Request, Depends
 from fastapi.responses import HTMLResponse
 from sqlalchemy.orm import Session
 
-from ..db import get_db, Points, Game, Round, Event, Area, School, Student
+from ..db import get_db, read_engine, pool_stats
+from ..db_async import uses_async_reads
+from ..stats import admin_stats
 
 router = APIRouter()
 
 @router.get("/", response_class=HTMLResponse)  # <-- must be "/"
 def admin_home(request: Request, db: Session = Depends(get_db)):
-    counts = {
-        "points": db.query(Points).count(),
-        "games": db.query(Game).count(),
-        "rounds": db.query(Round).count(),
-        "events": db.query(Event).count(),
-        "areas": db.query(Area).count(),
-        "schools": db.query(School).count(),
-        "students": db.query(Student).count(),
-    }
+    stats = admin_stats(db)  # one aggregate query, cached for a few seconds
     return request.app.state.templates.TemplateResponse(
         "admin_home.html",
-        {"request": request, "counts": counts},
+        {
+            "request": request, "counts": stats["counts"], "stats": stats,
+            "pool": pool_stats(), "read_pool": pool_stats(read_engine), "async_reads": uses_async_reads(),
+        },
     )
+
+@router.get("/stats")
+def admin_stats_json(db: Session = Depends(get_db)):
+    return admin_stats(db)
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import HTMLResponse, RedirectResponse
+
+from ..logger import WRITE_BEHIND, write_behind
+from ..sync import venue_service
+from ..metrics import route_summary, sql_totals, slow_queries, n_plus_one, reset_metrics, SLOW_QUERY_MS, N_PLUS_ONE_THRESHOLD
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=HTMLResponse)
+def metrics_page(request: Request):
+    return request.app.state.templates.TemplateResponse(
+        "admin_metrics.html",
+        {
+            "request": request, "routes": route_summary(), "sql": sql_totals(),
+            "slow": list(slow_queries), "n_plus_one": sorted(n_plus_one.values(), key=lambda r: -r["max_repeats"]),
+            "slow_ms": SLOW_QUERY_MS, "threshold": N_PLUS_ONE_THRESHOLD,
+            "queue": write_behind.stats() if WRITE_BEHIND else None,
+            "sync": venue_service().status.as_dict() if venue_service() else None,
+        },
+    )
+
+@router.get("/metrics/queue")
+def metrics_queue():
+    return write_behind.stats() if WRITE_BEHIND else {"running": False}
+
+@router.get("/metrics/sync")
+def metrics_sync():
+    service = venue_service()
+    return service.status.as_dict() if service else {"node": None}
+
+@router.post("/metrics/sync")
+def metrics_sync_now():
+    service = venue_service()
+    if service:
+        service.wake()
+    return RedirectResponse(url="/admin/metrics", status_code=303)
+
+@router.post("/metrics/reset")
+def metrics_reset():
+    reset_metrics()
+    return RedirectResponse(url="/admin/metrics", status_code=303)
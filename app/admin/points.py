@@ -1,12 +1,25 @@
-from fastapi import APIRouter, Request, Form, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Request, Form, Depends, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import select, insert, update, delete, bindparam
 
-from ..db import get_db, Points, Game, GamePoints
+from ..db import get_db, Points, GamePoints
+from ..refdata import refdata
+from ..rescore import rescore, rescore_preview
+from ..utils import invalidate_points_cache
 
 router = APIRouter()
 
+def override_matrix(db: Session) -> dict[int, dict[str, int]]:
+    """{GameID: {Code: Value}} for every per-game override, from one query."""
+    matrix: dict[int, dict[str, int]] = {}
+    for gid, code, value in db.execute(select(GamePoints.GameID, GamePoints.Code, GamePoints.Value)).all():
+        matrix.setdefault(gid, {})[code] = value
+    return matrix
+
 @router.get("/points", response_class=HTMLResponse)
 def points_page(
     request: Request,
@@ -16,17 +29,10 @@ def points_page(
     pts = db.query(Points).order_by(Points.SortOrder, Points.Code).all()
 
     # Games, ordered
-    games = db.query(Game).order_by(Game.GameName).all()
+    games = refdata(db).games_by_name()
 
     # Per-game overrides -> {game_id: {code: value}}
-    overrides: dict[int, dict[str, int]] = {}
-    for g in games:
-        rows = (
-            db.query(GamePoints)
-            .filter(GamePoints.GameID == g.GameID)
-            .all()
-        )
-        overrides[g.GameID] = {r.Code: r.Value for r in rows}
+    overrides = override_matrix(db)
 
     return request.app.state.templates.TemplateResponse(
         "admin_points.html", 
@@ -35,6 +41,7 @@ def points_page(
             "points": pts,
             "games": games,
             "overrides": overrides,
+            "rescored": request.query_params.get("rescored"),
         },
     )
 
@@ -59,6 +66,7 @@ def points_add(
             )
         )
         db.commit()
+        invalidate_points_cache()
     return RedirectResponse(url="/admin/points", status_code=303)
 
 @router.post("/points/override")
@@ -79,4 +87,71 @@ def points_override(
     else:
         db.add(GamePoints(GameID=int(GameID), Code=code, Value=int(Value)))
     db.commit()
+    invalidate_points_cache()
     return RedirectResponse(url="/admin/points", status_code=303)
+
+class OverrideCell(BaseModel):
+    GameID: int
+    Code: str
+    Value: Optional[int] = None     # None removes the override
+
+class OverrideMatrix(BaseModel):
+    cells: list[OverrideCell]
+
+@router.post("/points/matrix")
+def points_matrix(body: OverrideMatrix, db: Session = Depends(get_db)):
+    """Apply a batch of override cells in one transaction (one executemany per insert/update/delete)."""
+    games = refdata(db).games
+    codes = set(db.execute(select(Points.Code)).scalars())
+    bad = [f"{c.GameID}:{c.Code}" for c in body.cells if c.GameID not in games or c.Code not in codes]
+    if bad:
+        raise HTTPException(status_code=400, detail=f"Unknown game or code: {', '.join(bad)}")
+
+    current = override_matrix(db)
+    inserts, updates, deletes = [], [], []
+    for c in {(c.GameID, c.Code): c for c in body.cells}.values():   # last write per cell wins
+        have = current.get(c.GameID, {}).get(c.Code)
+        key = {"k_game": c.GameID, "k_code": c.Code}
+        if c.Value is None:
+            if have is not None:
+                deletes.append(key)
+        elif have is None:
+            inserts.append({"GameID": c.GameID, "Code": c.Code, "Value": c.Value})
+        elif have != c.Value:
+            updates.append({**key, "k_value": c.Value})
+
+    t = GamePoints.__table__
+    match = (t.c.GameID == bindparam("k_game")) & (t.c.Code == bindparam("k_code"))
+    if inserts:
+        db.execute(insert(t), inserts)
+    if updates:
+        db.execute(update(t).where(match).values(Value=bindparam("k_value")), updates)
+    if deletes:
+        db.execute(delete(t).where(match), deletes)
+    db.commit()
+    if inserts or updates or deletes:
+        invalidate_points_cache()
+    return {"inserted": len(inserts), "updated": len(updates), "deleted": len(deletes)}
+
+def _game_param(game_id: str) -> Optional[int]:
+    return int(game_id) if game_id.isdigit() else None
+
+@router.get("/points/rescore", response_class=HTMLResponse)
+def points_rescore_preview(request: Request, game_id: str = "", db: Session = Depends(get_db)):
+    """Dry run: which students would move if saved points were recomputed from the current values."""
+    gid = _game_param(game_id)
+    ref = refdata(db)
+    return request.app.state.templates.TemplateResponse(
+        "admin_points_rescore.html",
+        {
+            "request": request,
+            "preview": rescore_preview(db, gid),
+            "game": ref.games.get(gid) if gid else None,
+        },
+    )
+
+@router.post("/points/recalculate")
+def points_recalculate(game_id: str = Form(""), db: Session = Depends(get_db)):
+    """Recompute saved PointsAwarded from the current points (optionally one game) and rebuild the boards."""
+    n = rescore(db, _game_param(game_id))
+    return RedirectResponse(url=f"/admin/points?rescored={n}", status_code=303)
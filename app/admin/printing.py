@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
+from sqlalchemy.orm import Session
+
+from ..db import get_db
+from ..refdata import refdata
+from ..printing import render_one, zip_all, start_render_all, current_job
+from .schools import school_options
+
+router = APIRouter()
+
+# PDF rendering runs in the print process pool (app/printing.py); these routes only wait on it
+
+def _pdf(result) -> Response:
+    if result is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    doc, body = result
+    name = doc.filename.rsplit("/", 1)[-1]
+    return Response(body, media_type="application/pdf", headers={"Content-Disposition": f'inline; filename="{name}"'})
+
+@router.get("/print", response_class=HTMLResponse)
+def print_page(request: Request, db: Session = Depends(get_db)):
+    ref = refdata(db)
+    job = current_job()
+    return request.app.state.templates.TemplateResponse(
+        "print.html",
+        {
+            "request": request,
+            # every game has the same area names: label each with its game
+            "areas": sorted(
+                ({"AreaID": a.AreaID, "label": f"{ref.games[a.GameID].GameName}: {a.AreaName} ({a.Stream.value})"}
+                 for a in ref.areas.values()),
+                key=lambda a: a["label"],
+            ),
+            "schools": school_options(db),
+            "job": job.as_dict() if job else None,
+        },
+    )
+
+@router.get("/print/area.pdf")
+def print_area(area_id: int, game_id: int | None = None, db: Session = Depends(get_db)):
+    # the area determines the game; a game_id (old links) must agree with it
+    area = refdata(db).areas.get(area_id)
+    if area is None or (game_id is not None and area.GameID != game_id):
+        raise HTTPException(status_code=404, detail="Not found")
+    return _pdf(render_one(db, "area", area_id))
+
+@router.get("/print/school.pdf")
+def print_school(school_id: int, db: Session = Depends(get_db)):
+    return _pdf(render_one(db, "school", school_id))
+
+@router.post("/print/render_all")
+def print_render_all():
+    start_render_all()
+    return RedirectResponse(url="/admin/print", status_code=303)
+
+@router.get("/print/job")
+def print_job():
+    job = current_job()
+    return job.as_dict() if job else {"status": "idle"}
+
+@router.get("/print/all.zip")
+def print_zip(db: Session = Depends(get_db)):
+    return Response(zip_all(db), media_type="application/zip",
+                    headers={"Content-Disposition": 'attachment; filename="seqel-print.zip"'})
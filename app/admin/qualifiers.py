@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Request, Form, Depends, HTTPException
+from fastapi.responses import HTMLResponse, RedirectResponse
+from sqlalchemy.orm import Session
+
+from ..db import get_db
+from ..refdata import refdata
+from ..api import notify_results_changed
+from ..qualifiers import qualifier_seeds, generate_brackets, knockout_matches, record_knockout, PAIRINGS
+
+router = APIRouter()
+
+def _game_ids(db: Session, game_id: str | None) -> list[int] | None:
+    # blank or "all" means every game
+    if not game_id or game_id == "all":
+        return None
+    if not game_id.isdigit() or int(game_id) not in refdata(db).games:
+        raise HTTPException(status_code=404, detail="Unknown game")
+    return [int(game_id)]
+
+@router.get("/qualifiers", response_class=HTMLResponse)
+def qualifiers_page(request: Request, generated: int | None = None, error: str | None = None, db: Session = Depends(get_db)):
+    return request.app.state.templates.TemplateResponse(
+        "qualifiers.html",
+        {"request": request, "games": refdata(db).games_by_name(), "generated": generated, "sizes": sorted(PAIRINGS),
+         "knockouts": knockout_matches(db), "error": error},
+    )
+
+@router.get("/qualifiers/run", response_class=HTMLResponse)
+def qualifiers_run(request: Request, game_id: str | None = None, size: int = 4, db: Session = Depends(get_db)):
+    size = size if size in PAIRINGS else 4
+    seeds = qualifier_seeds(db, _game_ids(db, game_id), top=size)
+    games = refdata(db).games
+    results = [(games[gid], rows) for gid, rows in sorted(seeds.items(), key=lambda kv: games[kv[0]].GameName)]
+    return request.app.state.templates.TemplateResponse(
+        "qualifiers_result.html",
+        {"request": request, "results": results, "game_id": game_id or "all", "size": size},
+    )
+
+@router.post("/qualifiers/generate")
+def qualifiers_generate(game_id: str = Form("all"), size: int = Form(4), db: Session = Depends(get_db)):
+    size = size if size in PAIRINGS else 4
+    created = generate_brackets(db, qualifier_seeds(db, _game_ids(db, game_id), top=size), size=size)
+    return RedirectResponse(url=f"/admin/qualifiers?generated={sum(created.values())}", status_code=303)
+
+@router.post("/qualifiers/result")
+def qualifiers_result(match_id: int = Form(...), winner_uid: int = Form(...), db: Session = Depends(get_db)):
+    try:
+        record_knockout(db, match_id, winner_uid)
+    except ValueError as e:
+        return RedirectResponse(url=f"/admin/qualifiers?error={e}", status_code=303)
+    notify_results_changed()
+    return RedirectResponse(url="/admin/qualifiers", status_code=303)
@@ -3,9 +3,27 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlalchemy.orm import Session
 
 from ..db import get_db, School
+from ..sync import require_central_master
+from ..uids import reserve_uid
 
 router = APIRouter()
 
+# (SchoolID, SchoolName) list for dropdowns; dropped whenever schools are added
+_school_options: list[dict] | None = None
+
+def school_options(db: Session) -> list[dict]:
+    global _school_options
+    if _school_options is None:
+        _school_options = [
+            {"SchoolID": sid, "SchoolName": name}
+            for sid, name in db.query(School.SchoolID, School.SchoolName).order_by(School.SchoolName)
+        ]
+    return _school_options
+
+def invalidate_school_options() -> None:
+    global _school_options
+    _school_options = None
+
 @router.get("/schools", response_class=HTMLResponse)
 def schools_page(
     request: Request,
@@ -17,18 +35,7 @@ def schools_page(
         {"request": request, "schools": rows},
     )
 
-def _allocate_school_uid4(db: Session) -> int:
-    """
-    Return an available 4-digit UID in [1000..9999], avoiding 1000..1999
-    (reserve that low block for other uses). Guarantees uniqueness.
-    """
-    taken = {uid for (uid,) in db.query(School.UID4).all() if uid is not None}
-    for candidate in range(2000, 10000):  # start at 2000 to avoid the low block
-        if candidate not in taken:
-            return candidate
-    raise RuntimeError("No available UID4 values for schools")
-
-@router.post("/schools/add")
+@router.post("/schools/add", dependencies=[Depends(require_central_master)])
 def schools_add(
     SchoolName: str = Form(...),
     db: Session = Depends(get_db),
@@ -39,8 +46,8 @@ def schools_add(
 
     exists = db.query(School).filter(School.SchoolName == name).one_or_none()
     if not exists:
-        uid4 = _allocate_school_uid4(db)
-        db.add(School(SchoolName=name, UID4=uid4))
+        db.add(School(SchoolName=name, SchoolUID4=reserve_uid(db, "Schools")))
         db.commit()
+        invalidate_school_options()
 
     return RedirectResponse(url="/admin/schools", status_code=303)
@@ -3,6 +3,7 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlalchemy.orm import Session
 
 from ..db import get_db, Setting
+from ..refdata import invalidate_refdata
 
 router = APIRouter()
 
@@ -51,4 +52,5 @@ def settings_save(
     set_setting(db, "PIN_Logger", PIN_Logger.strip())
     set_setting(db, "PIN_Admin", PIN_Admin.strip())
     set_setting(db, "DRONE_TIMELAP_BONUS", DRONE_TIMELAP_BONUS.strip())
+    invalidate_refdata()
     return RedirectResponse(url="/admin/settings", status_code=303)
@@ -3,37 +3,38 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from ..db import get_db, Student, School
-from ..utils import allocate_uid4
+from ..sync import require_central_master
+from ..search import search_students
+from ..uids import reserve_uid
+from .schools import school_options
 
 router = APIRouter()
 
+PAGE_SIZE = 100
+
 @router.get("/students", response_class=HTMLResponse)
 def students_page(
     request: Request,
     q: str | None = None,
+    after: int | None = None,
     db: Session = Depends(get_db),
 ):
-    # base query (join so we can filter by school name)
-    query = db.query(Student).join(School)
-
-    if q:
-        qlike = f"%{q.strip()}%"
-        # NOTE: .ilike is supported by most dialects; on SQLite LIKE is already case-insensitive
-        query = query.filter(
-            (Student.FirstName.ilike(qlike)) |
-            (Student.LastName.ilike(qlike))  |
-            (School.SchoolName.ilike(qlike))
-        )
-
-    rows = query.order_by(Student.UID4).all()
-    schools = db.query(School).order_by(School.SchoolName).all()
+    # one keyset page by UID4, schools eager-loaded (see app/search.py)
+    rows, next_after = search_students(db, q, after=after, limit=PAGE_SIZE)
 
     return request.app.state.templates.TemplateResponse(
         "admin_students.html",
-        {"request": request, "students": rows, "schools": schools, "q": q or ""}
+        {
+            "request": request,
+            "students": rows,
+            "schools": school_options(db),
+            "q": q or "",
+            "after": after,
+            "next_after": next_after,
+        }
     )
 
-@router.post("/students/add")
+@router.post("/students/add", dependencies=[Depends(require_central_master)])
 def students_add(
     FirstName: str = Form(...),
     LastName: str  = Form(...),
@@ -47,10 +48,10 @@ def students_add(
     if not school:
         return RedirectResponse(url="/admin/students", status_code=303)
 
-    # allocate a unique 4-digit UID, avoiding 1000..1999 if you reserve those
-    taken = {s.UID4 for s in db.query(Student.UID4).all() if s.UID4 is not None}
-    uid4 = allocate_uid4(db, taken, avoid_range=(1000, 2000))
-    if uid4 is None:
+    # allocate a unique 4-digit UID outside the 1000..1999 guest window
+    try:
+        uid4 = reserve_uid(db, "Students")
+    except RuntimeError:
         # pool exhausted; redirect back gracefully
         return RedirectResponse(url="/admin/students?q=UID+pool+exhausted", status_code=303)
 
@@ -60,7 +61,6 @@ def students_add(
         LastName=LastName.strip(),
         SchoolID=int(SchoolID),
         Cohort=Cohort.strip(),
-        YearLevel=(YearLevel.strip() if YearLevel else None),
     )
     db.add(st)
     db.commit()
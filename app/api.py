@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import StreamingResponse, Response
+from sqlalchemy.orm import Session
+
+from .cache import api_cache
+from .stats import invalidate_stats
+from .db_async import read_db
+from .hub import Hub
+from .leaderboard import parse_stream
+from .totals import top_students, top_schools, schools_cup_average
+
+router = APIRouter(prefix="/api", tags=["api"])
+
+BOARDS = ("top30", "overall", "schools_cup_avg")
+
+
+def board_key(board: str, game_id: int | None = None, stream: str | None = None) -> str | None:
+    """Canonical hub key for a board + filters, or None for an unknown board."""
+    if board not in BOARDS:
+        return None
+    if board != "top30":
+        return board
+    s = parse_stream(stream)
+    return f"top30:{int(game_id or 0)}:{s.value if s else ''}"
+
+
+def board_rows(db: Session, key: str) -> list[dict]:
+    """Rows for one board key."""
+    if key == "overall":
+        return top_schools(db)
+    if key == "schools_cup_avg":
+        return schools_cup_average(db)
+    _, game_id, stream = key.split(":")
+    rows = top_students(db, game_id=int(game_id) or None, stream=stream or None, limit=30)
+    return [{"uid": r["uid"], "school": r["school"], "points": r["pts"]} for r in rows]
+
+
+async def compute_board(key: str) -> list[dict]:
+    return await read_db(board_rows, key)
+
+
+board_hub = Hub(compute_board)
+
+
+def notify_results_changed() -> None:
+    """Call after committing results: drops cached API responses and admin stats, and wakes the live boards."""
+    api_cache.clear()
+    invalidate_stats()
+    board_hub.publish()
+
+
+async def _cached_json(request: Request, key: str) -> Response:
+    hit = api_cache.get(key)
+    if hit is None:
+        generation = api_cache.generation
+        hit = api_cache.put(key, json.dumps(await compute_board(key)).encode(), generation)
+    body, etag = hit
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    inm = request.headers.get("if-none-match", "")
+    if etag in (t.strip() for t in inm.split(",")) or inm.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@router.get("/top30")
+async def api_top30(request: Request, game_id: int | None = None, stream: str | None = None):
+    return await _cached_json(request, board_key("top30", game_id, stream))
+
+
+@router.get("/overall")
+async def api_overall(request: Request):
+    return await _cached_json(request, "overall")
+
+
+@router.get("/schools_cup_avg")
+async def api_schools_cup_avg(request: Request):
+    return await _cached_json(request, "schools_cup_avg")
+
+
+HEARTBEAT_SECONDS = 15
+
+
+@router.get("/stream")
+async def board_stream(request: Request, board: str = "top30", game_id: int | None = None, stream: str | None = None):
+    """Server-Sent Events: a full snapshot on connect, then only changed rows after each commit."""
+    key = board_key(board, game_id, stream)
+    if key is None:
+        raise HTTPException(status_code=404, detail="Unknown board")
+    q = await board_hub.subscribe(key)
+
+    async def events():
+        try:
+            while True:
+                try:
+                    msg = await asyncio.wait_for(q.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                yield f"data: {json.dumps(msg)}\n\n"
+        finally:
+            board_hub.unsubscribe(key, q)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,300 @@
+"""
+Event-day load benchmark.
+
+    python -m app.bench [--schools 40] [--students 2000] [--matches-per-area 1]
+                        [--submitters 18] [--pollers 30] [--requests 50]
+                        [--out bench-results.json] [--compare previous.json]
+
+Run from the repository root. Unless --db-url is given the benchmark works on
+a fresh SQLite file in a temp directory, never on the database in .env.
+
+1. Master data comes from `seed.seed_all`; schools and students are generated
+   (UIDs reserved through app/uids.py) and every area gets
+   --matches-per-area matches per round, written with `logger.record_batch`
+   so totals, finals and idempotency keys look like a real event.
+2. The ASGI app is driven in-process with httpx: --submitters workers post
+   /logger/submit while --pollers workers poll the boards, --requests each.
+   Per route: p50/p95/p99/mean/max latency, errors and throughput.
+3. Each route is then replayed serially to count SQL statements per request
+   (concurrent requests would mix their counts).
+
+Results are written as JSON; --compare prints the p95 and statement deltas
+against an earlier run.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+SUBMIT = "POST /logger/submit"
+POLLS = ("GET /api/top30", "GET /api/overall", "GET /api/schools_cup_avg", "GET /boards/students")
+
+FIRST_NAMES = ["Ava", "Liam", "Mia", "Noah", "Zoe", "Jack", "Ella", "Leo", "Ruby", "Oscar", "Isla", "Max"]
+LAST_NAMES = ["Nguyen", "Smith", "Brown", "Wilson", "Taylor", "Lee", "Walker", "Hall", "Young", "King", "Wright"]
+
+
+# ---- synthetic tournament
+
+def generate_tournament(
+    db, schools: int = 40, students: int = 2000, matches_per_area: int = 1, seed: int = 1,
+) -> dict[str, int]:
+    """Add generated schools, students and matches on top of seeded master data. Returns row counts."""
+    from sqlalchemy import insert
+    from .db import School, Student
+    from .logger import MatchIn, record_batch, BATCH_MAX
+    from .refdata import refdata
+    from .uids import reserve_uids
+    from .admin.schools import invalidate_school_options
+
+    rnd = random.Random(seed)
+    school_uids = reserve_uids(db, "Schools", schools)
+    school_ids = db.execute(
+        insert(School).returning(School.SchoolID, sort_by_parameter_order=True),
+        [{"SchoolName": f"Bench School {uid}", "SchoolUID4": uid} for uid in school_uids],
+    ).scalars().all()
+    uids = reserve_uids(db, "Students", students)
+    db.execute(insert(Student), [
+        {"UID4": uid, "FirstName": rnd.choice(FIRST_NAMES), "LastName": rnd.choice(LAST_NAMES),
+         "SchoolID": school_ids[i % len(school_ids)], "Cohort": rnd.choice(("High", "Primary"))}
+        for i, uid in enumerate(uids)
+    ])
+    db.commit()
+    invalidate_school_options()
+
+    ref = refdata(db)
+    items = []
+    for r in ref.rounds:
+        for (game_id, stream), _ in ref.events.items():
+            for area in ref.areas_for(game_id, stream):
+                for _ in range(matches_per_area):
+                    items.append(MatchIn(key=f"bench-{len(items)}", RoundID=r.RoundID, AreaID=area.AreaID,
+                                         **random_entry(rnd, ref.games[game_id], stream, uids)))
+    for i in range(0, len(items), BATCH_MAX):
+        record_batch(db, items[i:i + BATCH_MAX])
+    return {"schools": schools, "students": students, "matches": len(items)}
+
+
+def random_entry(rnd: random.Random, game, stream: str, uids: list[int]) -> dict[str, Any]:
+    """Logger fields for one plausible match of `game` (WIN_LOSE, else TOP4)."""
+    entry: dict[str, Any] = {"GameID": game.GameID, "Stream": stream}
+    if game.ScoringMode.value == "WIN_LOSE":
+        a, b = rnd.sample(uids, 2)
+        entry.update(Mode="WIN_LOSE", UID1=a, UID2=b, WinnerUID=rnd.choice((a, b)))
+        if game.GameName.lower().startswith("velocity"):
+            entry["FinalsMetricValue"] = round(rnd.uniform(30, 90), 2)
+    else:
+        entry.update(Mode="TOP4", **{f"Place{i}": uid for i, uid in enumerate(rnd.sample(uids, 4), 1)})
+    return entry
+
+
+# ---- load
+
+def _percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    k = max(0, min(len(values) - 1, math.ceil(p / 100 * len(values)) - 1))
+    return values[k]
+
+
+def summarize(samples: dict[str, list[tuple[float, bool]]], wall_s: float) -> dict[str, dict]:
+    out = {}
+    for route, items in sorted(samples.items()):
+        ms = sorted(t for t, _ in items)
+        out[route] = {
+            "count": len(ms),
+            "errors": sum(1 for _, ok in items if not ok),
+            "p50_ms": round(_percentile(ms, 50), 2),
+            "p95_ms": round(_percentile(ms, 95), 2),
+            "p99_ms": round(_percentile(ms, 99), 2),
+            "mean_ms": round(sum(ms) / len(ms), 2) if ms else 0.0,
+            "max_ms": round(ms[-1], 2) if ms else 0.0,
+            "rps": round(len(ms) / wall_s, 1) if wall_s else 0.0,
+        }
+    return out
+
+
+def _request_factory(db, uids: list[int], seed: int) -> Callable[[str], tuple[str, str, dict]]:
+    """route label -> (method, url, httpx kwargs) for a random request of that route."""
+    from .refdata import refdata
+
+    ref = refdata(db)
+    rnd = random.Random(seed)
+    slots = [(g, s, a.AreaID) for (g, s) in ref.events for a in ref.areas_for(g, s)]
+    rounds = [r.RoundID for r in ref.rounds]
+
+    def make(route: str) -> tuple[str, str, dict]:
+        if route == SUBMIT:
+            game_id, stream, area_id = rnd.choice(slots)
+            form = random_entry(rnd, ref.games[game_id], stream, uids)
+            form.update(RoundID=rnd.choice(rounds), AreaID=area_id)
+            return "POST", "/logger/submit", {"data": form}
+        game_id, stream, _ = rnd.choice(slots)
+        params = {"game_id": game_id, "stream": stream} if rnd.random() < 0.5 else {}
+        method, path = route.split(" ", 1)
+        return method, path, {"params": params if path in ("/api/top30", "/boards/students") else {}}
+    return make
+
+
+async def _worker(client, routes: tuple[str, ...], n: int, make, samples: dict) -> None:
+    for i in range(n):
+        route = routes[i % len(routes)]
+        method, url, kw = make(route)
+        started = time.perf_counter()
+        try:
+            r = await client.request(method, url, **kw)
+            ok = r.status_code < 400 and "error=" not in r.headers.get("location", "")
+        except Exception:   # counted, the run goes on
+            ok = False
+        samples.setdefault(route, []).append(((time.perf_counter() - started) * 1000, ok))
+
+
+async def run_load(app, make, submitters: int = 18, pollers: int = 30, requests: int = 50) -> dict:
+    """Concurrent phase: latency and throughput per route."""
+    import httpx
+
+    samples: dict[str, list[tuple[float, bool]]] = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", follow_redirects=False) as client:
+        started = time.perf_counter()
+        await asyncio.gather(
+            *[_worker(client, (SUBMIT,), requests, make, samples) for _ in range(submitters)],
+            *[_worker(client, POLLS[i % len(POLLS):] + POLLS[:i % len(POLLS)], requests, make, samples)
+              for i in range(pollers)],
+        )
+        wall = time.perf_counter() - started
+    routes = summarize(samples, wall)
+    total = sum(r["count"] for r in routes.values())
+    return {"wall_s": round(wall, 3), "rps": round(total / wall, 1) if wall else 0.0, "routes": routes}
+
+
+async def count_statements(app, make, per_route: int = 10) -> dict[str, float]:
+    """Serial phase: average SQL statements per request for each route."""
+    import httpx
+    from sqlalchemy import event
+    from .db import engine, read_engine
+    from .db_async import async_engine
+
+    engines = {engine, read_engine} | ({async_engine.sync_engine} if async_engine is not None else set())
+    seen = [0]
+
+    def record(*_args) -> None:
+        seen[0] += 1
+    for e in engines:
+        event.listen(e, "before_cursor_execute", record)
+    out = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", follow_redirects=False) as client:
+            for route in (SUBMIT, *POLLS):
+                seen[0] = 0
+                for _ in range(per_route):
+                    method, url, kw = make(route)
+                    await client.request(method, url, **kw)
+                out[route] = round(seen[0] / per_route, 2)
+    finally:
+        for e in engines:
+            event.remove(e, "before_cursor_execute", record)
+    return out
+
+
+# ---- results
+
+def _git_version() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old: dict, new: dict) -> list[str]:
+    """One line per route: p95 and SQL statements, old -> new."""
+    lines = []
+    for route, cur in new["load"]["routes"].items():
+        prev = old.get("load", {}).get("routes", {}).get(route)
+        if prev is None:
+            continue
+        sql_old, sql_new = old.get("sql_per_request", {}).get(route), new["sql_per_request"].get(route)
+        lines.append(f"{route:<28} p95 {prev['p95_ms']:>8.1f} -> {cur['p95_ms']:>8.1f} ms   "
+                     f"sql {sql_old} -> {sql_new}")
+    return lines
+
+
+def run(args: argparse.Namespace) -> dict:
+    from sqlalchemy import select
+    from .main import app, startup
+    from .db import SessionLocal, Student
+
+    startup()
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        scale = generate_tournament(db, args.schools, args.students, args.matches_per_area, args.seed)
+        generate_s = time.perf_counter() - started
+        uids = list(db.execute(select(Student.UID4)).scalars())
+        make = _request_factory(db, uids, args.seed)
+    finally:
+        db.close()
+
+    load = asyncio.run(run_load(app, make, args.submitters, args.pollers, args.requests))
+    sql = asyncio.run(count_statements(app, make, args.sql_samples))
+    return {
+        "version": _git_version(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "database": os.environ["DATABASE_URL"].split("://", 1)[0],
+        "scale": {**scale, "submitters": args.submitters, "pollers": args.pollers, "requests": args.requests},
+        "generate_s": round(generate_s, 3),
+        "load": load,
+        "sql_per_request": sql,
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m app.bench", description="SEQEL event-day load benchmark")
+    p.add_argument("--db-url", help="database to build the tournament in (default: a fresh temp SQLite file)")
+    p.add_argument("--schools", type=int, default=40)
+    p.add_argument("--students", type=int, default=2000)
+    p.add_argument("--matches-per-area", type=int, default=1, help="matches per area per round")
+    p.add_argument("--submitters", type=int, default=18, help="concurrent logger workers (one per area)")
+    p.add_argument("--pollers", type=int, default=30, help="concurrent board screens")
+    p.add_argument("--requests", type=int, default=50, help="requests per worker")
+    p.add_argument("--sql-samples", type=int, default=10, help="serial requests per route for statement counts")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--out", default="bench-results.json")
+    p.add_argument("--compare", help="earlier results JSON to diff against")
+    args = p.parse_args(argv)
+
+    # app.db reads these at import; .env must not win over them
+    os.environ["DATABASE_URL"] = args.db_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="seqel-bench-"), "bench.db")
+    os.environ["READ_DATABASE_URL"] = ""
+    os.environ["ASYNC_DATABASE_URL"] = ""
+
+    result = run(args)
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print(f"{result['scale']['matches']} matches generated in {result['generate_s']} s; "
+          f"load {result['load']['wall_s']} s at {result['load']['rps']} req/s")
+    for route, r in result["load"]["routes"].items():
+        print(f"{route:<28} n={r['count']:<5} err={r['errors']:<3} p50 {r['p50_ms']:>7.1f}  p95 {r['p95_ms']:>7.1f}  "
+              f"p99 {r['p99_ms']:>7.1f} ms  {r['rps']:>7.1f}/s  sql {result['sql_per_request'].get(route)}")
+    if args.compare:
+        with open(args.compare) as f:
+            print("\n".join(["", f"vs {args.compare}:"] + compare(json.load(f), result)))
+    print(f"wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,35 +1,30 @@
 from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func
-from .db import get_db, MatchParticipant, Student, School, Event, Game, StreamEnum
+from .refdata import refdata
+from .db_async import read_db
+from .leaderboard import parse_stream
+from .totals import top_students
 
 router = APIRouter()
 
-@router.get("/boards/students", response_class=HTMLResponse)
-def board_students(request: Request, game_id: int | None = None, stream: str | None = None):
-    db: Session = next(get_db())
-
-    q = (
-        select(MatchParticipant.UID4, func.sum(MatchParticipant.PointsAwarded))
-        .group_by(MatchParticipant.UID4)
-        .order_by(func.sum(MatchParticipant.PointsAwarded).desc())
-    )
+# Board routes are async and read through app.db_async, off the logger's write path
 
-    if game_id or stream:
-        q = q.join(Event, Event.EventID==MatchParticipant.MatchID, isouter=True)  # join via Match -> Event
-        # easier: join chain explicitly
-    # Simpler approach: compute totals all, filter later in code if needed — keeping this board global as requested.
+def _games(db: Session) -> list[dict]:
+    return [{"GameID": g.GameID, "GameName": g.GameName} for g in refdata(db).games_by_name()]
 
-    rows = db.execute(q).all()
-    # Build list with school
-    out = []
-    for uid, pts in rows[:30]:
-        sch = db.execute(
-            select(School.SchoolName)
-            .join(Student, Student.SchoolID==School.SchoolID)
-            .where(Student.UID4==uid)
-        ).scalar_one_or_none()
-        out.append({"uid": uid, "school": sch or "", "pts": int(pts or 0)})
+@router.get("/boards/students", response_class=HTMLResponse)
+async def board_students(request: Request, game_id: int | None = None, stream: str | None = None):
+    # Served from the materialized totals (see app/totals.py), one row per scope/student
+    out = await read_db(top_students, game_id, parse_stream(stream), 30)
 
     return request.app.state.templates.TemplateResponse("board_students.html", {"request": request, "rows": out})
+
+@router.get("/boards", response_class=HTMLResponse)
+async def boards_page(request: Request):
+    return request.app.state.templates.TemplateResponse("boards.html", {"request": request})
+
+@router.get("/boards/top30", response_class=HTMLResponse)
+async def top30_page(request: Request):
+    games = await read_db(_games)
+    return request.app.state.templates.TemplateResponse("top30.html", {"request": request, "games": games})
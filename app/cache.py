@@ -0,0 +1,51 @@
+"""
+Small process-wide response cache for the JSON APIs.
+
+Entries keep the serialized body and a content-hash ETag. They expire after a
+short TTL and are dropped outright by `clear()` when results change, so
+pollers see new data immediately and identical data keeps the same ETag.
+A body computed before a `clear()` is served once but not stored.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from typing import Optional, Tuple
+
+
+class TTLCache:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items: dict[str, Tuple[float, bytes, str]] = {}
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        """Read before computing a body; pass it to `put`."""
+        return self._generation
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """(body, etag) if cached and fresh, else None."""
+        with self._lock:
+            hit = self._items.get(key)
+        if hit and hit[0] > time.monotonic():
+            return hit[1], hit[2]
+        return None
+
+    def put(self, key: str, body: bytes, generation: Optional[int] = None) -> Tuple[bytes, str]:
+        etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        with self._lock:
+            if generation is None or generation == self._generation:   # a clear() landed meanwhile: don't keep
+                self._items[key] = (time.monotonic() + self.ttl, body, etag)
+        return body, etag
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._items.clear()
+
+
+api_cache = TTLCache(ttl=float(os.getenv("API_CACHE_TTL", "2")))
@@ -1,27 +1,96 @@
 from __future__ import annotations
-import os, random
+import os
+import threading
+import time as _time
 from enum import Enum
 from typing import Optional
-from datetime import time, datetime
+from datetime import time, datetime, date, timedelta, timezone
 from sqlalchemy import (
-    create_engine, String, Integer, Boolean, ForeignKey,
-    Enum as SAEnum, Time, DateTime, Text, func, UniqueConstraint, event
+    create_engine, String, Integer, BigInteger, Boolean, ForeignKey,
+    Enum as SAEnum, Time, DateTime, Text, func, UniqueConstraint, Index, event
 )
 from sqlalchemy.orm import (
     DeclarativeBase, Mapped, mapped_column, relationship, sessionmaker, Session
 )
+from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./seqel.db")
 
-connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower().startswith(("y", "t", "1"))
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait for a free connection."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wait_lock = threading.Lock()
+        self.wait_count = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+
+    def _do_get(self):
+        started = _time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            ms = (_time.perf_counter() - started) * 1000
+            with self._wait_lock:
+                self.wait_count += 1
+                self.wait_total_ms += ms
+                self.wait_max_ms = max(self.wait_max_ms, ms)
+
+def _engine_kwargs(url: str, prefix: str = "DB") -> dict:
+    kwargs = {
+        "poolclass": TimedQueuePool,
+        "pool_size": int(os.getenv(f"{prefix}_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": _env_flag("DB_POOL_PRE_PING", "Yes"),
+    }
+    if url.startswith("sqlite"):
+        kwargs["connect_args"] = {"check_same_thread": False}
+    elif "+pyodbc" in url:
+        # one round trip per executemany batch instead of one per row
+        kwargs["fast_executemany"] = _env_flag("DB_FAST_EXECUTEMANY", "Yes")
+    return kwargs
+
+# Pool tuning (see .env.example)
+engine = create_engine(DATABASE_URL, **_engine_kwargs(DATABASE_URL))
+
+# SQLite: WAL lets the read engine below run alongside a writer instead of waiting on it
+if DATABASE_URL.startswith("sqlite") and _env_flag("SQLITE_WAL", "Yes"):
+    @event.listens_for(engine, "connect")
+    def _sqlite_wal(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.close()
+
+# Read-only engine for boards and dashboards. READ_DATABASE_URL can point at a replica
+# or snapshot; on SQL Server, DB_READ_ISOLATION=SNAPSHOT reads row versions instead of
+# taking shared locks (needs ALLOW_SNAPSHOT_ISOLATION ON for the database).
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL") or DATABASE_URL
+DB_READ_ISOLATION = os.getenv("DB_READ_ISOLATION") or None
+
+def sqlite_read_only(dbapi_conn, _record):
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA query_only=ON")
+    cur.close()
+
+read_engine = create_engine(
+    READ_DATABASE_URL,
+    **_engine_kwargs(READ_DATABASE_URL, prefix="DB_READ"),
+    **({"isolation_level": DB_READ_ISOLATION} if DB_READ_ISOLATION else {}),
+)
+if READ_DATABASE_URL.startswith("sqlite"):
+    event.listen(read_engine, "connect", sqlite_read_only)
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args, pool_pre_ping=True)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False)
 
 class Base(DeclarativeBase):
     pass
@@ -101,6 +170,7 @@ class Event(Base):
     EventID: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     GameID: Mapped[int] = mapped_column(ForeignKey("Games.GameID"))
     Stream: Mapped[StreamEnum] = mapped_column(SAEnum(StreamEnum))
+    __table_args__ = (Index("ix_events_game_stream", "GameID", "Stream"),)
 
 class Area(Base):
     __tablename__ = "Areas"
@@ -121,6 +191,8 @@ class Match(Base):
     Cancelled: Mapped[bool] = mapped_column(Boolean, default=False)
     CancelReason: Mapped[Optional[str]] = mapped_column(String(120), nullable=True)
     CreatedAt: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    # AUTOINCREMENT on SQLite (new databases): MatchIDs are not reused after a reset
+    __table_args__ = (Index("ix_matches_event_round", "EventID", "RoundID"), {"sqlite_autoincrement": True})
 
 class MatchParticipant(Base):
     __tablename__ = "MatchParticipants"
@@ -131,7 +203,56 @@ class MatchParticipant(Base):
     Outcome: Mapped[Optional[str]] = mapped_column(String(40), nullable=True)  # "Win","Lose","1st",...
     PointsAwarded: Mapped[int] = mapped_column(Integer, default=0)
     MetricValueMs: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # for time/score in finals/groups
-    UniqueConstraint("MatchID","UID4")
+    # not unique: a Velocity winner gets both "Win" and "TimeLap" rows in one match
+    __table_args__ = (Index("ix_mp_match_uid", "MatchID", "UID4"),)
+
+# Archived results (maintenance reset with archive=on); plain copies, no foreign keys
+class MatchHistory(Base):
+    __tablename__ = "MatchesHistory"
+    MatchID: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    EventID: Mapped[int] = mapped_column(Integer)
+    AreaID: Mapped[int] = mapped_column(Integer)
+    RoundID: Mapped[int] = mapped_column(Integer)
+    Stage: Mapped[Optional[str]] = mapped_column(String(30), nullable=True)
+    Cancelled: Mapped[bool] = mapped_column(Boolean, default=False)
+    CancelReason: Mapped[Optional[str]] = mapped_column(String(120), nullable=True)
+    CreatedAt: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    ArchivedAt: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+class MatchParticipantHistory(Base):
+    __tablename__ = "MatchParticipantsHistory"
+    MPID: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    MatchID: Mapped[int] = mapped_column(Integer, index=True)
+    UID4: Mapped[int] = mapped_column(Integer)
+    Slot: Mapped[int] = mapped_column(Integer)
+    Outcome: Mapped[Optional[str]] = mapped_column(String(40), nullable=True)
+    PointsAwarded: Mapped[int] = mapped_column(Integer, default=0)
+    MetricValueMs: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    ArchivedAt: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+# Idempotency keys for batched logger submissions (client-generated, one per match)
+class SubmissionKey(Base):
+    __tablename__ = "SubmissionKeys"
+    Key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    MatchID: Mapped[int] = mapped_column(ForeignKey("Matches.MatchID"))
+    CreatedAt: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+# Venue sync bookkeeping: what the central box holds for each pushed match, by its SubmissionKey
+class SyncSent(Base):
+    __tablename__ = "SyncSent"
+    Key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    Cancelled: Mapped[bool] = mapped_column(Boolean, default=False)
+    CancelReason: Mapped[Optional[str]] = mapped_column(String(120), nullable=True)
+    Error: Mapped[Optional[str]] = mapped_column(String(200), nullable=True)   # refused centrally: not resent
+
+# Finals evaluator bookkeeping: what each event's finals entries looked like when last ranked
+class FinalsRun(Base):
+    __tablename__ = "FinalsRuns"
+    EventID: Mapped[int] = mapped_column(ForeignKey("Events.EventID"), primary_key=True)
+    Entries: Mapped[int] = mapped_column(Integer, default=0)
+    MetricSum: Mapped[int] = mapped_column(BigInteger, default=0)
+    LastMPID: Mapped[int] = mapped_column(Integer, default=0)
+    EvaluatedAt: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
 
 # Settings
 class Setting(Base):
@@ -139,38 +260,102 @@ class Setting(Base):
     Key: Mapped[str] = mapped_column(String(80), primary_key=True)
     Value: Mapped[str] = mapped_column(String(400))
 
-# --- Helpers: auto 4-digit IDs for Schools and Students
-def _next_uid4(session: Session, table, column) -> int:
-    used = {row[0] for row in session.query(column).all()}
-    # keep 1000..2000 “guest window” unused for students, as requested; we still avoid collisions for both tables
-    for candidate in range(3000, 10000):
-        if candidate not in used:
-            return candidate
-    # last resort try rest of the pool
-    for candidate in range(1000, 3000):
-        if candidate not in used:
-            return candidate
-    raise RuntimeError("UID pool exhausted")
+# Materialized leaderboard totals (maintained by app.totals)
+ALL_GAMES = 0          # GameID used for the "every game" rollup
+ALL_STREAMS = "All"    # Stream used for the "both streams" rollup
+
+class StudentTotal(Base):
+    __tablename__ = "StudentTotals"
+    UID4: Mapped[int] = mapped_column(Integer, primary_key=True)
+    GameID: Mapped[int] = mapped_column(Integer, primary_key=True)
+    Stream: Mapped[str] = mapped_column(String(20), primary_key=True)
+    SchoolID: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    Points: Mapped[int] = mapped_column(Integer, default=0)
+    __table_args__ = (Index("ix_studenttotals_rank", "GameID", "Stream", "Points"),)
+
+class SchoolTotal(Base):
+    __tablename__ = "SchoolTotals"
+    SchoolID: Mapped[int] = mapped_column(Integer, primary_key=True)
+    GameID: Mapped[int] = mapped_column(Integer, primary_key=True)
+    Stream: Mapped[str] = mapped_column(String(20), primary_key=True)
+    Points: Mapped[int] = mapped_column(Integer, default=0)
+    Students: Mapped[int] = mapped_column(Integer, default=0)  # unique students behind Points
+    __table_args__ = (Index("ix_schooltotals_rank", "GameID", "Stream", "Points"),)
+
+# UID4 allocation state (maintained by app.uids)
+class UIDPool(Base):
+    __tablename__ = "UIDPools"
+    Pool: Mapped[str] = mapped_column(String(40), primary_key=True)  # "Students", "Students:guest", "Schools"
+    NextUID: Mapped[int] = mapped_column(Integer)                    # high-water mark: next never-issued UID
+
+class UIDFree(Base):
+    __tablename__ = "UIDFree"
+    Pool: Mapped[str] = mapped_column(String(40), primary_key=True)
+    UID: Mapped[int] = mapped_column(Integer, primary_key=True)      # released or gap UIDs below NextUID
 
+# --- Helpers: auto 4-digit IDs for Schools and Students
 @event.listens_for(School, "before_insert")
 def school_uid_before_insert(mapper, connection, target):
     if target.SchoolUID4 is None:
-        with Session(bind=connection) as s:
-            target.SchoolUID4 = _next_uid4(s, School, School.SchoolUID4)
+        from .uids import reserve_uid
+        target.SchoolUID4 = reserve_uid(connection, "Schools")
 
 @event.listens_for(Student, "before_insert")
 def student_uid_before_insert(mapper, connection, target):
     if target.UID4 is None:
-        with Session(bind=connection) as s:
-            target.UID4 = _next_uid4(s, Student, Student.UID4)
+        from .uids import reserve_uid
+        target.UID4 = reserve_uid(connection, "Students")
+
+# --- Match.CreatedAt clock
+# CreatedAt is filled by the server default: CURRENT_TIMESTAMP (UTC) on SQLite,
+# GETDATE() (the server's local time) on SQL Server. Convert before comparing.
+def db_clock_is_utc(db) -> bool:
+    return db.bind.dialect.name == "sqlite"
+
+def local_to_db_clock(db, value: datetime) -> datetime:
+    """A naive local time on this database's CreatedAt clock."""
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if db_clock_is_utc(db) else value
+
+def db_clock_to_utc(db, value: datetime) -> datetime:
+    return value if db_clock_is_utc(db) else value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def utc_to_db_clock(db, value: datetime) -> datetime:
+    return value if db_clock_is_utc(db) else value.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+
+def server_now(db) -> datetime:
+    return local_to_db_clock(db, datetime.now())
+
+def day_window(db, day: date) -> tuple[datetime, datetime]:
+    """[start, end) of a local calendar day on the CreatedAt clock."""
+    start = datetime.combine(day, time.min)
+    return local_to_db_clock(db, start), local_to_db_clock(db, start + timedelta(days=1))
 
 # --- DB init and dependency
 def init_db():
     Base.metadata.create_all(bind=engine)
+    # create_all skips indexes on tables that already exist; add any new ones
+    for table in Base.metadata.sorted_tables:
+        for ix in table.indexes:
+            ix.create(bind=engine, checkfirst=True)
 
 def get_db():
+    """Request-scoped session: use as `db: Session = Depends(get_db)` so it is always closed."""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+def pool_stats(eng=None) -> dict:
+    pool = (eng or engine).pool
+    stats = {"status": pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update(size=pool.size(), checked_out=pool.checkedout(), overflow=max(pool.overflow(), 0),
+                     idle=pool.checkedin(), timeout=pool.timeout())
+    if isinstance(pool, TimedQueuePool):
+        stats.update(
+            checkouts=pool.wait_count,
+            wait_avg_ms=round(pool.wait_total_ms / pool.wait_count, 2) if pool.wait_count else 0.0,
+            wait_max_ms=round(pool.wait_max_ms, 2),
+        )
+    return stats
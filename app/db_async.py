@@ -0,0 +1,111 @@
+"""
+Concurrency split between dashboard reads and logger writes.
+
+Reads (boards, /api/*) go through `read_db` against the read-only
+database (READ_DATABASE_URL / db.read_engine): on an async engine
+(aiosqlite for SQLite, aioodbc for SQL Server) when its driver is
+installed and DB_ASYNC is not "No", otherwise on Starlette's threadpool.
+Logger writes go through `run_write` on their own small thread pool, so a
+burst of screen refreshes can never queue ahead of score entry.
+
+Both take plain sync functions `fn(db: Session, *args)`, so query code is
+shared with the rest of the app.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from sqlalchemy.pool import NullPool
+from starlette.concurrency import run_in_threadpool
+
+from sqlalchemy import event
+
+from .db import READ_DATABASE_URL, DB_READ_ISOLATION, SessionLocal, ReadSessionLocal, _env_flag, sqlite_read_only
+
+
+def _async_url(url: str) -> Optional[str]:
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith("mssql+pyodbc:"):
+        return "mssql+aioodbc:" + url[len("mssql+pyodbc:"):]
+    return None
+
+
+def _make_async_engine():
+    if not _env_flag("DB_ASYNC", "Yes"):
+        return None
+    url = os.getenv("ASYNC_DATABASE_URL") or _async_url(READ_DATABASE_URL)
+    if not url:
+        return None
+    iso = {"isolation_level": DB_READ_ISOLATION} if DB_READ_ISOLATION else {}
+    try:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        if url.startswith("sqlite"):
+            import aiosqlite  # noqa: F401
+            # aiosqlite connections are cheap and must not be shared across event loops
+            eng = create_async_engine(url, poolclass=NullPool, **iso)
+            event.listen(eng.sync_engine, "connect", sqlite_read_only)
+            return eng
+        import aioodbc  # noqa: F401
+        return create_async_engine(
+            url,
+            pool_size=int(os.getenv("DB_ASYNC_POOL_SIZE", "10")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+            pool_pre_ping=_env_flag("DB_POOL_PRE_PING", "Yes"),
+            **iso,
+        )
+    except ImportError:
+        return None
+
+
+async_engine = _make_async_engine()
+
+if async_engine is not None:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+else:
+    AsyncSessionLocal = None
+
+
+def _with_session(fn: Callable[..., Any], *args, factory=SessionLocal) -> Any:
+    db = factory()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+def _with_read_session(fn: Callable[..., Any], *args) -> Any:
+    return _with_session(fn, *args, factory=ReadSessionLocal)
+
+
+async def read_db(fn: Callable[..., Any], *args) -> Any:
+    """Run `fn(db, *args)` for a read-only request without holding a threadpool slot when possible."""
+    if AsyncSessionLocal is None:
+        return await run_in_threadpool(_with_read_session, fn, *args)
+    async with AsyncSessionLocal() as adb:
+        return await adb.run_sync(fn, *args)
+
+
+write_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LOGGER_WRITE_WORKERS", "4")),
+    thread_name_prefix="logger-write",
+)
+
+
+async def run_write(fn: Callable[..., Any], *args) -> Any:
+    """Run `fn(db, *args)` on the logger write pool with its own session."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()   # request-scoped state (app/metrics.py) follows the write
+    return await loop.run_in_executor(write_executor, partial(ctx.run, _with_session, fn, *args))
+
+
+def uses_async_reads() -> bool:
+    return AsyncSessionLocal is not None
+
@@ -0,0 +1,198 @@
+"""
+Finals evaluation for FINALS-mode entries.
+
+The logger stores each finals attempt as a Match with Stage="Finals" and
+one participant carrying MetricValueMs and no points. `evaluate_finals`
+ranks every event's entries by its game's FinalsMetric (each student's
+best attempt counts once) and writes the 1st-4th outcome codes and their
+points from the points catalogue with one set-based UPDATE.
+
+It is incremental: FinalsRuns keeps each event's entry count, a metric
+checksum (sum of MPID x MetricValueMs, so an edit that keeps the plain sum
+such as two swapped times still changes it) and highest MPID as of the
+last run, and only events whose signature has changed are re-ranked. Point changes are pushed into the totals in the
+same transaction.
+
+    python -m app.finals          # evaluate changed events
+    python -m app.finals --all    # re-rank every event
+"""
+from __future__ import annotations
+
+import sys
+from typing import Iterable, Optional
+
+from sqlalchemy import select, update, func, case, and_, literal, insert, bindparam, cast, BigInteger
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal, MatchParticipant, Match, Event, Game, Points, GamePoints, FinalsRun, FinalsMetric
+from .totals import apply_points
+
+FINALS_STAGE = "Finals"
+PLACE_CODES = ("1st", "2nd", "3rd", "4th")
+
+
+def _finals_entries():
+    return (
+        select(MatchParticipant.MPID)
+        .join(Match, Match.MatchID == MatchParticipant.MatchID)
+        .where(Match.Stage == FINALS_STAGE, Match.Cancelled == False)  # noqa: E712
+    )
+
+
+def _signatures(db: Session, event_ids: Optional[Iterable[int]] = None) -> dict[int, tuple[int, int, int]]:
+    """{EventID: (entries, metric checksum, last MPID)} for every event with finals entries."""
+    checksum = func.sum(cast(MatchParticipant.MetricValueMs, BigInteger) * MatchParticipant.MPID)
+    q = (
+        select(Match.EventID, func.count(), func.coalesce(checksum, 0), func.max(MatchParticipant.MPID))
+        .join(Match, Match.MatchID == MatchParticipant.MatchID)
+        .where(Match.Stage == FINALS_STAGE, Match.Cancelled == False)  # noqa: E712
+        .group_by(Match.EventID)
+    )
+    if event_ids is not None:
+        q = q.where(Match.EventID.in_(list(event_ids)))
+    return {eid: (int(n), int(s), int(m)) for eid, n, s, m in db.execute(q).all()}
+
+
+def changed_events(db: Session, event_ids: Optional[Iterable[int]] = None) -> dict[int, tuple[int, int, int]]:
+    """Signatures of the events whose finals entries changed since the last run."""
+    now = _signatures(db, event_ids)
+    if not now:
+        return {}
+    last = {
+        eid: (n, s, m)
+        for eid, n, s, m in db.execute(
+            select(FinalsRun.EventID, FinalsRun.Entries, FinalsRun.MetricSum, FinalsRun.LastMPID)
+            .where(FinalsRun.EventID.in_(list(now)))
+        ).all()
+    }
+    return {eid: sig for eid, sig in now.items() if last.get(eid) != sig}
+
+
+def _placings(event_ids: list[int]):
+    """Subquery (MPID, code, points) for the top four students of each event."""
+    lower = Game.FinalsMetric == FinalsMetric.LowerIsBetter
+    score = case((lower, MatchParticipant.MetricValueMs), else_=-MatchParticipant.MetricValueMs)
+    attempts = (
+        select(
+            MatchParticipant.MPID,
+            Match.EventID,
+            Event.GameID,
+            score.label("score"),
+            func.row_number().over(
+                partition_by=(Match.EventID, MatchParticipant.UID4), order_by=(score, MatchParticipant.MPID)
+            ).label("attempt"),
+        )
+        .join(Match, Match.MatchID == MatchParticipant.MatchID)
+        .join(Event, Event.EventID == Match.EventID)
+        .join(Game, Game.GameID == Event.GameID)
+        .where(
+            Match.Stage == FINALS_STAGE,
+            Match.Cancelled == False,  # noqa: E712
+            Match.EventID.in_(event_ids),
+            MatchParticipant.MetricValueMs.isnot(None),
+            Game.FinalsMetric.isnot(None),
+        )
+        .subquery()
+    )
+    ranked = (
+        select(
+            attempts.c.MPID,
+            attempts.c.GameID,
+            func.row_number().over(partition_by=attempts.c.EventID, order_by=(attempts.c.score, attempts.c.MPID)).label("place"),
+        )
+        .where(attempts.c.attempt == 1)
+        .subquery()
+    )
+    code = case(*[(ranked.c.place == i + 1, literal(c)) for i, c in enumerate(PLACE_CODES)])
+    return (
+        select(
+            ranked.c.MPID,
+            code.label("code"),
+            func.coalesce(GamePoints.Value, Points.Value, 0).label("points"),
+        )
+        .join(Points, Points.Code == code, isouter=True)
+        .join(GamePoints, and_(GamePoints.GameID == ranked.c.GameID, GamePoints.Code == code), isouter=True)
+        .where(ranked.c.place <= len(PLACE_CODES))
+        .subquery()
+    )
+
+
+def _points_by_entry(db: Session, event_ids: list[int]) -> dict[int, tuple[int, int, int, str]]:
+    rows = db.execute(
+        select(MatchParticipant.MPID, MatchParticipant.UID4, MatchParticipant.PointsAwarded, Event.GameID, Event.Stream)
+        .join(Match, Match.MatchID == MatchParticipant.MatchID)
+        .join(Event, Event.EventID == Match.EventID)
+        .where(Match.Stage == FINALS_STAGE, Match.EventID.in_(event_ids))
+    ).all()
+    return {mpid: (uid, int(pts or 0), gid, stream) for mpid, uid, pts, gid, stream in rows}
+
+
+def evaluate_finals(db: Session, event_ids: Optional[Iterable[int]] = None, force: bool = False) -> int:
+    """
+    Re-rank finals for changed events (or all of `event_ids` with force=True).
+    Returns the number of events evaluated. Does not commit.
+    """
+    dirty = _signatures(db, event_ids) if force else changed_events(db, event_ids)
+    if not dirty:
+        return 0
+    ids = list(dirty)
+
+    before = _points_by_entry(db, ids)
+
+    # clear previous placings, then write the new ones in one UPDATE ... FROM
+    entries = _finals_entries().where(Match.EventID.in_(ids))
+    db.execute(
+        update(MatchParticipant)
+        .where(MatchParticipant.MPID.in_(entries))
+        .values(Outcome=None, PointsAwarded=0)
+        .execution_options(synchronize_session=False)
+    )
+    placed = _placings(ids)
+    db.execute(
+        update(MatchParticipant)
+        .where(MatchParticipant.MPID == placed.c.MPID)
+        .values(Outcome=placed.c.code, PointsAwarded=placed.c.points)
+        .execution_options(synchronize_session=False)
+    )
+
+    after = _points_by_entry(db, ids)
+    deltas: dict[tuple[int, str], list[tuple[int, int]]] = {}
+    for mpid, (uid, pts, gid, stream) in after.items():
+        delta = pts - before.get(mpid, (uid, 0))[1]
+        if delta:
+            deltas.setdefault((gid, stream), []).append((uid, delta))
+    for (gid, stream), awards in deltas.items():
+        apply_points(db, gid, stream, awards)
+
+    # record signatures so unchanged events are skipped next time
+    have = set(db.execute(select(FinalsRun.EventID).where(FinalsRun.EventID.in_(ids))).scalars())
+    fresh = [{"EventID": e, "Entries": n, "MetricSum": sm, "LastMPID": m} for e, (n, sm, m) in dirty.items() if e not in have]
+    if fresh:
+        db.execute(insert(FinalsRun), fresh)
+    bumps = [{"k_event": e, "k_n": n, "k_sum": sm, "k_last": m} for e, (n, sm, m) in dirty.items() if e in have]
+    if bumps:
+        t = FinalsRun.__table__
+        db.execute(
+            update(t).where(t.c.EventID == bindparam("k_event"))
+            .values(Entries=bindparam("k_n"), MetricSum=bindparam("k_sum"), LastMPID=bindparam("k_last")),
+            bumps,
+        )
+    return len(ids)
+
+
+def main(argv: list[str]) -> int:
+    db = SessionLocal()
+    try:
+        n = evaluate_finals(db, force="--all" in argv)
+        db.commit()
+        if n:
+            from .api import notify_results_changed
+            notify_results_changed()
+        print(f"evaluated finals for {n} event(s)")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,123 @@
+"""
+In-process pub/sub for live boards.
+
+Writers call `publish()` after they commit (from any thread). The hub wakes
+once, coalesces bursts, recomputes each board that has at least one
+subscriber and pushes only the rows that changed to every subscriber's
+queue. No subscribers or no writes means no work at all.
+
+Messages are dicts: {"board": key, "size": n, "changed": [[index, row], ...]}.
+The first message after subscribing carries every row.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+log = logging.getLogger("uvicorn.error")
+
+
+def diff_rows(old: list, new: list) -> Optional[list]:
+    """[[index, row], ...] for rows that differ, or None if nothing changed."""
+    changed = [[i, row] for i, row in enumerate(new) if i >= len(old) or old[i] != row]
+    if not changed and len(old) == len(new):
+        return None
+    return changed
+
+
+class Hub:
+    def __init__(self, compute: Callable[[str], Any], debounce: float = 0.25, queue_size: int = 16):
+        self.compute = compute          # sync (run in the threadpool) or async
+        self.debounce = debounce
+        self.queue_size = queue_size
+        self._subs: dict[str, set[asyncio.Queue]] = {}
+        self._last: dict[str, list] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._dirty: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # --- writers
+    def publish(self) -> None:
+        """Mark boards stale. Safe to call from worker threads; a no-op when nobody listens."""
+        loop = self._loop
+        if loop is None or not self._subs or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._dirty.set)
+
+    # --- readers
+    async def subscribe(self, key: str) -> asyncio.Queue:
+        self._ensure_running()
+        q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subs.setdefault(key, set()).add(q)
+        rows = self._last.get(key)
+        if rows is None:
+            try:
+                rows = await self._compute(key)
+            except BaseException:
+                self.unsubscribe(key, q)   # the caller never gets the queue: don't keep pushing to it
+                raise
+            self._last[key] = rows
+        q.put_nowait(self._message(key, rows, [[i, r] for i, r in enumerate(rows)]))
+        return q
+
+    def unsubscribe(self, key: str, q: asyncio.Queue) -> None:
+        subs = self._subs.get(key)
+        if subs is None:
+            return
+        subs.discard(q)
+        if not subs:
+            del self._subs[key]
+            self._last.pop(key, None)
+
+    def subscriber_count(self) -> int:
+        return sum(len(s) for s in self._subs.values())
+
+    # --- internals
+    async def _compute(self, key: str) -> list:
+        if asyncio.iscoroutinefunction(self.compute):
+            return await self.compute(key)
+        return await run_in_threadpool(self.compute, key)
+
+    @staticmethod
+    def _message(key: str, rows: list, changed: list) -> dict:
+        return {"board": key, "size": len(rows), "changed": changed}
+
+    def _ensure_running(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._dirty = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await self._dirty.wait()
+            await asyncio.sleep(self.debounce)  # let a round-changeover burst settle
+            self._dirty.clear()
+            for key in list(self._subs):
+                try:
+                    rows = await self._compute(key)
+                except Exception:   # e.g. the database is briefly unavailable: try again on the next publish
+                    log.exception("hub: recomputing %s failed", key)
+                    continue
+                changed = diff_rows(self._last.get(key, []), rows)
+                if key not in self._subs:
+                    continue
+                self._last[key] = rows
+                if changed is None:
+                    continue
+                msg = self._message(key, rows, changed)
+                for q in list(self._subs[key]):
+                    self._offer(q, key, rows, msg)
+
+    def _offer(self, q: asyncio.Queue, key: str, rows: list, msg: dict) -> None:
+        try:
+            q.put_nowait(msg)
+        except asyncio.QueueFull:
+            # slow screen: drop its backlog and resync it with a full snapshot
+            while not q.empty():
+                q.get_nowait()
+            q.put_nowait(self._message(key, rows, [[i, r] for i, r in enumerate(rows)]))
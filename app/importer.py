@@ -0,0 +1,148 @@
+"""
+Streaming roster import (students CSV).
+
+Rows are parsed in chunks of `batch_size`. Per chunk the schools are
+resolved with one IN query, missing schools and all new students get
+their UIDs from one batch reservation each, and rows are written with a
+single executemany per table, then committed. Memory and transaction size
+stay bounded regardless of file size.
+
+With dry_run=True nothing is written; the report says what would happen.
+"""
+from __future__ import annotations
+
+import csv
+import time
+from dataclasses import dataclass, field
+from io import TextIOWrapper
+from typing import BinaryIO, Iterator
+
+from sqlalchemy import select, insert, func
+from sqlalchemy.orm import Session
+
+from .db import School, Student
+from .uids import reserve_uids
+
+
+@dataclass
+class ImportReport:
+    dry_run: bool = False
+    rows: int = 0
+    created_schools: int = 0
+    created_students: int = 0
+    skipped: int = 0          # incomplete rows
+    duplicates: int = 0       # already registered, or repeated in the file
+    timings_ms: dict[str, float] = field(default_factory=dict)
+
+    def _add_time(self, phase: str, started: float) -> None:
+        self.timings_ms[phase] = self.timings_ms.get(phase, 0.0) + (time.perf_counter() - started) * 1000
+
+
+def _chunks(reader: csv.DictReader, cell, size: int, report: ImportReport) -> Iterator[list[tuple[str, str, str, str]]]:
+    chunk: list[tuple[str, str, str, str]] = []
+    started = time.perf_counter()
+    for row in reader:
+        report.rows += 1
+        first = cell(row, "first_name")
+        last = cell(row, "last_name")
+        school_name = cell(row, "school")
+        cohort = cell(row, "cohort") or cell(row, "cohurt")
+        if not (first and last and school_name and cohort):
+            report.skipped += 1
+            continue
+        # normalize cohort label a bit
+        chunk.append((first, last, school_name, cohort.title()))
+        if len(chunk) >= size:
+            report._add_time("parse", started)
+            yield chunk
+            chunk = []
+            started = time.perf_counter()
+    report._add_time("parse", started)
+    if chunk:
+        yield chunk
+
+
+def import_roster(db: Session, fileobj: BinaryIO, dry_run: bool = False, batch_size: int = 500) -> ImportReport:
+    report = ImportReport(dry_run=dry_run)
+
+    # Read CSV (tolerate UTF-8 BOM); the wrapper streams, it does not load the file
+    reader = csv.DictReader(TextIOWrapper(fileobj, encoding="utf-8-sig"))
+    # Map case-insensitive headers
+    header_map = {(h or "").lower(): (h or "") for h in (reader.fieldnames or [])}
+
+    def cell(row, key):
+        return (row.get(header_map.get(key.lower(), key)) or "").strip()
+
+    # school names are matched case-insensitively on both sides, the same way
+    # duplicates are detected (SQL Server's default collation already does)
+    school_ids: dict[str, int | None] = {}      # lower-cased name -> SchoolID (None: would be created in a dry run)
+    seen: set[tuple[str, str, str]] = set()      # (first, last, school) lower-cased, registered or in file
+
+    def lookup(names: list[str]) -> dict[str, int]:
+        out: dict[str, int] = {}
+        for name, sid in db.execute(
+            select(School.SchoolName, School.SchoolID)
+            .where(func.lower(School.SchoolName).in_(names)).order_by(School.SchoolID)
+        ).all():
+            out.setdefault(name.lower(), sid)
+        return out
+
+    for chunk in _chunks(reader, cell, batch_size, report):
+        # ---- resolve schools (one IN query for names not seen yet)
+        started = time.perf_counter()
+        spelling: dict[str, str] = {}            # lower-cased name -> first spelling in the chunk
+        for _, _, name, _ in chunk:
+            spelling.setdefault(name.lower(), name)
+        unknown = sorted(set(spelling) - set(school_ids))
+        if unknown:
+            found = lookup(unknown)
+            school_ids.update(found)
+            if found:
+                for f, l, name in db.execute(
+                    select(Student.FirstName, Student.LastName, School.SchoolName)
+                    .join(School, School.SchoolID == Student.SchoolID)
+                    .where(School.SchoolID.in_(list(found.values())))
+                ).all():
+                    seen.add((f.lower(), l.lower(), name.lower()))
+            missing = [n for n in unknown if n not in found]
+        else:
+            missing = []
+        report._add_time("resolve", started)
+
+        fresh = []
+        for first, last, name, cohort in chunk:
+            key = (first.lower(), last.lower(), name.lower())
+            if key in seen:
+                report.duplicates += 1
+                continue
+            seen.add(key)
+            fresh.append((first, last, name, cohort))
+        report.created_schools += len(missing)
+        report.created_students += len(fresh)
+
+        if dry_run:
+            school_ids.update({n: None for n in missing})
+            continue
+
+        # ---- reserve UIDs in bulk
+        started = time.perf_counter()
+        school_uids = reserve_uids(db, "Schools", len(missing))
+        student_uids = reserve_uids(db, "Students", len(fresh))
+        report._add_time("allocate", started)
+
+        # ---- write in one executemany per table, then commit the batch
+        started = time.perf_counter()
+        if missing:
+            db.execute(insert(School), [{"SchoolName": spelling[n], "SchoolUID4": u} for n, u in zip(missing, school_uids)])
+            school_ids.update(lookup(missing))
+        if fresh:
+            db.execute(insert(Student), [
+                {"UID4": uid, "FirstName": first, "LastName": last, "SchoolID": school_ids[name.lower()], "Cohort": cohort}
+                for (first, last, name, cohort), uid in zip(fresh, student_uids)
+            ])
+        db.commit()
+        report._add_time("write", started)
+
+    if dry_run:
+        db.rollback()
+    return report
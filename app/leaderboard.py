@@ -0,0 +1,56 @@
+"""
+Leaderboard queries over the raw results tables.
+
+These are the authoritative rankings; boards normally read the materialized
+copy in app.totals, and `app.totals check` compares the two.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from .db import MatchParticipant, Match, Event, Game, Student, School, StreamEnum
+
+
+def parse_stream(stream: Optional[str]) -> Optional[StreamEnum]:
+    """Map a query-string stream to StreamEnum; blank or unknown means both streams."""
+    if not stream:
+        return None
+    try:
+        return StreamEnum(stream)
+    except ValueError:
+        return None
+
+
+def student_ranking(
+    db: Session,
+    game_id: Optional[int] = None,
+    stream: Optional[StreamEnum] = None,
+    limit: int = 30,
+) -> list[dict]:
+    """
+    Top `limit` students by points, optionally for one game and/or stream.
+    A single statement: MatchParticipant -> Match -> Event -> Game for the
+    filter, Student -> School for the label, ranked and limited in SQL.
+    Served by ix_events_game_stream, ix_matches_event_round and ix_mp_match_uid.
+    """
+    pts = func.sum(MatchParticipant.PointsAwarded)
+    q = (
+        select(MatchParticipant.UID4, School.SchoolName, pts.label("pts"))
+        .join(Match, Match.MatchID == MatchParticipant.MatchID)
+        .join(Event, Event.EventID == Match.EventID)
+        .join(Game, Game.GameID == Event.GameID)
+        .join(Student, Student.UID4 == MatchParticipant.UID4, isouter=True)
+        .join(School, School.SchoolID == Student.SchoolID, isouter=True)
+        .group_by(MatchParticipant.UID4, School.SchoolName)
+        .order_by(pts.desc(), MatchParticipant.UID4)
+        .limit(limit)
+    )
+    if game_id:
+        q = q.where(Event.GameID == int(game_id))
+    if stream is not None:
+        q = q.where(Event.Stream == stream)
+
+    return [{"uid": uid, "school": name or "", "pts": int(p or 0)} for uid, name, p in db.execute(q).all()]
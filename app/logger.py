@@ -1,25 +1,56 @@
-from fastapi import APIRouter, Request, Form
+import logging
+import os
+from uuid import uuid4
+
+from fastapi import APIRouter, Request, Form, Depends, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse
+from typing import Optional
+from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from .db import get_db, Game, Round, Event, Area, Match, MatchParticipant, StreamEnum, ScoringMode, FinalsMetric, Setting
-from .utils import points_lookup
+from sqlalchemy import select, insert
+from sqlalchemy.exc import IntegrityError
+from .db import get_db, SessionLocal, Match, MatchParticipant, StreamEnum, SubmissionKey, _env_flag
+from .refdata import refdata, RefData, GameRef
+from .utils import points_for_game
+from .totals import apply_points, apply_points_many
+from .finals import evaluate_finals, FINALS_STAGE
+from .api import notify_results_changed
+from .db_async import run_write, read_db
+from .search import search_students
+from .writebehind import WriteBehindQueue
 
 router = APIRouter()
 
-def get_setting(db: Session, key: str, default: str = "") -> str:
-    s = db.get(Setting, key)
-    return s.Value if s else default
-
 @router.get("/logger", response_class=HTMLResponse)
-def logger_page(request: Request):
-    db: Session = next(get_db())
-    games = db.query(Game).order_by(Game.GameName).all()
-    rounds = db.query(Round).order_by(Round.StartTime).all()
+def logger_page(request: Request, db: Session = Depends(get_db)):
+    ref = refdata(db)  # no queries once loaded
+    games = ref.games_by_name()
+    rounds = ref.rounds
     return request.app.state.templates.TemplateResponse("logger.html", {"request": request, "games": games, "rounds": rounds, "StreamEnum": StreamEnum})
 
+def _typeahead(db: Session, q: str, limit: int) -> list[dict]:
+    rows, _ = search_students(db, q, limit=limit)
+    return [
+        {"uid": st.UID4, "name": f"{st.FirstName} {st.LastName}", "school": st.school.SchoolName if st.school else ""}
+        for st in rows
+    ]
+
+@router.get("/logger/typeahead")
+async def logger_typeahead(q: str = "", limit: int = 10):
+    """Students matching a UID prefix or name prefix, for resolving UIDs as they are typed."""
+    if not q.strip():
+        return []
+    return await read_db(_typeahead, q, max(1, min(limit, 25)))
+
+@router.get("/lookup/{uid}")
+async def lookup_uid(uid: int):
+    rows = await read_db(_typeahead, str(uid), 1) if 1000 <= uid <= 9999 else []
+    if not rows or rows[0]["uid"] != uid:
+        raise HTTPException(status_code=404, detail="Unknown UID")
+    return rows[0]
+
 @router.post("/logger/submit")
-def logger_submit(
+async def logger_submit(
     GameID: int = Form(...),
     Stream: str = Form(...),
     RoundID: int = Form(...),
@@ -37,49 +68,282 @@ def logger_submit(
     FinalsUID: int = Form(None),
     FinalsMetricValue: float = Form(None),  # seconds or score
 ):
-    db: Session = next(get_db())
+    if WRITE_BEHIND:
+        item = MatchIn(
+            key=uuid4().hex, GameID=GameID, Stream=Stream, RoundID=RoundID, AreaID=AreaID, Mode=Mode,
+            UID1=UID1, UID2=UID2, WinnerUID=WinnerUID, Place1=Place1, Place2=Place2, Place3=Place3, Place4=Place4,
+            FinalsUID=FinalsUID, FinalsMetricValue=FinalsMetricValue,
+        )
+        error = await run_write(accept_match, item)
+        if error:
+            return RedirectResponse(f"/logger?error={error}", status_code=303)
+        return RedirectResponse(url=f"/logger?ok=1&next_round={RoundID}", status_code=303)
+    # Writes run on the dedicated logger pool (app/db_async.py), never behind dashboard reads
+    return await run_write(
+        record_match, GameID, Stream, RoundID, AreaID, Mode,
+        UID1, UID2, WinnerUID, Place1, Place2, Place3, Place4, FinalsUID, FinalsMetricValue,
+    )
 
-    # Create Match
-    ev = db.execute(select(Event).where(Event.GameID==GameID, Event.Stream==StreamEnum(Stream))).scalar_one()
-    m = Match(EventID=ev.EventID, AreaID=AreaID, RoundID=RoundID, Stage="Group")
-    db.add(m); db.flush()
-
-    g = db.get(Game, GameID)
+def _ms(value: float | None) -> int | None:
+    return int(value * 1000) if value is not None else None
 
-    def award(uid: int, code: str, metric_ms: int | None = None):
-        pts = points_lookup(db, GameID, code) or 0
-        db.add(MatchParticipant(MatchID=m.MatchID, UID4=uid, Slot=0, Outcome=code, PointsAwarded=pts, MetricValueMs=metric_ms))
+def match_participants(
+    Mode: str, points: dict[str, int], timelap: bool,
+    UID1, UID2, WinnerUID, Place1, Place2, Place3, Place4, FinalsUID, FinalsMetricValue,
+) -> list[dict]:
+    """
+    MatchParticipant rows (without MatchID) for one logged match.
+    Raises ValueError with a short code when the entry is inconsistent.
+    `timelap`: Velocity group race with DRONE_TIMELAP_BONUS on.
+    """
+    def award(uid: int, code: str, metric_ms: int | None = None) -> dict:
+        return {"UID4": uid, "Slot": 0, "Outcome": code, "PointsAwarded": points.get(code) or 0, "MetricValueMs": metric_ms}
 
     if Mode == "WIN_LOSE":
-        if WinnerUID not in (UID1, UID2):
-            return RedirectResponse("/logger?error=WinnerMismatch", status_code=303)
+        if not UID1 or not UID2:
+            raise ValueError("MissingPlayer")
+        if UID1 == UID2:
+            raise ValueError("SamePlayer")
+        if WinnerUID is None or WinnerUID not in (UID1, UID2):
+            raise ValueError("WinnerMismatch")
         loser = UID2 if WinnerUID == UID1 else UID1
-        award(WinnerUID, "Win")
-        award(loser, "Lose")
-
-        # Drone TimeLap bonus in groups
-        drone_bonus = get_setting(db, "DRONE_TIMELAP_BONUS", "Yes")
-        if g.GameName.lower().startswith("velocity") and drone_bonus.lower().startswith("y"):
-            # If time was typed into FinalsMetricValue for this group race, treat as lap ms and add TimeLap
-            if FinalsMetricValue is not None:
-                ms = int(FinalsMetricValue * 1000)
-                # we only store metric on winner’s entry for reference
-                award(WinnerUID, "TimeLap", metric_ms=ms)
-
-    elif Mode == "TOP4":
+        rows = [award(WinnerUID, "Win"), award(loser, "Lose")]
+        # Drone TimeLap bonus in groups: a typed time is the winner's lap, stored on their entry for reference
+        if timelap and FinalsMetricValue is not None:
+            rows.append(award(WinnerUID, "TimeLap", metric_ms=_ms(FinalsMetricValue)))
+        return rows
+
+    if Mode == "TOP4":
         order = [Place1, Place2, Place3, Place4]
         codes = ["1st","2nd","3rd","4th"]
-        for uid, code in zip(order, codes):
-            if uid:
-                award(uid, code)
+        rows = [award(uid, code) for uid, code in zip(order, codes) if uid]
+        if not rows:
+            raise ValueError("NoPlacings")
+        return rows
 
-    elif Mode == "FINALS":
+    if Mode == "FINALS":
         # One player with a numeric metric; who wins is decided later by comparing metrics
-        ms = None
-        if FinalsMetricValue is not None:
-            ms = int(FinalsMetricValue * 1000)
-        # We store metric only; points will be added by awarding a “FinalsEntry” or mapped codes after evaluation
-        db.add(MatchParticipant(MatchID=m.MatchID, UID4=FinalsUID, Slot=1, Outcome=None, PointsAwarded=0, MetricValueMs=ms))
+        if not FinalsUID:
+            raise ValueError("NoFinalsUID")
+        return [{"UID4": FinalsUID, "Slot": 1, "Outcome": None, "PointsAwarded": 0, "MetricValueMs": _ms(FinalsMetricValue)}]
+
+    raise ValueError("UnknownMode")
+
+def _stage(Mode: str) -> str:
+    return FINALS_STAGE if Mode == "FINALS" else "Group"
 
+def check_area(ref: RefData, GameID: int, Stream: str, AreaID: int) -> None:
+    """ValueError("UnknownArea") unless the area exists and belongs to this game and stream."""
+    if all(a.AreaID != AreaID for a in ref.areas_for(GameID, Stream)):
+        raise ValueError("UnknownArea")
+
+def _timelap_bonus(ref: RefData, game: GameRef) -> bool:
+    return game.GameName.lower().startswith("velocity") and ref.flag("DRONE_TIMELAP_BONUS", "Yes")
+
+def record_match(
+    db: Session, GameID: int, Stream: str, RoundID: int, AreaID: int, Mode: str,
+    UID1, UID2, WinnerUID, Place1, Place2, Place3, Place4, FinalsUID, FinalsMetricValue,
+):
+    # reference data and points are cached; in steady state a submit only writes
+    ref = refdata(db)
+    event_id = ref.event_id(GameID, Stream)
+    if event_id is None:
+        return RedirectResponse("/logger?error=UnknownEvent", status_code=303)
+    points = points_for_game(db, GameID)
+    try:
+        check_area(ref, GameID, Stream, AreaID)
+        rows = match_participants(
+            Mode, points, Mode == "WIN_LOSE" and _timelap_bonus(ref, ref.games[GameID]),
+            UID1, UID2, WinnerUID, Place1, Place2, Place3, Place4, FinalsUID, FinalsMetricValue,
+        )
+    except ValueError as e:
+        return RedirectResponse(f"/logger?error={e}", status_code=303)
+
+    m = Match(EventID=event_id, AreaID=AreaID, RoundID=RoundID, Stage=_stage(Mode))
+    db.add(m); db.flush()
+    db.execute(insert(MatchParticipant), [{"MatchID": m.MatchID, **r} for r in rows])
+
+    # Keep leaderboard totals in the same transaction as the results
+    apply_points(db, GameID, Stream, [(r["UID4"], r["PointsAwarded"]) for r in rows])
+    if Mode == "FINALS":
+        evaluate_finals(db, [event_id])
     db.commit()
+    notify_results_changed()
     return RedirectResponse(url=f"/logger?ok=1&next_round={RoundID}", status_code=303)
+
+
+# ---- batched submission (offline queue in logger.html drains through this)
+
+BATCH_MAX = 500
+
+class MatchIn(BaseModel):
+    key: str = Field(..., min_length=1, max_length=64)   # client-generated, makes retries safe
+    GameID: int
+    Stream: str
+    RoundID: int
+    AreaID: int
+    Mode: str
+    UID1: Optional[int] = None
+    UID2: Optional[int] = None
+    WinnerUID: Optional[int] = None
+    Place1: Optional[int] = None
+    Place2: Optional[int] = None
+    Place3: Optional[int] = None
+    Place4: Optional[int] = None
+    FinalsUID: Optional[int] = None
+    FinalsMetricValue: Optional[float] = None
+
+class BatchIn(BaseModel):
+    matches: list[MatchIn] = Field(..., max_length=BATCH_MAX)
+
+@router.post("/logger/batch")
+async def logger_batch(batch: BatchIn):
+    """
+    Record many matches in one transaction. Each item carries an idempotency
+    key; resubmitting a key returns its original MatchID as "duplicate".
+    Invalid items are reported as "error" and do not block the rest.
+    In write-behind mode valid items are journaled and reported as "queued".
+    """
+    if WRITE_BEHIND:
+        return {"results": await run_write(accept_batch, batch.matches)}
+    return {"results": await run_write(record_batch, batch.matches)}
+
+def check_match(db: Session, ref: RefData, it: MatchIn) -> list[dict]:
+    """Participant rows for a submission, from cached reference data; ValueError with a short code if invalid."""
+    if ref.event_id(it.GameID, it.Stream) is None:
+        raise ValueError("UnknownEvent")
+    if all(r.RoundID != it.RoundID for r in ref.rounds):
+        raise ValueError("UnknownRound")
+    check_area(ref, it.GameID, it.Stream, it.AreaID)
+    timelap = it.Mode == "WIN_LOSE" and _timelap_bonus(ref, ref.games[it.GameID])
+    return match_participants(
+        it.Mode, points_for_game(db, it.GameID), timelap,
+        it.UID1, it.UID2, it.WinnerUID, it.Place1, it.Place2, it.Place3, it.Place4,
+        it.FinalsUID, it.FinalsMetricValue,
+    )
+
+def _stored_keys(db: Session, keys: list[str]) -> dict[str, int]:
+    """{key: MatchID} for the submission keys already recorded."""
+    if not keys:
+        return {}
+    return dict(db.execute(select(SubmissionKey.Key, SubmissionKey.MatchID).where(SubmissionKey.Key.in_(keys))).all())
+
+def record_batch(db: Session, items: list[MatchIn], retry: bool = True) -> list[dict]:
+    done = _stored_keys(db, [it.key for it in items])
+
+    ref = refdata(db)
+
+    results: list[dict] = [{}] * len(items)
+    pending: list[tuple[int, MatchIn, list[dict]]] = []   # (item index, item, participant rows)
+    first: dict[str, int] = {}                             # key -> index of its first item in this batch
+    repeats: list[int] = []
+    for i, it in enumerate(items):
+        if it.key in done:
+            results[i] = {"key": it.key, "status": "duplicate", "match_id": done[it.key]}
+            continue
+        if it.key in first:
+            repeats.append(i)
+            continue
+        first[it.key] = i
+        try:
+            rows = check_match(db, ref, it)
+        except ValueError as e:
+            results[i] = {"key": it.key, "status": "error", "error": str(e)}
+            continue
+        pending.append((i, it, rows))
+
+    if pending:
+        try:
+            _insert_pending(db, ref, pending, results)
+        except IntegrityError:
+            # another request stored one of these keys since we looked: start over, it reads as a duplicate
+            db.rollback()
+            if not retry:
+                raise
+            return record_batch(db, items, retry=False)
+        db.commit()
+        notify_results_changed()
+
+    for i in repeats:
+        res = dict(results[first[items[i].key]])
+        if res["status"] == "created":
+            res["status"] = "duplicate"
+        results[i] = res
+    return results
+
+def _insert_pending(db: Session, ref: RefData, pending: list[tuple[int, MatchIn, list[dict]]], results: list[dict]) -> None:
+    """Write the checked items of a batch and their totals; fills their results. Does not commit."""
+    match_ids = db.execute(
+        insert(Match).returning(Match.MatchID, sort_by_parameter_order=True),
+        [{"EventID": ref.event_id(it.GameID, it.Stream), "AreaID": it.AreaID, "RoundID": it.RoundID,
+          "Stage": _stage(it.Mode)} for _, it, _ in pending],
+    ).scalars().all()
+    db.execute(insert(MatchParticipant), [
+        {"MatchID": mid, **r} for (_, _, rows), mid in zip(pending, match_ids) for r in rows
+    ])
+    db.execute(insert(SubmissionKey), [{"Key": it.key, "MatchID": mid} for (_, it, _), mid in zip(pending, match_ids)])
+
+    awards: dict[tuple[int, str], list[tuple[int, int]]] = {}
+    for (i, it, rows), mid in zip(pending, match_ids):
+        awards.setdefault((it.GameID, it.Stream), []).extend((r["UID4"], r["PointsAwarded"]) for r in rows)
+        results[i] = {"key": it.key, "status": "created", "match_id": mid}
+    apply_points_many(db, awards)
+    finals = {ref.event_id(it.GameID, it.Stream) for _, it, _ in pending if it.Mode == "FINALS"}
+    if finals:
+        evaluate_finals(db, finals)
+
+
+# ---- write-behind mode (LOGGER_WRITE_BEHIND=Yes): journal, acknowledge, group-commit later
+
+WRITE_BEHIND = _env_flag("LOGGER_WRITE_BEHIND", "No")
+
+log = logging.getLogger("uvicorn.error")
+
+def _commit_queued(entries: list[dict]) -> list[tuple[dict, str]]:
+    db = SessionLocal()
+    try:
+        results = record_batch(db, [MatchIn(**e) for e in entries])
+    finally:
+        db.close()
+    # only if reference data changed after the entry was accepted: the queue dead-letters these
+    rejected = [(e, r["error"]) for e, r in zip(entries, results) if r["status"] == "error"]
+    for e, error in rejected:
+        log.warning("write-behind: dead-lettered %s (%s)", e["key"], error)
+    return rejected
+
+write_behind = WriteBehindQueue(
+    os.getenv("LOGGER_JOURNAL", "logger-journal.jsonl"), _commit_queued,
+    flush_ms=int(os.getenv("LOGGER_FLUSH_MS", "200")),
+    flush_max=int(os.getenv("LOGGER_FLUSH_MAX", "100")),
+    dead_letter=os.getenv("LOGGER_DEAD_LETTER", "logger-dead-letter.jsonl"),
+    permanent=(IntegrityError,),
+)
+
+def accept_batch(db: Session, items: list[MatchIn]) -> list[dict]:
+    """
+    Validate submissions and journal the valid ones (one fsync) for the next
+    group commit. Results are per item, as from record_batch, with "queued"
+    in place of "created".
+    """
+    done = _stored_keys(db, [it.key for it in items])
+    ref = refdata(db)
+    results: list[dict] = []
+    queued: dict[str, dict] = {}
+    for it in items:
+        if it.key in done:
+            results.append({"key": it.key, "status": "duplicate", "match_id": done[it.key]})
+            continue
+        if it.key not in queued:
+            try:
+                check_match(db, ref, it)
+            except ValueError as e:
+                results.append({"key": it.key, "status": "error", "error": str(e)})
+                continue
+            queued[it.key] = it.model_dump()
+        results.append({"key": it.key, "status": "queued"})
+    write_behind.put_many(list(queued.values()))
+    return results
+
+def accept_match(db: Session, item: MatchIn) -> Optional[str]:
+    """Validate a submission and journal it for the next group commit. Returns an error code or None."""
+    return accept_batch(db, [item])[0].get("error")
@@ -1,28 +1,75 @@
+import logging
+import time
+
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from .db import init_db
+from .db import init_db, engine, read_engine
+from .search import install_search_index
 from .seed import seed_all
 from .admin import router as admin_router
 from .logger import router as logger_router
 from .boards import router as boards_router
+from .api import router as api_router
 from sqlalchemy.orm import Session
 from .db import SessionLocal
+from .uids import sync_uid_pools
+from .refdata import refdata
+from .db_async import async_engine
+from .logger import WRITE_BEHIND, write_behind
+from .metrics import MetricsMiddleware, instrument_engine, router as metrics_router
+from .sync import venue_service, router as sync_router
+from .printing import shutdown_pool
 
 app = FastAPI(title="SEQEL Esports")
+app.add_middleware(MetricsMiddleware)
+for eng in (engine, read_engine, *([async_engine.sync_engine] if async_engine is not None else [])):
+    instrument_engine(eng)
 
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 templates = Jinja2Templates(directory="app/templates")
 app.state.templates = templates
 
+log = logging.getLogger("uvicorn.error")
+
 @app.on_event("startup")
 def startup():
-    init_db()
+    timings: dict[str, float] = {}
+    started = last = time.perf_counter()
+
+    def lap(phase: str) -> None:
+        nonlocal last
+        now = time.perf_counter()
+        timings[phase] = round((now - last) * 1000, 1)
+        last = now
+
+    init_db(); lap("init_db")
+    install_search_index(engine); lap("search_index")
     db = SessionLocal()
     try:
-        seed_all(db)
+        seeded = seed_all(db); lap("seed")
+        sync_uid_pools(db); lap("uid_pools")
+        refdata(db); lap("refdata")  # warm the reference-data cache before the first logger submit
     finally:
         db.close()
+    if WRITE_BEHIND:
+        replayed = write_behind.start(); lap("journal")
+        if replayed:
+            log.info("write-behind: replaying %d journaled submission(s)", replayed)
+    if venue_service():
+        venue_service().start()   # first run pulls master data, then pushes anything left from last time
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+    app.state.startup_ms = timings
+    log.info("startup: %s (seed %s)", ", ".join(f"{k} {v} ms" for k, v in timings.items()),
+             "applied" if seeded else "already current")
+
+@app.on_event("shutdown")
+def shutdown():
+    if WRITE_BEHIND:
+        write_behind.stop()  # commits what is queued; anything left is replayed next start
+    shutdown_pool()
+    if venue_service():
+        venue_service().stop()
 
 @app.get("/")
 def home(request: Request):
@@ -31,3 +78,6 @@ def home(request: Request):
 app.include_router(admin_router)
 app.include_router(logger_router)
 app.include_router(boards_router)
+app.include_router(api_router)
+app.include_router(metrics_router)
+app.include_router(sync_router)
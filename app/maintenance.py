@@ -1,21 +1,247 @@
-from fastapi import APIRouter, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
+"""
+Maintenance resets: clear results for a scope without locking the database.
+
+Scopes:
+    day         matches created on a date (Match.CreatedAt)
+    event       one Event (game + stream)
+    game        every event of one game
+    tournament  all results; per-game points overrides are kept
+    full        all results and per-game points overrides
+
+Matches are removed in batches of MAINT_BATCH_SIZE (participants and
+idempotency keys first), one short transaction per batch, so SQL Server
+keeps row locks and loggers and boards keep working. With archive=True each
+batch is copied into MatchesHistory / MatchParticipantsHistory in the same
+transaction before it is deleted. Afterwards finals are re-evaluated and
+the leaderboard totals rebuilt.
+
+A reset runs as a background job; /admin/maintenance/job reports progress.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Callable, Iterator, Optional
+
+from fastapi import APIRouter, Request, Form, Depends
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
+from sqlalchemy import select, delete, insert, func
 from sqlalchemy.orm import Session
-from .db import get_db, Match, MatchParticipant, GamePoints
+
+from .db import (
+    get_db, SessionLocal, Match, MatchParticipant, GamePoints, SubmissionKey, FinalsRun, Event,
+    MatchHistory, MatchParticipantHistory, day_window,
+)
+from .totals import clear_totals, rebuild_totals
+from .finals import evaluate_finals
+from .api import notify_results_changed
+from .refdata import refdata
+from .utils import invalidate_points_cache
 
 router = APIRouter()
 
+# ~1000 matches is ~3000 participant rows per statement: below SQL Server's lock escalation threshold
+BATCH_SIZE = int(os.getenv("MAINT_BATCH_SIZE", "1000"))
+SCOPES = ("day", "event", "game", "tournament", "full")
+
+_MATCH_COLS = ["MatchID", "EventID", "AreaID", "RoundID", "Stage", "Cancelled", "CancelReason", "CreatedAt"]
+_MP_COLS = ["MPID", "MatchID", "UID4", "Slot", "Outcome", "PointsAwarded", "MetricValueMs"]
+
+
+def _scope_filter(db: Session, scope: str, day: Optional[date] = None, event_id: Optional[int] = None,
+                  game_id: Optional[int] = None):
+    """WHERE clause over Match for a scope (None: every match). `day` is a local calendar day."""
+    if scope == "day":
+        start, end = day_window(db, day or date.today())
+        return (Match.CreatedAt >= start) & (Match.CreatedAt < end)
+    if scope == "event":
+        return Match.EventID == event_id
+    if scope == "game":
+        return Match.EventID.in_(select(Event.EventID).where(Event.GameID == game_id))
+    if scope in ("tournament", "full"):
+        return None
+    raise ValueError(f"unknown scope {scope!r}")
+
+
+def count_matches(db: Session, scope: str, **kw) -> int:
+    q = select(func.count()).select_from(Match)
+    cond = _scope_filter(db, scope, **kw)
+    if cond is not None:
+        q = q.where(cond)
+    return db.execute(q).scalar() or 0
+
+
+def reset_results(
+    db: Session, scope: str, archive: bool = False, batch_size: int = BATCH_SIZE,
+    progress: Optional[Callable[[int], None]] = None, **kw,
+) -> int:
+    """Delete (and optionally archive) the scope's matches batch by batch. Returns matches removed."""
+    cond = _scope_filter(db, scope, **kw)
+    removed = 0
+    while True:
+        q = select(Match.MatchID).order_by(Match.MatchID).limit(batch_size)
+        if cond is not None:
+            q = q.where(cond)
+        ids = list(db.execute(q).scalars())
+        if not ids:
+            break
+        if archive:
+            db.execute(insert(MatchHistory).from_select(
+                _MATCH_COLS, select(*[getattr(Match, c) for c in _MATCH_COLS]).where(Match.MatchID.in_(ids))))
+            db.execute(insert(MatchParticipantHistory).from_select(
+                _MP_COLS, select(*[getattr(MatchParticipant, c) for c in _MP_COLS]).where(MatchParticipant.MatchID.in_(ids))))
+        db.execute(delete(MatchParticipant).where(MatchParticipant.MatchID.in_(ids)))
+        db.execute(delete(SubmissionKey).where(SubmissionKey.MatchID.in_(ids)))
+        db.execute(delete(Match).where(Match.MatchID.in_(ids)))
+        db.commit()
+        removed += len(ids)
+        if progress:
+            progress(removed)
+
+    if scope in ("tournament", "full"):
+        db.execute(delete(FinalsRun))
+        if scope == "full":
+            db.execute(delete(GamePoints))
+        clear_totals(db)
+        db.commit()
+        if scope == "full":
+            invalidate_points_cache()  # GamePoints overrides were cleared too
+    elif removed:
+        evaluate_finals(db)   # placings in a partly cleared finals move up
+        rebuild_totals(db)    # commits
+    notify_results_changed()
+    return removed
+
+
+# ---- background job
+
+@dataclass
+class ResetJob:
+    scope: str
+    archive: bool
+    total: int = 0
+    done: int = 0
+    status: str = "running"          # running | finished | failed
+    error: Optional[str] = None
+    started: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+
+    def as_dict(self) -> dict:
+        elapsed = (self.finished or time.time()) - self.started
+        return {"scope": self.scope, "archive": self.archive, "total": self.total, "done": self.done,
+                "status": self.status, "error": self.error, "elapsed_s": round(elapsed, 1)}
+
+
+_job: Optional[ResetJob] = None
+_job_lock = threading.Lock()
+
+
+def _run_job(job: ResetJob, kw: dict) -> None:
+    db = SessionLocal()
+    try:
+        job.total = count_matches(db, job.scope, **kw)
+
+        def tick(n: int) -> None:
+            job.done = n
+        reset_results(db, job.scope, archive=job.archive, progress=tick, **kw)
+        job.status = "finished"
+    except Exception as e:  # reported on the maintenance page
+        db.rollback()
+        job.status, job.error = "failed", str(e)
+    finally:
+        job.finished = time.time()
+        db.close()
+
+
+def start_reset(scope: str, archive: bool = False, **kw) -> ResetJob:
+    """Start a reset unless one is already running (then that job is returned)."""
+    global _job
+    if scope not in SCOPES:   # validate before starting
+        raise ValueError(f"unknown scope {scope!r}")
+    with _job_lock:
+        if _job is not None and _job.status == "running":
+            return _job
+        _job = ResetJob(scope=scope, archive=archive)
+        threading.Thread(target=_run_job, args=(_job, kw), name="maintenance-reset", daemon=True).start()
+        return _job
+
+
+# ---- routes
+
 @router.get("/maintenance", response_class=HTMLResponse)
-def maintenance_page(request: Request):
-    return request.app.state.templates.TemplateResponse("admin_maintenance.html", {"request": request})
+def maintenance_page(request: Request, error: str | None = None, db: Session = Depends(get_db)):
+    ref = refdata(db)
+    events = [
+        {"EventID": eid, "label": f"{ref.games[gid].GameName} ({stream})"}
+        for (gid, stream), eid in sorted(ref.events.items(), key=lambda kv: (ref.games[kv[0][0]].GameName, kv[0][1]))
+    ]
+    return request.app.state.templates.TemplateResponse(
+        "admin_maintenance.html",
+        {"request": request, "games": ref.games_by_name(), "events": events, "today": date.today().isoformat(),
+         "job": _job.as_dict() if _job else None, "error": error},
+    )
 
 @router.post("/maintenance/reset")
-def maintenance_reset(scope: str = Form(...)):
-    db: Session = next(get_db())
+def maintenance_reset(
+    scope: str = Form(...),
+    day: str = Form(""),
+    event_id: str = Form(""),
+    game_id: str = Form(""),
+    archive: str = Form(""),
+):
     scope = (scope or "").lower()
-    if scope in ("day","tournament","full"):
-        db.query(MatchParticipant).delete(synchronize_session=False)
-        db.query(GamePoints).delete(synchronize_session=False)
-        db.query(Match).delete(synchronize_session=False)
-        db.commit()
+    if scope in SCOPES:
+        kw: dict = {}
+        if scope == "day":
+            try:
+                kw["day"] = date.fromisoformat(day) if day else date.today()
+            except ValueError:
+                return RedirectResponse(url="/admin/maintenance?error=BadDate", status_code=303)
+        elif scope == "event" and event_id.isdigit():
+            kw["event_id"] = int(event_id)
+        elif scope == "game" and game_id.isdigit():
+            kw["game_id"] = int(game_id)
+        if scope not in ("event", "game") or kw:
+            start_reset(scope, archive=bool(archive), **kw)
     return RedirectResponse(url="/admin/maintenance", status_code=303)
+
+@router.get("/maintenance/job")
+def maintenance_job():
+    return _job.as_dict() if _job else {"status": "idle"}
+
+def _archive_rows() -> Iterator[str]:
+    # own session: it has to outlive the request handler while the body streams
+    db = SessionLocal()
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(["MatchID", "EventID", "AreaID", "RoundID", "Stage", "CreatedAt", "MPID", "UID4", "Slot", "Outcome", "PointsAwarded", "MetricValueMs", "ArchivedAt"])
+    q = (
+        select(
+            MatchHistory.MatchID, MatchHistory.EventID, MatchHistory.AreaID, MatchHistory.RoundID, MatchHistory.Stage,
+            MatchHistory.CreatedAt, MatchParticipantHistory.MPID, MatchParticipantHistory.UID4, MatchParticipantHistory.Slot,
+            MatchParticipantHistory.Outcome, MatchParticipantHistory.PointsAwarded, MatchParticipantHistory.MetricValueMs,
+            MatchHistory.ArchivedAt,
+        )
+        .join(MatchParticipantHistory, MatchParticipantHistory.MatchID == MatchHistory.MatchID)
+        .order_by(MatchHistory.MatchID, MatchParticipantHistory.MPID)
+        .execution_options(yield_per=1000)
+    )
+    try:
+        for row in db.execute(q):
+            w.writerow(row)
+            if buf.tell() > 64_000:
+                yield buf.getvalue()
+                buf.seek(0); buf.truncate()
+        yield buf.getvalue()
+    finally:
+        db.close()
+
+@router.get("/maintenance/archive.csv")
+def maintenance_archive_csv():
+    return StreamingResponse(_archive_rows(), media_type="text/csv",
+                             headers={"Content-Disposition": 'attachment; filename="seqel-archive.csv"'})
@@ -0,0 +1,293 @@
+"""
+Request and SQL instrumentation.
+
+`MetricsMiddleware` times every request into a per-route latency histogram.
+While a request runs, a RequestStats object sits in a context variable and
+the cursor hooks from `instrument_engine()` add each statement's count and
+time to it, so per-request figures stay correct under concurrency (the
+threadpool, the logger write pool and async reads all inherit the context).
+
+  - Statements slower than SLOW_QUERY_MS are logged with their parameters
+    and kept in a short list for the admin page.
+  - The same statement text run N_PLUS_ONE_THRESHOLD or more times in one
+    request is flagged as a likely N+1 (logged once per route and statement).
+
+`/metrics` renders everything in the Prometheus text format; /admin/metrics
+shows the same figures for people.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .db import engine, read_engine, pool_stats
+from .logger import WRITE_BEHIND, write_behind
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "250"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+# seconds, Prometheus convention
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+log = logging.getLogger("uvicorn.error")
+
+
+@dataclass
+class RequestStats:
+    path: str
+    statements: int = 0
+    sql_s: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+
+
+@dataclass
+class RouteMetrics:
+    buckets: list[int] = field(default_factory=lambda: [0] * (len(BUCKETS) + 1))   # last one is +Inf
+    count: int = 0
+    sum_s: float = 0.0
+    max_s: float = 0.0
+    statuses: Counter = field(default_factory=Counter)
+    statements: int = 0
+    sql_s: float = 0.0
+    n_plus_one: int = 0
+
+    def observe(self, seconds: float, status: int, req: RequestStats, n_plus_one: bool) -> None:
+        i = next((i for i, b in enumerate(BUCKETS) if seconds <= b), len(BUCKETS))
+        self.buckets[i] += 1
+        self.count += 1
+        self.sum_s += seconds
+        self.max_s = max(self.max_s, seconds)
+        self.statuses[status] += 1
+        self.statements += req.statements
+        self.sql_s += req.sql_s
+        self.n_plus_one += n_plus_one
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (max seen when it falls in +Inf)."""
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if self.count and seen >= q * self.count:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max_s
+        return 0.0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("seqel_request_stats", default=None)
+_lock = threading.Lock()
+_routes: dict[tuple[str, str], RouteMetrics] = {}
+_sql = {"statements": 0, "seconds": 0.0, "slow": 0}
+slow_queries: deque = deque(maxlen=50)
+n_plus_one: dict[tuple[str, str], dict] = {}
+
+
+def reset_metrics() -> None:
+    with _lock:
+        _routes.clear()
+        _sql.update(statements=0, seconds=0.0, slow=0)
+        slow_queries.clear()
+        n_plus_one.clear()
+
+
+# ---- SQL hooks
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._seqel_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_seqel_started", None)
+    elapsed = time.perf_counter() - started if started is not None else 0.0
+    req = _current.get()
+    if req is not None:
+        req.statements += 1
+        req.sql_s += elapsed
+        if not executemany:
+            req.shapes[statement] += 1
+    slow = elapsed * 1000 >= SLOW_QUERY_MS
+    with _lock:
+        _sql["statements"] += 1
+        _sql["seconds"] += elapsed
+        if slow:
+            _sql["slow"] += 1
+            slow_queries.appendleft({
+                "ms": round(elapsed * 1000, 1), "path": req.path if req else None,
+                "statement": statement, "parameters": repr(parameters)[:500], "at": time.time(),
+            })
+    if slow:
+        log.warning("slow query %.0f ms (%s): %s %s", elapsed * 1000, req.path if req else "background",
+                    " ".join(statement.split()), repr(parameters)[:500])
+
+
+def instrument_engine(eng: Engine) -> None:
+    """Attach the statement counters and timers to an engine (once)."""
+    if not event.contains(eng, "after_cursor_execute", _after_cursor_execute):
+        event.listen(eng, "before_cursor_execute", _before_cursor_execute)
+        event.listen(eng, "after_cursor_execute", _after_cursor_execute)
+
+
+# ---- requests
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: latency per route template, SQL per request, N+1 detection."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        req = RequestStats(path=scope["path"])
+        token = _current.set(req)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "(unmatched)"
+            _record(scope["method"], route, time.perf_counter() - started, status, req)
+
+
+def _record(method: str, route: str, seconds: float, status: int, req: RequestStats) -> None:
+    repeated = [(s, n) for s, n in req.shapes.items() if n >= N_PLUS_ONE_THRESHOLD]
+    new: list[tuple[str, int]] = []
+    with _lock:
+        _routes.setdefault((method, route), RouteMetrics()).observe(seconds, status, req, bool(repeated))
+        for stmt, n in repeated:
+            hit = n_plus_one.get((route, stmt))
+            if hit is None:
+                n_plus_one[(route, stmt)] = {"route": f"{method} {route}", "statement": stmt, "max_repeats": n, "requests": 1}
+                new.append((stmt, n))
+            else:
+                hit["max_repeats"] = max(hit["max_repeats"], n)
+                hit["requests"] += 1
+    for stmt, n in new:
+        log.warning("possible N+1 on %s %s: %d x %s", method, route, n, " ".join(stmt.split()))
+
+
+# ---- reporting
+
+def route_summary() -> list[dict]:
+    """Per-route figures for the admin page, slowest total time first."""
+    with _lock:
+        rows = [
+            {
+                "method": method, "route": route, "count": m.count,
+                "mean_ms": round(m.sum_s / m.count * 1000, 1) if m.count else 0.0,
+                "p95_ms": round(m.quantile(0.95) * 1000, 1), "max_ms": round(m.max_s * 1000, 1),
+                "sql_per_request": round(m.statements / m.count, 1) if m.count else 0.0,
+                "sql_ms_per_request": round(m.sql_s / m.count * 1000, 1) if m.count else 0.0,
+                "errors": sum(n for s, n in m.statuses.items() if s >= 500), "n_plus_one": m.n_plus_one,
+                "total_s": m.sum_s,
+            }
+            for (method, route), m in _routes.items()
+        ]
+    return sorted(rows, key=lambda r: r["total_s"], reverse=True)
+
+
+def sql_totals() -> dict:
+    with _lock:
+        return dict(_sql)
+
+
+def _label(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def render_prometheus() -> str:
+    with _lock:
+        routes = {k: (list(m.buckets), m.count, m.sum_s, dict(m.statuses), m.statements, m.sql_s, m.n_plus_one)
+                  for k, m in _routes.items()}
+        sql = dict(_sql)
+    out = [
+        "# HELP seqel_http_request_duration_seconds Request latency by route.",
+        "# TYPE seqel_http_request_duration_seconds histogram",
+    ]
+    for (method, route), (buckets, count, sum_s, *_rest) in sorted(routes.items()):
+        labels = f'method="{method}",route="{_label(route)}"'
+        seen = 0
+        for bound, n in zip((*BUCKETS, "+Inf"), buckets):
+            seen += n
+            out.append(f'seqel_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {seen}')
+        out.append(f"seqel_http_request_duration_seconds_sum{{{labels}}} {sum_s:.6f}")
+        out.append(f"seqel_http_request_duration_seconds_count{{{labels}}} {count}")
+
+    out += ["# HELP seqel_http_requests_total Requests by route and status.", "# TYPE seqel_http_requests_total counter"]
+    for (method, route), (_b, _c, _s, statuses, *_rest) in sorted(routes.items()):
+        for status, n in sorted(statuses.items()):
+            out.append(f'seqel_http_requests_total{{method="{method}",route="{_label(route)}",status="{status}"}} {n}')
+
+    for name, idx, help_ in (
+        ("seqel_request_sql_statements_total", 4, "SQL statements issued while serving the route."),
+        ("seqel_request_sql_seconds_total", 5, "Time spent in SQL while serving the route."),
+        ("seqel_request_n_plus_one_total", 6, "Requests where one statement repeated N_PLUS_ONE_THRESHOLD+ times."),
+    ):
+        out += [f"# HELP {name} {help_}", f"# TYPE {name} counter"]
+        for (method, route), values in sorted(routes.items()):
+            v = values[idx]
+            out.append(f'{name}{{method="{method}",route="{_label(route)}"}} {v:.6f}' if isinstance(v, float)
+                       else f'{name}{{method="{method}",route="{_label(route)}"}} {v}')
+
+    out += [
+        "# HELP seqel_sql_statements_total SQL statements on all engines, including background work.",
+        "# TYPE seqel_sql_statements_total counter",
+        f"seqel_sql_statements_total {sql['statements']}",
+        "# HELP seqel_sql_seconds_total Time spent in SQL on all engines.",
+        "# TYPE seqel_sql_seconds_total counter",
+        f"seqel_sql_seconds_total {sql['seconds']:.6f}",
+        "# HELP seqel_sql_slow_queries_total Statements slower than SLOW_QUERY_MS.",
+        "# TYPE seqel_sql_slow_queries_total counter",
+        f"seqel_sql_slow_queries_total {sql['slow']}",
+    ]
+    pools = {"write": pool_stats(engine), "read": pool_stats(read_engine)}
+    out += ["# HELP seqel_db_pool_checked_out Connections currently checked out.", "# TYPE seqel_db_pool_checked_out gauge"]
+    out += [f'seqel_db_pool_checked_out{{pool="{k}"}} {p.get("checked_out", 0)}' for k, p in pools.items()]
+    out += ["# HELP seqel_db_pool_checkouts_total Pool checkouts.", "# TYPE seqel_db_pool_checkouts_total counter"]
+    out += [f'seqel_db_pool_checkouts_total{{pool="{k}"}} {p.get("checkouts", 0)}' for k, p in pools.items()]
+    if WRITE_BEHIND:
+        wb = write_behind.stats()
+        out += [
+            "# HELP seqel_logger_queue_depth Submissions acknowledged but not yet committed.",
+            "# TYPE seqel_logger_queue_depth gauge",
+            f"seqel_logger_queue_depth {wb['depth']}",
+            "# HELP seqel_logger_queue_committed_total Submissions committed by the write-behind worker.",
+            "# TYPE seqel_logger_queue_committed_total counter",
+            f"seqel_logger_queue_committed_total {wb['committed']}",
+            "# HELP seqel_logger_group_commit_seconds Time per group commit.",
+            "# TYPE seqel_logger_group_commit_seconds summary",
+            f"seqel_logger_group_commit_seconds_sum {wb['commit_ms_total'] / 1000:.6f}",
+            f"seqel_logger_group_commit_seconds_count {wb['batches']}",
+            "# HELP seqel_logger_group_commit_errors_total Failed group commits (retried).",
+            "# TYPE seqel_logger_group_commit_errors_total counter",
+            f"seqel_logger_group_commit_errors_total {wb['errors']}",
+            "# HELP seqel_logger_dead_letter_total Submissions moved to the dead-letter file.",
+            "# TYPE seqel_logger_dead_letter_total counter",
+            f"seqel_logger_dead_letter_total {wb['dead']}",
+        ]
+    return "\n".join(out) + "\n"
+
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,71 @@
+"""
+PDF layouts for the print centre.
+
+Pure functions from plain dicts to PDF bytes, with no database or app
+imports, so they can run in a worker process (see app/printing.py).
+"""
+from __future__ import annotations
+
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+_GRID = TableStyle([
+    ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+    ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.whitesmoke]),
+])
+
+
+def _build(title: str, subtitle: str, header: list[str], rows: list[list], widths: list[float]) -> bytes:
+    buf = BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=A4, title=title, leftMargin=15 * mm, rightMargin=15 * mm,
+                            topMargin=15 * mm, bottomMargin=15 * mm)
+    styles = getSampleStyleSheet()
+    table = Table([header] + rows, colWidths=[w * mm for w in widths], repeatRows=1)
+    table.setStyle(_GRID)
+    doc.build([Paragraph(title, styles["Title"]), Paragraph(subtitle, styles["Normal"]), Spacer(1, 6 * mm), table])
+    return buf.getvalue()
+
+
+def area_schedule(data: dict) -> bytes:
+    """
+    Round-by-round sheet for one area, with blank columns for the logger.
+    data: {"game", "area", "stream", "rounds": [[label, "HH:MM"], ...]}
+    """
+    rows = [[label, start, "", "", ""] for label, start in data["rounds"]]
+    return _build(
+        f"{data['game']} - {data['area']}",
+        f"{data['stream']} stream",
+        ["Round", "Start", "UID A", "UID B", "Winner / Result"],
+        rows,
+        [30, 20, 35, 35, 60],
+    )
+
+
+def school_run_sheet(data: dict) -> bytes:
+    """
+    Student list for one school.
+    data: {"school", "uid", "students": [[uid, first, last, cohort], ...]}
+    """
+    rows = [[uid, f"{last}, {first}", cohort, ""] for uid, first, last, cohort in data["students"]]
+    return _build(
+        data["school"],
+        f"School UID {data['uid']} - {len(rows)} students",
+        ["UID", "Name", "Cohort", "Notes"],
+        rows,
+        [20, 75, 25, 60],
+    )
+
+
+RENDERERS = {"area": area_schedule, "school": school_run_sheet}
+
+
+def render(kind: str, data: dict) -> bytes:
+    return RENDERERS[kind](data)
@@ -0,0 +1,265 @@
+"""
+Print centre: area schedules and school run-sheets as PDFs.
+
+Layouts live in app/pdf.py and are rendered in a process pool
+(PRINT_WORKERS, 0 renders in the calling thread), never on the event loop.
+Rendered files are cached in memory keyed by a data version:
+  - area schedules by the reference-data version (Rounds, Areas, Games),
+  - school run-sheets by a hash of everything printed on them (school name
+    and each student's UID, names and cohort), from one query over the
+    students of every school.
+
+`start_render_all()` renders every missing document in a background thread
+and reports progress through `current_job()`; `zip_all()` packs the full
+set into one archive.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import threading
+import time
+import zipfile
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Any, Callable, Hashable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import pdf
+from .db import SessionLocal, School, Student
+from .refdata import refdata
+
+PRINT_WORKERS = int(os.getenv("PRINT_WORKERS", "2"))
+
+
+@dataclass(frozen=True)
+class Doc:
+    kind: str            # "area" | "school"
+    id: int
+    version: Hashable
+    filename: str
+
+
+def _slug(s: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "-", s).strip("-").lower()
+
+
+# ---- documents and their data versions
+
+def area_docs(db: Session, area_ids: Optional[list[int]] = None) -> list[Doc]:
+    ref = refdata(db)
+    ids = sorted(ref.areas) if area_ids is None else [a for a in area_ids if a in ref.areas]
+    out = []
+    for aid in ids:
+        a = ref.areas[aid]
+        game = ref.games[a.GameID].GameName
+        out.append(Doc("area", aid, ref.version, f"areas/{_slug(game)}-{_slug(a.AreaName)}-{aid}.pdf"))
+    return out
+
+
+def school_docs(db: Session, school_ids: Optional[list[int]] = None) -> list[Doc]:
+    schools = select(School.SchoolID, School.SchoolName, School.SchoolUID4).order_by(School.SchoolName)
+    students = (
+        select(Student.SchoolID, Student.UID4, Student.FirstName, Student.LastName, Student.Cohort)
+        .order_by(Student.SchoolID, Student.UID4)
+    )
+    if school_ids is not None:
+        schools = schools.where(School.SchoolID.in_(school_ids))
+        students = students.where(Student.SchoolID.in_(school_ids))
+    digests: dict[int, Any] = {}
+    for sid, *row in db.execute(students).all():
+        digests.setdefault(sid, hashlib.sha1()).update(repr(row).encode("utf-8"))
+    return [
+        Doc("school", sid, (name, uid, digests[sid].hexdigest() if sid in digests else None),
+            f"schools/{_slug(name)}-{uid}.pdf")
+        for sid, name, uid in db.execute(schools).all()
+    ]
+
+
+def _area_data(db: Session, ids: list[int]) -> dict[int, dict]:
+    ref = refdata(db)
+    rounds = [[r.Label, r.StartTime.strftime("%H:%M")] for r in ref.rounds]
+    return {
+        aid: {
+            "game": ref.games[ref.areas[aid].GameID].GameName,
+            "area": ref.areas[aid].AreaName,
+            "stream": ref.areas[aid].Stream.value,
+            "rounds": rounds,
+        }
+        for aid in ids
+    }
+
+
+def _school_data(db: Session, ids: list[int]) -> dict[int, dict]:
+    out = {
+        sid: {"school": name, "uid": uid, "students": []}
+        for sid, name, uid in db.execute(
+            select(School.SchoolID, School.SchoolName, School.SchoolUID4).where(School.SchoolID.in_(ids))
+        ).all()
+    }
+    for sid, uid, first, last, cohort in db.execute(
+        select(Student.SchoolID, Student.UID4, Student.FirstName, Student.LastName, Student.Cohort)
+        .where(Student.SchoolID.in_(ids))
+        .order_by(Student.LastName, Student.FirstName)
+    ).all():
+        out[sid]["students"].append([uid, first, last, cohort])
+    return out
+
+
+_LOADERS: dict[str, Callable[[Session, list[int]], dict[int, dict]]] = {"area": _area_data, "school": _school_data}
+
+
+# ---- cache
+
+_cache_lock = threading.Lock()
+_cache: dict[tuple[str, int], tuple[Hashable, bytes]] = {}
+
+
+def _cached(doc: Doc) -> Optional[bytes]:
+    with _cache_lock:
+        hit = _cache.get((doc.kind, doc.id))
+    return hit[1] if hit and hit[0] == doc.version else None
+
+
+def clear_print_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+
+
+# ---- rendering
+
+_pool: Optional[Executor] = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> Optional[Executor]:
+    global _pool
+    if PRINT_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PRINT_WORKERS)
+        return _pool
+
+
+def shutdown_pool() -> None:
+    """Stop the render workers; the next render starts a fresh pool."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def render_docs(db: Session, docs: list[Doc], progress: Optional[Callable[[Doc], Any]] = None) -> dict[Doc, bytes]:
+    """PDF bytes for each doc: cached ones as-is, the rest rendered (in parallel when a pool is configured)."""
+    out: dict[Doc, bytes] = {}
+    missing: dict[str, list[Doc]] = {}
+    for d in docs:
+        body = _cached(d)
+        if body is None:
+            missing.setdefault(d.kind, []).append(d)
+        else:
+            out[d] = body
+            if progress:
+                progress(d)
+
+    jobs: list[tuple[Doc, dict]] = []
+    for kind, items in missing.items():
+        data = _LOADERS[kind](db, [d.id for d in items])
+        jobs += [(d, data[d.id]) for d in items if d.id in data]
+
+    def store(d: Doc, body: bytes) -> None:
+        with _cache_lock:
+            _cache[(d.kind, d.id)] = (d.version, body)
+        out[d] = body
+        if progress:
+            progress(d)
+
+    pool = _executor()
+    if pool is None:
+        for d, data in jobs:
+            store(d, pdf.render(d.kind, data))
+    else:
+        futures = {pool.submit(pdf.render, d.kind, data): d for d, data in jobs}
+        for fut in as_completed(futures):
+            store(futures[fut], fut.result())
+    return out
+
+
+def render_one(db: Session, kind: str, id: int) -> Optional[tuple[Doc, bytes]]:
+    docs = area_docs(db, [id]) if kind == "area" else school_docs(db, [id])
+    if not docs:
+        return None
+    doc = docs[0]
+    return doc, render_docs(db, [doc])[doc]
+
+
+def all_docs(db: Session) -> list[Doc]:
+    return area_docs(db) + school_docs(db)
+
+
+def zip_all(db: Session) -> bytes:
+    buf = BytesIO()
+    rendered = render_docs(db, all_docs(db))
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for doc, body in sorted(rendered.items(), key=lambda kv: kv[0].filename):
+            zf.writestr(doc.filename, body)
+    return buf.getvalue()
+
+
+# ---- "render all" background job
+
+@dataclass
+class PrintJob:
+    total: int = 0
+    done: int = 0
+    status: str = "running"          # running | finished | failed
+    error: Optional[str] = None
+    started: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+
+    def as_dict(self) -> dict:
+        elapsed = (self.finished or time.time()) - self.started
+        return {"total": self.total, "done": self.done, "status": self.status,
+                "error": self.error, "elapsed_s": round(elapsed, 1)}
+
+
+_job: Optional[PrintJob] = None
+_job_lock = threading.Lock()
+
+
+def current_job() -> Optional[PrintJob]:
+    return _job
+
+
+def _run_job(job: PrintJob) -> None:
+    db = SessionLocal()
+    try:
+        docs = all_docs(db)
+        job.total = len(docs)
+
+        def tick(_: Doc) -> None:
+            job.done += 1
+        render_docs(db, docs, progress=tick)
+        job.status = "finished"
+    except Exception as e:  # reported on the print page
+        job.status, job.error = "failed", str(e)
+    finally:
+        job.finished = time.time()
+        db.close()
+
+
+def start_render_all() -> PrintJob:
+    """Start rendering every document unless a job is already running."""
+    global _job
+    with _job_lock:
+        if _job is not None and _job.status == "running":
+            return _job
+        _job = PrintJob()
+        threading.Thread(target=_run_job, args=(_job,), name="print-render-all", daemon=True).start()
+        return _job
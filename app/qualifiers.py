@@ -0,0 +1,234 @@
+"""
+Qualifier seeding and knockout bracket generation.
+
+Seeds are ranked per game over Competition-stream group matches played up
+to CUTOFF_ROUND (by Round.StartTime). One grouped statement returns
+points per (game, student, school) for every requested game at once; the
+school-points tiebreak and the ranking are done in memory from those rows.
+
+`generate_brackets` writes the Quarter/Semi/Final matches for any number of
+games with one executemany per table. Only the first stage gets
+participants; later stages are placeholders. Knockout results are entered
+on the admin qualifiers page (`record_knockout`), not at the logger: it
+scores the match and seats the winner in the next stage's placeholder.
+"""
+from __future__ import annotations
+
+from typing import NamedTuple, Optional, Sequence
+
+from sqlalchemy import select, func, insert, or_
+from sqlalchemy.orm import Session
+
+from .db import Match, MatchParticipant, Event, Student, StreamEnum
+from .refdata import refdata
+from .totals import apply_points
+from .utils import points_for_game
+
+CUTOFF_ROUND = "Round 21"
+KNOCKOUT_STAGES = ("Quarter", "Semi", "Final")
+
+# first-stage pairings by bracket size (seed numbers), so seeds 1 and 2 can only meet in the final
+PAIRINGS = {
+    2: [(1, 2)],
+    4: [(1, 4), (2, 3)],
+    8: [(1, 8), (4, 5), (2, 7), (3, 6)],
+}
+
+
+class Seed(NamedTuple):
+    uid: int
+    points: int
+    school_points: int
+    tied: bool          # level with a neighbour even after the school tiebreak
+
+
+def _qualifying_round_ids(db: Session) -> list[int]:
+    rounds = refdata(db).rounds
+    cutoff = next((r.StartTime for r in rounds if r.Label == CUTOFF_ROUND), None)
+    return [r.RoundID for r in rounds if cutoff is None or r.StartTime <= cutoff]
+
+
+def qualifier_seeds(db: Session, game_ids: Optional[Sequence[int]] = None, top: int = 4) -> dict[int, list[Seed]]:
+    """
+    {GameID: top `top` seeds} for the given games (all games when None).
+    Ties on points go to the student whose school scored more in the same
+    game's qualifiers; anything still level is flagged `tied`.
+    """
+    ref = refdata(db)
+    game_ids = list(ref.games) if game_ids is None else list(game_ids)
+    if not game_ids:
+        return {}
+
+    pts = func.sum(MatchParticipant.PointsAwarded)
+    q = (
+        select(Event.GameID, MatchParticipant.UID4, Student.SchoolID, pts)
+        .join(Match, Match.MatchID == MatchParticipant.MatchID)
+        .join(Event, Event.EventID == Match.EventID)
+        .join(Student, Student.UID4 == MatchParticipant.UID4, isouter=True)
+        .where(
+            Event.Stream == StreamEnum.Competition,
+            Event.GameID.in_(game_ids),
+            Match.RoundID.in_(_qualifying_round_ids(db)),
+            Match.Cancelled == False,  # noqa: E712  (renders "= 0" on SQL Server)
+            or_(Match.Stage == "Group", Match.Stage.is_(None)),
+        )
+        .group_by(Event.GameID, MatchParticipant.UID4, Student.SchoolID)
+    )
+    rows = [(gid, uid, sid, int(p or 0)) for gid, uid, sid, p in db.execute(q).all()]
+
+    school_pts: dict[tuple[int, int], int] = {}
+    for gid, _, sid, p in rows:
+        if sid is not None:
+            school_pts[(gid, sid)] = school_pts.get((gid, sid), 0) + p
+
+    by_game: dict[int, list[tuple[int, int, int]]] = {gid: [] for gid in game_ids}
+    for gid, uid, sid, p in rows:
+        by_game[gid].append((uid, p, school_pts.get((gid, sid), 0)))
+
+    out: dict[int, list[Seed]] = {}
+    for gid, entries in by_game.items():
+        entries.sort(key=lambda e: (-e[1], -e[2], e[0]))
+        seeds = []
+        for i, (uid, p, sp) in enumerate(entries[:top]):
+            neighbours = entries[max(i - 1, 0):i] + entries[i + 1:i + 2]
+            seeds.append(Seed(uid, p, sp, any((n[1], n[2]) == (p, sp) for n in neighbours)))
+        out[gid] = seeds
+    return out
+
+
+def _stage_labels(size: int) -> list[tuple[str, list[str]]]:
+    """[(stage, [round label per match]), ...] from the first stage down to the final."""
+    stages = []
+    n = size // 2
+    for stage in KNOCKOUT_STAGES[KNOCKOUT_STAGES.index({4: "Quarter", 2: "Semi", 1: "Final"}[n]):]:
+        labels = ["Final"] if stage == "Final" else [f"{stage} {i}" for i in range(1, n + 1)]
+        stages.append((stage, labels))
+        n //= 2
+    return stages
+
+
+def generate_brackets(db: Session, seeds: dict[int, list[Seed]], size: int = 4) -> dict[int, int]:
+    """
+    Create knockout matches for each game in `seeds` that has none yet.
+    Returns {GameID: matches created}; games already bracketed get 0.
+    Commits.
+    """
+    if size not in PAIRINGS:
+        raise ValueError(f"bracket size must be one of {sorted(PAIRINGS)}")
+    ref = refdata(db)
+    round_ids = {r.Label: r.RoundID for r in ref.rounds}
+    events = {gid: ref.event_id(gid, StreamEnum.Competition) for gid in seeds}
+    done = set(db.execute(
+        select(Event.GameID).join(Match, Match.EventID == Event.EventID)
+        .where(Event.EventID.in_([e for e in events.values() if e]), Match.Stage.in_(KNOCKOUT_STAGES))
+        .distinct()
+    ).scalars())
+
+    created = {gid: 0 for gid in seeds}
+    matches: list[dict] = []
+    first_stage: list[tuple[int, list[Seed], int, int]] = []   # (index into matches, seeds, seed a, seed b)
+    for gid, game_seeds in seeds.items():
+        areas = ref.areas_for(gid, StreamEnum.Competition)
+        if gid in done or not events[gid] or not areas or not game_seeds:
+            continue
+        for depth, (stage, labels) in enumerate(_stage_labels(size)):
+            for i, label in enumerate(labels):
+                if depth == 0:
+                    a, b = PAIRINGS[size][i]
+                    first_stage.append((len(matches), game_seeds, a, b))
+                matches.append({"EventID": events[gid], "AreaID": areas[0].AreaID, "RoundID": round_ids[label], "Stage": stage})
+                created[gid] += 1
+
+    if matches:
+        ids = db.execute(insert(Match).returning(Match.MatchID, sort_by_parameter_order=True), matches).scalars().all()
+        participants = [
+            {"MatchID": ids[idx], "UID4": game_seeds[s - 1].uid, "Slot": slot, "Outcome": None, "PointsAwarded": 0}
+            for idx, game_seeds, a, b in first_stage
+            for slot, s in ((1, a), (2, b))
+            if s <= len(game_seeds)   # short field: missing seed is a bye
+        ]
+        if participants:
+            db.execute(insert(MatchParticipant), participants)
+        db.commit()
+    return created
+
+
+def _stages(db: Session, event_id: int) -> dict[str, list[int]]:
+    """{stage: [MatchID, ...] in bracket order} for one event's knockout matches."""
+    rows = db.execute(
+        select(Match.MatchID, Match.Stage)
+        .where(Match.EventID == event_id, Match.Stage.in_(KNOCKOUT_STAGES), Match.Cancelled == False)  # noqa: E712
+        .order_by(Match.MatchID)
+    ).all()
+    out: dict[str, list[int]] = {}
+    for mid, stage in rows:
+        out.setdefault(stage, []).append(mid)
+    return out
+
+
+def knockout_matches(db: Session) -> list[dict]:
+    """Every knockout match with its seated players and outcomes, for the admin page."""
+    ref = refdata(db)
+    rows = db.execute(
+        select(Match.MatchID, Event.GameID, Match.Stage, Match.RoundID,
+               MatchParticipant.UID4, MatchParticipant.Outcome)
+        .join(Event, Event.EventID == Match.EventID)
+        .join(MatchParticipant, MatchParticipant.MatchID == Match.MatchID, isouter=True)
+        .where(Match.Stage.in_(KNOCKOUT_STAGES), Match.Cancelled == False)  # noqa: E712
+        .order_by(Match.MatchID, MatchParticipant.Slot)
+    ).all()
+    labels = {r.RoundID: r.Label for r in ref.rounds}
+    out: dict[int, dict] = {}
+    for mid, gid, stage, rid, uid, outcome in rows:
+        m = out.setdefault(mid, {"MatchID": mid, "game": ref.games[gid].GameName, "stage": stage,
+                                 "round": labels.get(rid, ""), "players": [], "winner": None})
+        if uid is not None:
+            m["players"].append(uid)
+        if outcome == "Win":
+            m["winner"] = uid
+    return sorted(out.values(), key=lambda m: (m["game"], KNOCKOUT_STAGES.index(m["stage"]), m["MatchID"]))
+
+
+def record_knockout(db: Session, match_id: int, winner_uid: int) -> None:
+    """
+    Score a knockout match (Win/Lose points, totals updated) and seat the
+    winner in the next stage. A first-stage bye just advances its player.
+    Raises ValueError with a short code when the entry is inconsistent.
+    Commits.
+    """
+    m = db.get(Match, match_id)
+    if m is None or m.Stage not in KNOCKOUT_STAGES or m.Cancelled:
+        raise ValueError("UnknownMatch")
+    players = db.execute(
+        select(MatchParticipant).where(MatchParticipant.MatchID == match_id).order_by(MatchParticipant.Slot)
+    ).scalars().all()
+    if winner_uid not in {p.UID4 for p in players}:
+        raise ValueError("WinnerMismatch")
+    stages = _stages(db, m.EventID)
+    order = [s for s in KNOCKOUT_STAGES if s in stages]
+    if len(players) < 2 and m.Stage != order[0]:
+        raise ValueError("MissingPlayer")
+
+    following = order[order.index(m.Stage) + 1] if m.Stage != order[-1] else None
+    seat = None
+    if following:
+        pos = stages[m.Stage].index(match_id)
+        seat = (stages[following][pos // 2], pos % 2 + 1)
+        taken = db.execute(
+            select(MatchParticipant.MPID).where(MatchParticipant.MatchID == seat[0], MatchParticipant.Slot == seat[1])
+        ).first()
+        if taken:
+            raise ValueError("AlreadyRecorded")
+    if any(p.Outcome for p in players):
+        raise ValueError("AlreadyRecorded")
+
+    if len(players) == 2:
+        event = db.get(Event, m.EventID)
+        points = points_for_game(db, event.GameID)
+        for p in players:
+            p.Outcome = "Win" if p.UID4 == winner_uid else "Lose"
+            p.PointsAwarded = points.get(p.Outcome) or 0
+        apply_points(db, event.GameID, event.Stream, [(p.UID4, p.PointsAwarded) for p in players])
+    if seat:
+        db.add(MatchParticipant(MatchID=seat[0], UID4=winner_uid, Slot=seat[1], Outcome=None, PointsAwarded=0))
+    db.commit()
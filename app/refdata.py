@@ -0,0 +1,129 @@
+"""
+Process-wide copy of the reference tables: Games, Rounds, Events, Areas and
+Settings. They change only when an admin edits them, so the logger and
+boards read them from memory instead of querying per request.
+
+`refdata(db)` returns the current snapshot, loading it (one query per table)
+on first use. Routers that write these tables call `invalidate_refdata()`
+after committing; the next lookup reloads. Each load gets a new `version`,
+which callers can use to key their own caches.
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from datetime import time
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .db import Game, Round, Event, Area, Setting, ScoringMode, FinalsMetric, StreamEnum
+
+
+@dataclass(frozen=True)
+class GameRef:
+    GameID: int
+    GameName: str
+    Platform: Optional[str]
+    ScoringMode: ScoringMode
+    FinalsMetric: Optional[FinalsMetric]
+
+
+@dataclass(frozen=True)
+class RoundRef:
+    RoundID: int
+    Label: str
+    StartTime: time
+
+
+@dataclass(frozen=True)
+class AreaRef:
+    AreaID: int
+    GameID: int
+    Stream: StreamEnum
+    AreaName: str
+
+
+def _stream(stream) -> str:
+    return stream.value if isinstance(stream, StreamEnum) else str(stream)
+
+
+@dataclass(frozen=True)
+class RefData:
+    version: int
+    games: dict[int, GameRef]                       # GameID -> game
+    rounds: list[RoundRef]                          # ordered by StartTime
+    events: dict[tuple[int, str], int]              # (GameID, stream) -> EventID
+    areas: dict[int, AreaRef]                       # AreaID -> area
+    areas_by_event: dict[tuple[int, str], list[AreaRef]] = field(default_factory=dict)
+    settings: dict[str, str] = field(default_factory=dict)
+
+    def games_by_name(self) -> list[GameRef]:
+        return sorted(self.games.values(), key=lambda g: g.GameName)
+
+    def event_id(self, game_id: int, stream) -> Optional[int]:
+        return self.events.get((game_id, _stream(stream)))
+
+    def areas_for(self, game_id: int, stream) -> list[AreaRef]:
+        return self.areas_by_event.get((game_id, _stream(stream)), [])
+
+    def setting(self, key: str, default: str = "") -> str:
+        return self.settings.get(key, default)
+
+    def flag(self, key: str, default: str = "Yes") -> bool:
+        """Yes/No settings such as DRONE_TIMELAP_BONUS."""
+        return self.setting(key, default).strip().lower().startswith("y")
+
+
+_lock = threading.Lock()
+_generation = 0
+_current: Optional[RefData] = None
+
+
+def invalidate_refdata() -> None:
+    """Forget the snapshot; the next lookup reloads it."""
+    global _current, _generation
+    with _lock:
+        _generation += 1
+        _current = None
+
+
+def _load(db: Session, version: int) -> RefData:
+    games = {
+        gid: GameRef(gid, name, platform, mode, metric)
+        for gid, name, platform, mode, metric in db.execute(
+            select(Game.GameID, Game.GameName, Game.Platform, Game.ScoringMode, Game.FinalsMetric)
+        ).all()
+    }
+    rounds = [
+        RoundRef(*row)
+        for row in db.execute(select(Round.RoundID, Round.Label, Round.StartTime).order_by(Round.StartTime)).all()
+    ]
+    events = {
+        (gid, _stream(st)): eid
+        for eid, gid, st in db.execute(select(Event.EventID, Event.GameID, Event.Stream)).all()
+    }
+    areas: dict[int, AreaRef] = {}
+    by_event: dict[tuple[int, str], list[AreaRef]] = {}
+    for row in db.execute(select(Area.AreaID, Area.GameID, Area.Stream, Area.AreaName).order_by(Area.AreaID)).all():
+        a = AreaRef(*row)
+        areas[a.AreaID] = a
+        by_event.setdefault((a.GameID, _stream(a.Stream)), []).append(a)
+    settings = dict(db.execute(select(Setting.Key, Setting.Value)).all())
+    return RefData(version, games, rounds, events, areas, by_event, settings)
+
+
+def refdata(db: Session) -> RefData:
+    """The current reference-data snapshot (no queries once loaded)."""
+    global _current
+    with _lock:
+        if _current is not None:
+            return _current
+        generation = _generation
+    data = _load(db, generation)
+    with _lock:
+        # an invalidation while we were loading means these rows may be stale: use once, don't keep
+        if generation == _generation:
+            _current = data
+    return data
@@ -0,0 +1,181 @@
+"""
+Rescoring: bring MatchParticipant.PointsAwarded in line with the current
+points catalogue.
+
+PointsAwarded is fixed when a match is logged. After an admin changes a
+Points value or a per-game override, `rescore` recomputes every scored
+participant (Outcome set) as GamePoints[game, Outcome], else Points[Outcome],
+else 0, with one UPDATE ... FROM joined through Match -> Event, touching
+only rows whose value actually changes. The leaderboard totals move by
+the same differences in the same transaction, also set-based, so nothing
+is rebuilt and no row passes through Python. `rescore_preview` runs the
+same expression as a SELECT and reports how the ranking would move,
+without writing anything.
+
+    python -m app.rescore [--game ID] [--dry-run]
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import Optional
+
+from sqlalchemy import select, update, func, and_, case, literal, union_all
+from sqlalchemy.orm import Session
+
+from .db import (
+    SessionLocal, MatchParticipant, Match, Event, Points, GamePoints, Student, School,
+    StudentTotal, SchoolTotal, ALL_GAMES, ALL_STREAMS,
+)
+from .api import notify_results_changed
+
+
+def _rescored(game_id: Optional[int] = None):
+    """Subquery (MPID, UID4, GameID, Stream, old, new) for every scored participant in scope."""
+    new = func.coalesce(GamePoints.Value, Points.Value, 0)
+    q = (
+        select(
+            MatchParticipant.MPID.label("MPID"),
+            MatchParticipant.UID4.label("UID4"),
+            Event.GameID.label("GameID"),
+            Event.Stream.label("Stream"),
+            func.coalesce(MatchParticipant.PointsAwarded, 0).label("old"),
+            new.label("new"),
+        )
+        .join(Match, Match.MatchID == MatchParticipant.MatchID)
+        .join(Event, Event.EventID == Match.EventID)
+        .join(Points, Points.Code == MatchParticipant.Outcome, isouter=True)
+        .join(GamePoints, and_(GamePoints.GameID == Event.GameID, GamePoints.Code == MatchParticipant.Outcome), isouter=True)
+        .where(MatchParticipant.Outcome.isnot(None))
+    )
+    if game_id:
+        q = q.where(Event.GameID == int(game_id))
+    return q.subquery()
+
+
+def _ranks(points: dict[int, int]) -> dict[int, int]:
+    """Competition ranking (1, 2, 2, 4) by points, highest first."""
+    out, last, rank = {}, None, 0
+    for i, (uid, pts) in enumerate(sorted(points.items(), key=lambda kv: (-kv[1], kv[0])), 1):
+        if pts != last:
+            rank, last = i, pts
+        out[uid] = rank
+    return out
+
+
+def rescore_preview(db: Session, game_id: Optional[int] = None, limit: int = 50) -> dict:
+    """
+    What `rescore` would change: participant rows and points affected, and
+    the students whose rank (in the game, or overall) or points would move,
+    best new rank first. One grouped query, plus school names for the movers.
+    """
+    r = _rescored(game_id)
+    rows = db.execute(
+        select(
+            r.c.UID4, func.sum(r.c.old), func.sum(r.c.new), func.sum(case((r.c.new != r.c.old, 1), else_=0)),
+        ).group_by(r.c.UID4)
+    ).all()
+    before = {uid: int(old or 0) for uid, old, *_ in rows}
+    after = {uid: int(new or 0) for uid, _old, new, *_ in rows}
+    changed_rows = sum(int(n or 0) for *_, n in rows)
+    rank_before, rank_after = _ranks(before), _ranks(after)
+    moved = sorted((uid for uid in rank_after if rank_after[uid] != rank_before[uid] or after[uid] != before[uid]),
+                   key=lambda uid: (rank_after[uid], uid))[:limit]
+    schools = dict(
+        db.execute(
+            select(Student.UID4, School.SchoolName).join(School, School.SchoolID == Student.SchoolID)
+            .where(Student.UID4.in_(moved))
+        ).all()
+    ) if moved else {}
+    return {
+        "game_id": game_id,
+        "rows": changed_rows,
+        "points_delta": sum(after.values()) - sum(before.values()),
+        "students": sum(1 for uid in after if after[uid] != before[uid]),
+        "moves": [
+            {"uid": uid, "school": schools.get(uid, ""), "before_rank": rank_before[uid], "after_rank": rank_after[uid],
+             "before": before[uid], "after": after[uid]}
+            for uid in moved
+        ],
+    }
+
+
+def _total_deltas(r):
+    """
+    {totals model: subquery (key, g, s, delta)}: what each StudentTotals /
+    SchoolTotals row gains from the stale rows of `r`, every rollup shape in
+    one UNION ALL over a single grouped CTE.
+    """
+    base = (
+        select(r.c.UID4, Student.SchoolID, r.c.GameID, r.c.Stream, func.sum(r.c.new - r.c.old).label("delta"))
+        .join(Student, Student.UID4 == r.c.UID4, isouter=True)
+        .where(r.c.new != r.c.old)
+        .group_by(r.c.UID4, Student.SchoolID, r.c.GameID, r.c.Stream)
+        .cte("rescore_delta")
+    )
+    out = {}
+    for model, key in ((StudentTotal, base.c.UID4), (SchoolTotal, base.c.SchoolID)):
+        parts = []
+        for by_game in (True, False):
+            for by_stream in (True, False):
+                g = base.c.GameID if by_game else literal(ALL_GAMES)
+                s = base.c.Stream if by_stream else literal(ALL_STREAMS)
+                group = [key] + [c for c, on in ((base.c.GameID, by_game), (base.c.Stream, by_stream)) if on]
+                parts.append(
+                    select(key.label("key"), g.label("g"), s.label("s"), func.sum(base.c.delta).label("delta"))
+                    .where(key.isnot(None)).group_by(*group)
+                )
+        out[model] = union_all(*parts).subquery()
+    return out
+
+
+def rescore(db: Session, game_id: Optional[int] = None) -> int:
+    """
+    Rewrite stale PointsAwarded and move the totals by the difference, all
+    set-based: one UPDATE ... FROM per totals table, then one for the participants.
+    Commits; returns participant rows changed.
+    """
+    r = _rescored(game_id)
+    # totals first: their deltas are read from the not-yet-rewritten participants
+    for model, d in _total_deltas(r).items():
+        t = model.__table__
+        key = t.c.UID4 if model is StudentTotal else t.c.SchoolID
+        db.execute(
+            update(t)
+            .where(key == d.c.key, t.c.GameID == d.c.g, t.c.Stream == d.c.s)
+            .values(Points=t.c.Points + d.c.delta)
+        )
+    stale = select(r.c.MPID, r.c.new).where(r.c.new != r.c.old).subquery()
+    changed = db.execute(
+        update(MatchParticipant)
+        .where(MatchParticipant.MPID == stale.c.MPID)
+        .values(PointsAwarded=stale.c.new)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    if changed:
+        notify_results_changed()
+    return changed
+
+
+def main(argv: list[str]) -> int:
+    p = argparse.ArgumentParser(prog="python -m app.rescore", description="Recompute PointsAwarded from the points catalogue")
+    p.add_argument("--game", type=int, help="only this GameID")
+    p.add_argument("--dry-run", action="store_true", help="report rank changes without writing")
+    args = p.parse_args(argv)
+    db = SessionLocal()
+    try:
+        if args.dry_run:
+            pv = rescore_preview(db, args.game)
+            print(f"{pv['rows']} participant rows, {pv['students']} students, points {pv['points_delta']:+d}")
+            for m in pv["moves"]:
+                print(f"  {m['uid']} {m['school']}: #{m['before_rank']} ({m['before']}) -> #{m['after_rank']} ({m['after']})")
+            return 0
+        print(f"rescored {rescore(db, args.game)} participant rows")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,146 @@
+"""
+Student search for /admin/students and the logger typeahead.
+
+Names are matched by word prefix through a full-text index when one is
+available (SQLite FTS5 table kept in sync by triggers, or a SQL Server
+full-text index on Students) and by prefix LIKE otherwise. All-digit
+queries match UID4 prefixes as an index range. Results are keyset-paged
+by UID4 with the school eager-loaded.
+"""
+from __future__ import annotations
+
+import re
+from typing import Optional
+
+from sqlalchemy import select, text, and_, or_
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, joinedload
+
+from .db import Student, School
+
+_SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS StudentSearch USING fts5(FirstName, LastName, SchoolName, prefix='1 2 3')",
+    """CREATE TRIGGER IF NOT EXISTS trg_students_search_ai AFTER INSERT ON Students BEGIN
+         INSERT INTO StudentSearch(rowid, FirstName, LastName, SchoolName)
+         VALUES (new.StudentID, new.FirstName, new.LastName, (SELECT SchoolName FROM Schools WHERE SchoolID = new.SchoolID));
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_students_search_ad AFTER DELETE ON Students BEGIN
+         DELETE FROM StudentSearch WHERE rowid = old.StudentID;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_students_search_au AFTER UPDATE ON Students BEGIN
+         DELETE FROM StudentSearch WHERE rowid = old.StudentID;
+         INSERT INTO StudentSearch(rowid, FirstName, LastName, SchoolName)
+         VALUES (new.StudentID, new.FirstName, new.LastName, (SELECT SchoolName FROM Schools WHERE SchoolID = new.SchoolID));
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_schools_search_au AFTER UPDATE OF SchoolName ON Schools BEGIN
+         UPDATE StudentSearch SET SchoolName = new.SchoolName
+         WHERE rowid IN (SELECT StudentID FROM Students WHERE SchoolID = new.SchoolID);
+       END""",
+]
+
+_fulltext: dict[str, bool] = {}   # dialect name -> full-text index usable
+
+
+def install_search_index(engine: Engine) -> bool:
+    """Create (or detect) the full-text index for student names. Returns whether it is usable."""
+    name = engine.dialect.name
+    try:
+        with engine.begin() as conn:
+            if name == "sqlite":
+                fresh = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'StudentSearch'")).first() is None
+                for ddl in _SQLITE_DDL:
+                    conn.execute(text(ddl))
+                if fresh:
+                    conn.execute(text(
+                        "INSERT INTO StudentSearch(rowid, FirstName, LastName, SchoolName) "
+                        "SELECT s.StudentID, s.FirstName, s.LastName, c.SchoolName "
+                        "FROM Students s JOIN Schools c ON c.SchoolID = s.SchoolID"
+                    ))
+                _fulltext[name] = True
+            elif name == "mssql":
+                # needs Full-Text Search (SQL Express with Advanced Services or higher)
+                if conn.execute(text("SELECT FULLTEXTSERVICEPROPERTY('IsFullTextInstalled')")).scalar() != 1:
+                    _fulltext[name] = False
+                    return False
+                has = conn.execute(text(
+                    "SELECT 1 FROM sys.fulltext_indexes WHERE object_id = OBJECT_ID('Students')"
+                )).first()
+                if not has:
+                    pk = conn.execute(text(
+                        "SELECT name FROM sys.indexes WHERE object_id = OBJECT_ID('Students') AND is_primary_key = 1"
+                    )).scalar_one()
+                    if not conn.execute(text("SELECT 1 FROM sys.fulltext_catalogs WHERE name = 'seqel_ft'")).first():
+                        conn.execute(text("CREATE FULLTEXT CATALOG seqel_ft"))
+                    conn.execute(text(
+                        f"CREATE FULLTEXT INDEX ON Students(FirstName, LastName) KEY INDEX [{pk}] ON seqel_ft "
+                        "WITH CHANGE_TRACKING AUTO"
+                    ))
+                _fulltext[name] = True
+            else:
+                _fulltext[name] = False
+    except DBAPIError:
+        _fulltext[name] = False
+    return _fulltext[name]
+
+
+def _tokens(q: str) -> list[str]:
+    return re.findall(r"\w+", q or "")[:5]
+
+
+def _uid_range(digits: str) -> tuple[int, int]:
+    """'20' -> (2000, 2099): every 4-digit UID starting with those digits."""
+    digits = digits[:4]
+    width = 10 ** (4 - len(digits))
+    lo = int(digits) * width
+    return lo, lo + width - 1
+
+
+def _name_filter(db: Session, tokens: list[str]):
+    name = db.bind.dialect.name
+    if _fulltext.get(name) and name == "sqlite":
+        match = " AND ".join(f'"{t}"*' for t in tokens)
+        ids = select(text("rowid")).select_from(text("StudentSearch")).where(text("StudentSearch MATCH :m"))
+        return Student.StudentID.in_(ids.params(m=match))
+    if _fulltext.get(name) and name == "mssql":
+        cond = " AND ".join(f'"{t}*"' for t in tokens)
+        # school names are matched by prefix; they are few and indexed
+        return or_(
+            text("CONTAINS((Students.FirstName, Students.LastName), :c)").bindparams(c=cond),
+            and_(*[School.SchoolName.like(f"{t}%") for t in tokens]),
+        )
+    return and_(*[
+        or_(Student.FirstName.like(f"{t}%"), Student.LastName.like(f"{t}%"), School.SchoolName.like(f"{t}%"))
+        for t in tokens
+    ])
+
+
+def search_students(
+    db: Session, q: Optional[str] = None, after: Optional[int] = None, limit: int = 50
+) -> tuple[list[Student], Optional[int]]:
+    """
+    One page of students ordered by UID4, starting after UID4 `after`.
+    Returns (rows, next_after); next_after is None on the last page.
+    """
+    query = (
+        select(Student)
+        .join(School, School.SchoolID == Student.SchoolID)
+        .options(joinedload(Student.school))
+        .order_by(Student.UID4)
+        .limit(limit + 1)
+    )
+    q = (q or "").strip()
+    if q.isdigit():
+        lo, hi = _uid_range(q)
+        query = query.where(Student.UID4 >= lo, Student.UID4 <= hi)
+    elif q:
+        tokens = _tokens(q)
+        if tokens:
+            query = query.where(_name_filter(db, tokens))
+    if after is not None:
+        query = query.where(Student.UID4 > after)
+
+    rows = list(db.execute(query).scalars().unique())
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1].UID4
+    return rows, None
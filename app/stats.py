@@ -0,0 +1,94 @@
+"""
+Admin dashboard numbers.
+
+Every count on the admin landing page, plus the live operational figures
+(matches today, matches per round, areas active in the last
+ACTIVE_MINUTES, submissions per minute), comes from one UNION ALL
+statement returning (kind, key, value) rows. The result is kept for
+STATS_TTL seconds and dropped by `invalidate_stats()`, which
+`api.notify_results_changed` calls after every results write.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, func, literal, union_all, cast, String, distinct
+from sqlalchemy.orm import Session
+
+from .db import Points, Game, Round, Event, Area, School, Student, Match, server_now, day_window
+from .refdata import refdata
+
+STATS_TTL = float(os.getenv("STATS_TTL", "5"))
+ACTIVE_MINUTES = 15
+RATE_MINUTES = 5
+
+_COUNTED = {
+    "points": Points, "games": Game, "rounds": Round, "events": Event,
+    "areas": Area, "schools": School, "students": Student, "matches": Match,
+}
+
+_lock = threading.Lock()
+_generation = 0
+_cached: Optional[tuple[float, dict]] = None
+
+
+def invalidate_stats() -> None:
+    global _cached, _generation
+    with _lock:
+        _generation += 1
+        _cached = None
+
+
+def _query(now: datetime, today: datetime):
+    parts = [
+        select(literal("count"), literal(name), func.count()).select_from(model)
+        for name, model in _COUNTED.items()
+    ]
+    parts += [
+        select(literal("live"), literal("today"), func.count()).where(Match.CreatedAt >= today),
+        select(literal("live"), literal("recent"), func.count()).where(Match.CreatedAt >= now - timedelta(minutes=RATE_MINUTES)),
+        select(literal("live"), literal("active_areas"), func.count(distinct(Match.AreaID)))
+            .where(Match.CreatedAt >= now - timedelta(minutes=ACTIVE_MINUTES)),
+        select(literal("round"), cast(Match.RoundID, String), func.count()).group_by(Match.RoundID),
+    ]
+    return union_all(*parts)
+
+
+def compute_stats(db: Session) -> dict:
+    rows = db.execute(_query(server_now(db), day_window(db, date.today())[0])).all()
+    counts: dict[str, int] = {}
+    live: dict[str, int] = {}
+    per_round: dict[int, int] = {}
+    for kind, key, value in rows:
+        if kind == "count":
+            counts[key] = int(value)
+        elif kind == "live":
+            live[key] = int(value)
+        else:
+            per_round[int(key)] = int(value)
+    rounds = refdata(db).rounds
+    return {
+        "counts": counts,
+        "matches_today": live.get("today", 0),
+        "active_areas": live.get("active_areas", 0),
+        "per_minute": round(live.get("recent", 0) / RATE_MINUTES, 1),
+        "per_round": [{"round": r.Label, "matches": per_round[r.RoundID]} for r in rounds if r.RoundID in per_round],
+    }
+
+
+def admin_stats(db: Session) -> dict:
+    """Cached dashboard numbers (see module docstring)."""
+    global _cached
+    with _lock:
+        hit, generation = _cached, _generation
+    if hit and hit[0] > time.monotonic():
+        return hit[1]
+    stats = compute_stats(db)
+    with _lock:
+        if generation == _generation:   # a write landed meanwhile: serve once, don't keep
+            _cached = (time.monotonic() + STATS_TTL, stats)
+    return stats
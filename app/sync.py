@@ -0,0 +1,735 @@
+"""
+Venue node sync: a laptop runs the app on local SQLite and keeps logging
+while the link to the central SQL Server comes and goes.
+
+Results go up, master data comes down:
+
+  - push: local matches the central box does not have yet are sent in
+    batches of SYNC_BATCH as gzip-compressed JSON. Each match travels under a
+    globally unique key: its SubmissionKey if the logger's batch API gave it
+    one, otherwise "<SYNC_NODE_ID>-<uuid>", stored in SubmissionKeys before
+    the first send so a retry reuses it. SyncSent records, per key, what the
+    central box acknowledged, so what is sent never depends on MatchIDs (a
+    reset may hand them out again). Participants are identified by (match
+    key, row). Games, areas and rounds travel by name, players by UID4 and
+    CreatedAt in UTC (each side converts from and to its own clock). The
+    central side inserts each batch in one transaction with the same
+    executemany/RETURNING path as /logger/batch, skips keys it already has,
+    recomputes points from each Outcome with its own points table, moves
+    the totals and re-ranks finals. A match it cannot place (unknown game,
+    area or round) is refused on its own and reported by key; the venue
+    records the reason in SyncSent.Error and the sync status and does not
+    resend it. SyncSent is only written after the central box has
+    committed, so an interrupted sync resumes where it stopped and a
+    replayed batch is harmless.
+  - a match whose Cancelled/CancelReason changed after it went up is sent
+    again as a delta; the central side zeroes (or recomputes) its points
+    and moves the totals.
+  - pull: Points, Games, Rounds, Events, Areas, GamePoints, Schools and
+    Students are matched on their natural keys (MASTER below): new rows are
+    inserted, changed ones updated, and per-game overrides removed centrally
+    are removed here too. The snapshot's digest is kept in
+    SYNC_MASTER_DIGEST and an unchanged snapshot is not resent.
+
+Master data is owned centrally: on a node, adding schools or students
+(form or roster upload) is refused.
+
+The central box is reached over HTTP (SYNC_CENTRAL=https://..., served by
+/sync/push and /sync/master below, guarded by SYNC_TOKEN) or, on a trusted
+network, directly through its database URL.
+
+    python -m app.sync              # one pull + push, then exit
+    python -m app.sync --pull-only
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from dataclasses import dataclass, field
+from datetime import datetime, time as dtime
+from enum import Enum
+from typing import Any, Optional
+from uuid import uuid4
+
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import Response
+from sqlalchemy import (
+    select, insert, update, delete, func, bindparam, or_, and_, create_engine, DateTime, Time, Enum as SAEnum,
+)
+from sqlalchemy.orm import Session, sessionmaker
+
+from .db import (
+    SessionLocal, Setting, Points, Game, Round, Event, Area, GamePoints, School, Student,
+    Match, MatchParticipant, SubmissionKey, SyncSent, UIDPool, UIDFree, _engine_kwargs,
+    db_clock_to_utc, utc_to_db_clock, server_now,
+)
+from .totals import apply_points_many, rebuild_totals
+from .finals import evaluate_finals, FINALS_STAGE
+from .api import notify_results_changed
+from .db_async import run_write, read_db
+
+SYNC_NODE_ID = os.getenv("SYNC_NODE_ID", "")
+SYNC_CENTRAL = os.getenv("SYNC_CENTRAL", "")
+SYNC_TOKEN = os.getenv("SYNC_TOKEN", "")
+SYNC_INTERVAL = float(os.getenv("SYNC_INTERVAL", "30"))
+SYNC_BATCH = int(os.getenv("SYNC_BATCH", "1000"))
+
+DIGEST_KEY = "SYNC_MASTER_DIGEST"
+
+log = logging.getLogger("uvicorn.error")
+
+
+# ---- wire format
+
+def _pack(obj: Any) -> bytes:
+    return gzip.compress(json.dumps(obj, separators=(",", ":")).encode("utf-8"), compresslevel=6)
+
+
+def _unpack(blob: bytes) -> Any:
+    return json.loads(gzip.decompress(blob))
+
+
+def _dump(value: Any) -> Any:
+    if isinstance(value, (datetime, dtime)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _load(col, value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(col.type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(col.type, Time):
+        return dtime.fromisoformat(value)
+    if isinstance(col.type, SAEnum) and col.type.enum_class is not None:
+        return col.type.enum_class(value)
+    return value
+
+
+# ---- settings rows used as sync state
+
+def _get(db: Session, key: str) -> Optional[str]:
+    return db.execute(select(Setting.Value).where(Setting.Key == key)).scalar()
+
+
+def _put(db: Session, key: str, value: str) -> None:
+    if db.execute(update(Setting).where(Setting.Key == key).values(Value=value)).rowcount == 0:
+        db.execute(insert(Setting).values(Key=key, Value=value))
+
+
+def _unsent(*cols):
+    """SELECT `cols` for local matches not yet on the central box, or whose cancellation changed since."""
+    return (
+        select(*cols)
+        .select_from(Match)
+        .join(SubmissionKey, SubmissionKey.MatchID == Match.MatchID, isouter=True)
+        .join(SyncSent, SyncSent.Key == SubmissionKey.Key, isouter=True)
+        .where(or_(
+            SyncSent.Key.is_(None),
+            and_(SyncSent.Error.is_(None), or_(
+                SyncSent.Cancelled != Match.Cancelled,
+                func.coalesce(SyncSent.CancelReason, "") != func.coalesce(Match.CancelReason, ""),
+            )),
+        ))
+    )
+
+
+def pending_matches(db: Session) -> int:
+    return db.execute(select(func.count()).select_from(_unsent(Match.MatchID).subquery())).scalar_one()
+
+
+def rejected_matches(db: Session) -> int:
+    return db.execute(select(func.count()).select_from(SyncSent).where(SyncSent.Error.isnot(None))).scalar_one()
+
+
+def mark_sent(db: Session, sent: list[dict], errors: dict[str, str]) -> None:
+    """Record what the central box now holds for each key of a pushed batch. Does not commit."""
+    keys = [row["Key"] for row in sent]
+    db.execute(delete(SyncSent).where(SyncSent.Key.in_(keys)))
+    db.execute(insert(SyncSent), [{**row, "Error": errors.get(row["Key"])} for row in sent])
+
+
+# ---- natural keys: IDs differ between boxes, these don't
+
+@dataclass(frozen=True)
+class MasterSpec:
+    model: type
+    key: tuple[str, ...]                                         # natural key, after `refs` translation
+    refs: dict[str, tuple[type, str]] = field(default_factory=dict)   # FK column -> (parent, its natural key)
+    prune: bool = False                                          # delete local rows missing centrally
+
+    @property
+    def columns(self) -> list:
+        """Every column except a surrogate primary key."""
+        t = self.model.__table__
+        return [c for c in t.columns if not (c.primary_key and c.name not in self.key)]
+
+
+_BY_GAME = {"GameID": (Game, "GameName")}
+
+# parents before children; only GamePoints has no results pointing at it, so only it is pruned
+MASTER = (
+    MasterSpec(Points, ("Code",)),
+    MasterSpec(Game, ("GameName",)),
+    MasterSpec(Round, ("Label",)),
+    MasterSpec(Event, ("GameID", "Stream"), _BY_GAME),
+    MasterSpec(Area, ("GameID", "Stream", "AreaName"), _BY_GAME),
+    MasterSpec(GamePoints, ("GameID", "Code"), _BY_GAME, prune=True),
+    MasterSpec(School, ("SchoolUID4",)),
+    MasterSpec(Student, ("UID4",), {"SchoolID": (School, "SchoolUID4")}),
+)
+
+
+def _natural(db: Session, parent: type, name: str) -> dict[int, Any]:
+    """{local primary key: natural key} for a parent table."""
+    (pk,) = parent.__table__.primary_key.columns
+    return dict(db.execute(select(pk, parent.__table__.c[name])).all())
+
+
+def _places(db: Session) -> tuple[dict, dict, dict]:
+    """Local {EventID: (game, stream)}, {AreaID: area name}, {RoundID: label}."""
+    games = _natural(db, Game, "GameName")
+    events = {eid: (games[gid], _dump(st)) for eid, gid, st in db.execute(select(Event.EventID, Event.GameID, Event.Stream))}
+    return events, _natural(db, Area, "AreaName"), _natural(db, Round, "Label")
+
+
+# ---- push (venue side, then central side)
+
+def collect_push(db: Session, node_id: str, limit: int) -> tuple[Optional[bytes], list[dict]]:
+    """
+    The next batch of unsent local matches as a compressed payload: new
+    matches in full, already-pushed ones whose cancellation changed as a
+    delta. Returns (blob, [{Key, Cancelled, CancelReason}, ...] for
+    `mark_sent`); blob is None when there is nothing to send. Commits any
+    keys it had to assign.
+    """
+    rows = db.execute(
+        _unsent(Match.MatchID, Match.EventID, Match.AreaID, Match.RoundID, Match.Stage, Match.Cancelled,
+                Match.CancelReason, Match.CreatedAt, SubmissionKey.Key, SyncSent.Key.label("Sent"))
+        .order_by(Match.MatchID).limit(limit)
+    ).all()
+    if not rows:
+        return None, []
+    keys = {r.MatchID: r.Key for r in rows if r.Key is not None}
+    missing = [{"Key": f"{node_id[:24]}-{uuid4().hex}", "MatchID": r.MatchID} for r in rows if r.Key is None]
+    if missing:
+        db.execute(insert(SubmissionKey), missing)
+        db.commit()   # before sending: a retry must reuse the same keys
+        keys.update((m["MatchID"], m["Key"]) for m in missing)
+    cancels = [{"key": r.Key, "Cancelled": bool(r.Cancelled), "CancelReason": r.CancelReason}
+               for r in rows if r.Sent is not None]
+    rows = [r for r in rows if r.Sent is None]
+    ids = [r.MatchID for r in rows]
+
+    parts: dict[int, list[list]] = {}
+    for mid, uid, slot, outcome, metric in db.execute(
+        select(MatchParticipant.MatchID, MatchParticipant.UID4, MatchParticipant.Slot, MatchParticipant.Outcome,
+               MatchParticipant.MetricValueMs)
+        .where(MatchParticipant.MatchID.in_(ids)).order_by(MatchParticipant.MPID)
+    ).all():
+        parts.setdefault(mid, []).append([uid, slot, outcome, metric])
+
+    events, areas, rounds = _places(db)
+    matches = [
+        {"key": keys[r.MatchID], "Game": events[r.EventID][0], "Stream": events[r.EventID][1],
+         "Area": areas[r.AreaID], "Round": rounds[r.RoundID], "Stage": r.Stage,
+         "Cancelled": bool(r.Cancelled), "CancelReason": r.CancelReason,
+         "CreatedAtUtc": _dump(db_clock_to_utc(db, r.CreatedAt)) if r.CreatedAt else None,
+         "participants": parts.get(r.MatchID, [])}
+        for r in rows
+    ]
+    sent = [{"Key": keys[r.MatchID], "Cancelled": bool(r.Cancelled), "CancelReason": r.CancelReason} for r in rows]
+    sent += [{"Key": c["key"], "Cancelled": c["Cancelled"], "CancelReason": c["CancelReason"]} for c in cancels]
+    return _pack({"node": node_id, "matches": matches, "cancels": cancels}), sent
+
+
+def _points_table(db: Session, game_ids) -> dict[tuple[int, str], int]:
+    """{(GameID, code): value} with per-game overrides over the global values, read from `db` itself."""
+    defaults = dict(db.execute(select(Points.Code, Points.Value)).all())
+    table = {(gid, code): value for gid in game_ids for code, value in defaults.items()}
+    table.update(((gid, code), value) for gid, code, value in db.execute(
+        select(GamePoints.GameID, GamePoints.Code, GamePoints.Value).where(GamePoints.GameID.in_(list(game_ids)))
+    ))
+    return table
+
+
+def apply_push(db: Session, blob: bytes) -> dict:
+    """
+    Central side: merge one pushed batch in a single transaction. Keys
+    already present are skipped, so replays are safe. Places arrive by name
+    and points are recomputed from each Outcome with this database's points
+    table; finals entries arrive unplaced and are re-ranked here against
+    every venue's attempts. Cancellation deltas zero or restore the points
+    of matches pushed earlier. A match naming a game, area or round this
+    database does not have is refused on its own. Returns per-key results
+    ("created", "duplicate", "updated" or "error"), as /logger/batch does.
+    """
+    data = _unpack(blob)
+    items = data["matches"]
+    keys = [m["key"] for m in items]
+    done = set(db.execute(select(SubmissionKey.Key).where(SubmissionKey.Key.in_(keys))).scalars()) if keys else set()
+
+    games = {name: gid for gid, name in _natural(db, Game, "GameName").items()}
+    events = {(games_name, _dump(st)): (eid, gid) for eid, gid, st, games_name in db.execute(
+        select(Event.EventID, Event.GameID, Event.Stream, Game.GameName).join(Game, Game.GameID == Event.GameID)
+    )}
+    areas = {(gid, _dump(st), name): aid for aid, gid, st, name in db.execute(
+        select(Area.AreaID, Area.GameID, Area.Stream, Area.AreaName)
+    )}
+    rounds = {label: rid for rid, label in _natural(db, Round, "Label").items()}
+    results: dict[str, dict] = {}
+    new, resolved = [], []
+    for m in items:
+        k = m["key"]
+        if k in done or k in results:
+            results.setdefault(k, {"key": k, "status": "duplicate"})
+            continue
+        ev = events.get((m["Game"], m["Stream"]))
+        area = areas.get((ev[1], m["Stream"], m["Area"])) if ev else None
+        error = ("UnknownEvent" if ev is None else "UnknownArea" if area is None
+                 else "UnknownRound" if m["Round"] not in rounds else None)
+        if error:
+            results[k] = {"key": k, "status": "error", "error": error}
+            continue
+        results[k] = {"key": k, "status": "created"}
+        new.append(m)
+        resolved.append((ev[0], ev[1], area, rounds[m["Round"]]))
+
+    awards: dict[tuple[int, Any], list[tuple[int, int]]] = {}
+    finals: set[int] = set()
+    if new:
+        match_ids = db.execute(
+            insert(Match).returning(Match.MatchID, sort_by_parameter_order=True),
+            [{"EventID": eid, "AreaID": aid, "RoundID": rid, "Stage": m["Stage"],
+              "Cancelled": m["Cancelled"], "CancelReason": m["CancelReason"],
+              "CreatedAt": utc_to_db_clock(db, datetime.fromisoformat(m["CreatedAtUtc"])) if m["CreatedAtUtc"] else server_now(db)}
+             for m, (eid, _gid, aid, rid) in zip(new, resolved)],
+        ).scalars().all()
+
+        points = _points_table(db, {gid for _eid, gid, _a, _r in resolved})
+        rows = []
+        for m, (eid, gid, _aid, _rid), mid in zip(new, resolved, match_ids):
+            is_final = m["Stage"] == FINALS_STAGE
+            if is_final and not m["Cancelled"]:
+                finals.add(eid)
+            for uid, slot, outcome, metric in m["participants"]:
+                if is_final:
+                    outcome = None
+                pts = (points.get((gid, outcome)) or 0) if outcome and not m["Cancelled"] else 0
+                rows.append({"MatchID": mid, "UID4": uid, "Slot": slot, "Outcome": outcome,
+                             "PointsAwarded": pts, "MetricValueMs": metric})
+                awards.setdefault((gid, m["Stream"]), []).append((uid, pts))
+        if rows:
+            db.execute(insert(MatchParticipant.__table__), rows)
+        db.execute(insert(SubmissionKey), [{"Key": m["key"], "MatchID": mid} for m, mid in zip(new, match_ids)])
+
+    for c in data.get("cancels", []):
+        results[c["key"]] = _apply_cancel(db, c, awards, finals)
+
+    apply_points_many(db, awards)
+    if finals:
+        evaluate_finals(db, finals)
+    db.commit()
+    out = list(results.values())
+    counts = {status: sum(r["status"] == status for r in out) for status in ("created", "duplicate", "updated", "error")}
+    if counts["created"] or counts["updated"]:
+        notify_results_changed()
+    return {"received": len(items), **counts, "results": out}
+
+
+def _apply_cancel(db: Session, c: dict, awards: dict, finals: set[int]) -> dict:
+    """
+    Bring a pushed match's cancellation in line with the venue: a cancelled
+    match scores nothing, an un-cancelled one is rescored from its Outcomes.
+    Point changes are added to `awards`, finals events to `finals`.
+    """
+    k = c["key"]
+    m = db.execute(
+        select(Match.MatchID, Match.EventID, Match.Stage, Match.Cancelled, Event.GameID, Event.Stream)
+        .join(Event, Event.EventID == Match.EventID)
+        .join(SubmissionKey, SubmissionKey.MatchID == Match.MatchID)
+        .where(SubmissionKey.Key == k)
+    ).first()
+    if m is None:
+        return {"key": k, "status": "error", "error": "UnknownMatch"}
+    values = {"Cancelled": c["Cancelled"], "CancelReason": c["CancelReason"]}
+    if bool(m.Cancelled) != c["Cancelled"]:
+        is_final = m.Stage == FINALS_STAGE
+        points = _points_table(db, {m.GameID})
+        parts = db.execute(
+            select(MatchParticipant.MPID, MatchParticipant.UID4, MatchParticipant.Outcome, MatchParticipant.PointsAwarded)
+            .where(MatchParticipant.MatchID == m.MatchID)
+        ).all()
+        changed = []
+        for mpid, uid, outcome, old in parts:
+            pts = 0 if c["Cancelled"] or is_final or not outcome else (points.get((m.GameID, outcome)) or 0)
+            changed.append({"k_mpid": mpid, "k_pts": pts, "k_outcome": None if is_final else outcome})
+            awards.setdefault((m.GameID, m.Stream), []).append((uid, pts - (old or 0)))
+        if changed:
+            t = MatchParticipant.__table__
+            db.execute(
+                update(t).where(t.c.MPID == bindparam("k_mpid"))
+                .values(PointsAwarded=bindparam("k_pts"), Outcome=bindparam("k_outcome")),
+                changed,
+            )
+        if is_final:
+            finals.add(m.EventID)
+    db.execute(update(Match).where(Match.MatchID == m.MatchID).values(**values))
+    return {"key": k, "status": "updated"}
+
+
+# ---- pull (central side, then venue side)
+
+def _snapshot(db: Session) -> dict[str, list[list]]:
+    out = {}
+    for spec in MASTER:
+        names = {col: _natural(db, parent, name) for col, (parent, name) in spec.refs.items()}
+        cols = spec.columns
+        out[spec.model.__tablename__] = sorted(
+            ([_dump(names[c.name][v]) if c.name in names else _dump(v) for c, v in zip(cols, row)]
+             for row in db.execute(select(*cols)).all()),
+            key=json.dumps,
+        )
+    return out
+
+
+def export_master(db: Session, digest: Optional[str] = None) -> Optional[bytes]:
+    """Central side: the master tables as a compressed snapshot, or None if its digest equals `digest`."""
+    tables = _snapshot(db)
+    d = hashlib.sha1(json.dumps(tables, separators=(",", ":")).encode("utf-8")).hexdigest()
+    if d == digest:
+        return None
+    return _pack({"digest": d, "columns": {s.model.__tablename__: [c.name for c in s.columns] for s in MASTER},
+                  "tables": tables})
+
+
+def apply_master(db: Session, blob: bytes) -> dict[str, int]:
+    """
+    Venue side: bring the local master tables in line with a snapshot.
+    Rows are matched on their natural keys (MASTER), so local primary keys
+    never need to agree with the central ones. Rows missing centrally are
+    kept (local results may point at them), except in pruned tables. When a
+    student has moved school the totals are rebuilt, so school boards
+    credit the new school. Commits. Returns {table: rows written}.
+    """
+    data = _unpack(blob)
+    written: dict[str, int] = {}
+    moved = False
+    for spec in MASTER:
+        t = spec.model.__table__
+        cols = [t.c[n] for n in data["columns"][t.name]]
+        (pk,) = t.primary_key.columns
+        local = {col: {v: k for k, v in _natural(db, parent, name).items()} for col, (parent, name) in spec.refs.items()}
+        incoming = {}
+        for raw in data["tables"].get(t.name, []):
+            row = {c.name: local[c.name].get(v) if c.name in local else _load(c, v) for c, v in zip(cols, raw)}
+            incoming[tuple(row[k] for k in spec.key)] = row
+        have = {}
+        for row in db.execute(select(pk.label("_pk"), *cols)).mappings():
+            row = dict(row)
+            have[tuple(row[k] for k in spec.key)] = (row.pop("_pk"), row)
+        inserts = [row for key, row in incoming.items() if key not in have]
+        updates = [{"k_pk": have[key][0], **{"k_" + k: v for k, v in row.items()}}
+                   for key, row in incoming.items() if key in have and have[key][1] != row]
+        gone = [have[key][0] for key in have if key not in incoming] if spec.prune else []
+        if spec.model is Student:
+            moved = any(have[key][1]["SchoolID"] != row["SchoolID"] for key, row in incoming.items() if key in have)
+        if inserts:
+            db.execute(insert(t), inserts)
+        if updates:
+            db.execute(
+                update(t).where(pk == bindparam("k_pk")).values({c.name: bindparam("k_" + c.name) for c in cols}),
+                updates,
+            )
+        if gone:
+            db.execute(delete(t).where(pk.in_(gone)))
+        written[t.name] = len(inserts) + len(updates) + len(gone)
+    if written["Schools"] or written["Students"]:
+        # UIDs came from the central allocator: rebuild the local pools from the tables
+        db.execute(delete(UIDFree))
+        db.execute(delete(UIDPool))
+        from .uids import sync_uid_pools
+        sync_uid_pools(db)   # commits
+    _put(db, DIGEST_KEY, data["digest"])
+    db.commit()
+    if moved:
+        rebuild_totals(db)   # commits
+    if any(written.values()):
+        from .utils import invalidate_points_cache
+        from .refdata import invalidate_refdata
+        from .admin.schools import invalidate_school_options
+        invalidate_points_cache()
+        invalidate_refdata()
+        invalidate_school_options()
+        notify_results_changed()
+    return written
+
+
+# ---- transports
+
+class DatabaseCentral:
+    """The central database reached directly (trusted network, or a fake central in tests)."""
+
+    def __init__(self, url: str):
+        self.engine = create_engine(url, **_engine_kwargs(url))
+        self.Session = sessionmaker(bind=self.engine, autoflush=False, autocommit=False)
+
+    def describe(self) -> str:
+        return self.engine.url.render_as_string(hide_password=True)
+
+    def push(self, blob: bytes) -> dict:
+        with self.Session() as db:
+            return apply_push(db, blob)
+
+    def master(self, digest: Optional[str]) -> Optional[bytes]:
+        with self.Session() as db:
+            return export_master(db, digest)
+
+
+class HttpCentral:
+    """The central app's /sync routes."""
+
+    def __init__(self, base_url: str, token: str = "", timeout: float = 60.0):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+
+    def describe(self) -> str:
+        return self.base_url
+
+    def _open(self, path: str, data: Optional[bytes] = None):
+        headers = {"X-Sync-Token": self.token}
+        if data is not None:
+            headers["Content-Type"] = "application/gzip"
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method="POST" if data is not None else "GET")
+        return urllib.request.urlopen(req, timeout=self.timeout)
+
+    def push(self, blob: bytes) -> dict:
+        with self._open("/sync/push", blob) as resp:
+            return json.loads(resp.read())
+
+    def master(self, digest: Optional[str]) -> Optional[bytes]:
+        try:
+            with self._open("/sync/master?" + urllib.parse.urlencode({"digest": digest or ""})) as resp:
+                return resp.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return None
+            raise
+
+
+def central_from_url(url: str, token: str = ""):
+    return HttpCentral(url, token) if url.startswith(("http://", "https://")) else DatabaseCentral(url)
+
+
+# ---- service
+
+@dataclass
+class SyncStatus:
+    node: str
+    central: str
+    runs: int = 0
+    last_started: Optional[float] = None
+    last_finished: Optional[float] = None
+    last_ms: float = 0.0
+    last_error: Optional[str] = None
+    pushed: int = 0            # matches created centrally
+    duplicates: int = 0        # matches the central box already had
+    updated: int = 0           # cancellation changes applied centrally
+    rejected: int = 0          # matches the central box refused (SyncSent.Error), not resent
+    last_rejected: Optional[str] = None
+    batches: int = 0
+    bytes_sent: int = 0
+    pending: int = 0
+    pulled: dict = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {"node": self.node, "central": self.central, "runs": self.runs, "last_started": self.last_started,
+                "last_finished": self.last_finished, "last_ms": round(self.last_ms, 1), "last_error": self.last_error,
+                "pushed": self.pushed, "duplicates": self.duplicates, "updated": self.updated,
+                "rejected": self.rejected, "last_rejected": self.last_rejected, "batches": self.batches,
+                "bytes_sent": self.bytes_sent, "pending": self.pending, "pulled": self.pulled}
+
+
+class SyncService:
+    def __init__(self, central, node_id: str, batch: int = SYNC_BATCH, interval: float = SYNC_INTERVAL,
+                 session_factory=SessionLocal):
+        if not node_id:
+            raise ValueError("SYNC_NODE_ID is required on a venue node")
+        self.central = central
+        self.node_id = node_id
+        self.batch = batch
+        self.interval = interval
+        self.session_factory = session_factory
+        self.status = SyncStatus(node=node_id, central=central.describe())
+        self._running = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def pull(self, db: Session) -> dict[str, int]:
+        blob = self.central.master(_get(db, DIGEST_KEY))
+        return apply_master(db, blob) if blob is not None else {}
+
+    def push(self, db: Session) -> None:
+        while True:
+            blob, sent = collect_push(db, self.node_id, self.batch)
+            if blob is None:
+                return
+            result = self.central.push(blob)
+            errors = {r["key"]: r["error"] for r in result["results"] if r["status"] == "error"}
+            mark_sent(db, sent, errors)   # only once the central box has committed the batch
+            db.commit()
+            for key, error in errors.items():
+                log.warning("sync push: central refused %s (%s)", key, error)
+                self.status.last_rejected = f"{key}: {error}"
+            self.status.pushed += result["created"]
+            self.status.duplicates += result["duplicate"]
+            self.status.updated += result["updated"]
+            self.status.batches += 1
+            self.status.bytes_sent += len(blob)
+
+    def run_once(self, pull: bool = True) -> dict:
+        """Pull master data, then push everything the central box does not have. Returns the status."""
+        if not self._running.acquire(blocking=False):
+            return self.status.as_dict()   # a run is already in progress
+        st = self.status
+        st.runs += 1
+        st.last_started = time.time()
+        started = time.perf_counter()
+        db = self.session_factory()
+        errors = []
+        try:
+            # a failed pull must not hold results back: push runs either way
+            for step in ((self.pull,) if pull else ()) + (self.push,):
+                try:
+                    out = step(db)
+                    if step == self.pull:
+                        st.pulled = out
+                except Exception as e:   # central box unreachable: nothing marked sent, try again later
+                    db.rollback()
+                    errors.append(f"{step.__name__}: {e}")
+                    log.warning("sync %s: %s", step.__name__, e)
+            st.last_error = "; ".join(errors) or None
+        finally:
+            try:
+                st.pending = pending_matches(db)
+                st.rejected = rejected_matches(db)
+            finally:
+                db.close()
+            st.last_ms = (time.perf_counter() - started) * 1000
+            st.last_finished = time.time()
+            self._running.release()
+        return st.as_dict()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._loop, name="venue-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _loop(self) -> None:
+        while not self._stopping:
+            self.run_once()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+def is_venue_node() -> bool:
+    return bool(SYNC_NODE_ID and SYNC_CENTRAL)
+
+
+def require_central_master() -> None:
+    """Dependency for routes that add schools or students: refused on a venue node."""
+    if is_venue_node():
+        raise HTTPException(status_code=409, detail="Schools and students are managed on the central box")
+
+
+def venue_service() -> Optional[SyncService]:
+    """The node's sync service if SYNC_NODE_ID and SYNC_CENTRAL are set."""
+    global _service
+    if _service is None and is_venue_node():
+        _service = SyncService(central_from_url(SYNC_CENTRAL, SYNC_TOKEN), SYNC_NODE_ID)
+    return _service
+
+_service: Optional[SyncService] = None
+
+
+# ---- central routes
+
+router = APIRouter(prefix="/sync", include_in_schema=False)
+
+def _check_token(request: Request) -> None:
+    if SYNC_TOKEN and request.headers.get("X-Sync-Token") != SYNC_TOKEN:
+        raise HTTPException(status_code=403, detail="Bad sync token")
+
+@router.post("/push")
+async def sync_push(request: Request):
+    _check_token(request)
+    blob = await request.body()
+    try:
+        return await run_write(apply_push, blob)
+    except (ValueError, OSError, KeyError) as e:   # unknown references, or a corrupt payload
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/master")
+async def sync_master(request: Request, digest: str = ""):
+    _check_token(request)
+    blob = await read_db(export_master, digest or None)
+    if blob is None:
+        return Response(status_code=304)
+    return Response(blob, media_type="application/gzip")
+
+
+def main(argv: list[str]) -> int:
+    p = argparse.ArgumentParser(prog="python -m app.sync", description="Sync this venue node with the central database")
+    p.add_argument("--central", default=SYNC_CENTRAL, help="central app URL or database URL (default SYNC_CENTRAL)")
+    p.add_argument("--node", default=SYNC_NODE_ID, help="this venue's node id (default SYNC_NODE_ID)")
+    p.add_argument("--pull-only", action="store_true", help="only refresh master data")
+    args = p.parse_args(argv)
+    if not args.central or not args.node:
+        p.error("--central and --node (or SYNC_CENTRAL and SYNC_NODE_ID) are required")
+    service = SyncService(central_from_url(args.central, SYNC_TOKEN), args.node)
+    if args.pull_only:
+        db = SessionLocal()
+        try:
+            print(f"pulled {service.pull(db)}")
+        finally:
+            db.close()
+        return 0
+    st = service.run_once()
+    print(f"pushed {st['pushed']} match(es) in {st['batches']} batch(es), {st['bytes_sent']} bytes, "
+          f"{st['duplicates']} already central, {st['updated']} cancellation(s) updated, {st['pending']} pending, "
+          f"{st['rejected']} refused, {st['last_ms']} ms")
+    if st["last_error"]:
+        print(f"error: {st['last_error']}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,321 @@
+"""
+Materialized leaderboard totals.
+
+StudentTotals / SchoolTotals hold running sums of MatchParticipant.PointsAwarded
+per (game, stream), plus rollup rows for "every game" (GameID=ALL_GAMES) and
+"both streams" (Stream=ALL_STREAMS). Writers call `apply_points` inside the
+same transaction that adds the participants, so reading a board is a single
+indexed top-N over the totals instead of an aggregate over every result.
+
+    python -m app.totals rebuild   # recompute from MatchParticipants
+    python -m app.totals check     # compare stored totals with the raw table
+"""
+from __future__ import annotations
+
+import sys
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import select, insert, update, delete, func, literal, bindparam, distinct
+from sqlalchemy.orm import Session
+
+from .db import (
+    SessionLocal, MatchParticipant, Match, Event, Game, Student, School,
+    StudentTotal, SchoolTotal, StreamEnum, ALL_GAMES, ALL_STREAMS,
+)
+from .leaderboard import student_ranking
+
+
+def _stream_key(stream) -> str:
+    if isinstance(stream, StreamEnum):
+        return stream.value
+    return str(stream)
+
+
+def _scopes(game_id: int, stream: str) -> list[Tuple[int, str]]:
+    return [
+        (game_id, stream),
+        (game_id, ALL_STREAMS),
+        (ALL_GAMES, stream),
+        (ALL_GAMES, ALL_STREAMS),
+    ]
+
+
+def apply_points(db: Session, game_id: int, stream, awards: Iterable[Tuple[int, int]]) -> None:
+    """
+    Add `awards` [(uid, points), ...] for one game/stream to the totals.
+    Does not commit: call it before the commit that stores the participants.
+    Zero-point awards still register the student as a participant.
+    """
+    apply_points_many(db, {(game_id, stream): awards})
+
+
+IN_CHUNK = 1000   # keeps IN lists under SQL Server's 2100-parameter limit
+
+
+def _in_chunks(db: Session, stmt_for, keys) -> list:
+    keys = list(keys)
+    out = []
+    for i in range(0, len(keys), IN_CHUNK):
+        out += map(tuple, db.execute(stmt_for(keys[i:i + IN_CHUNK])))
+    return out
+
+
+def apply_points_many(db: Session, awards: dict[Tuple[int, object], Iterable[Tuple[int, int]]]) -> None:
+    """
+    `apply_points` for several game/streams at once ({(game_id, stream): awards}).
+    Each totals row, the shared rollups included, is written once however
+    many games the awards span.
+    """
+    per_key: dict[Tuple[int, int, str], int] = {}   # (uid, game, stream) -> points
+    for (game_id, stream), rows in awards.items():
+        scopes = _scopes(int(game_id), _stream_key(stream))
+        for uid, pts in rows:
+            if uid is None:
+                continue
+            for g, s in scopes:
+                key = (int(uid), g, s)
+                per_key[key] = per_key.get(key, 0) + int(pts or 0)
+    if not per_key:
+        return
+
+    uids = {uid for uid, _, _ in per_key}
+    games = {g for _, g, _ in per_key}
+    streams = {s for _, _, s in per_key}
+    school_of = dict(_in_chunks(db, lambda ch: select(Student.UID4, Student.SchoolID).where(Student.UID4.in_(ch)), uids))
+
+    # --- students
+    have = set(_in_chunks(db, lambda ch: select(StudentTotal.UID4, StudentTotal.GameID, StudentTotal.Stream).where(
+        StudentTotal.UID4.in_(ch), StudentTotal.GameID.in_(games), StudentTotal.Stream.in_(streams),
+    ), uids))
+    new_rows, bumps = [], []
+    new_students: dict[Tuple[int, int, str], int] = {}
+    per_school: dict[Tuple[int, int, str], int] = {}
+    for (uid, g, s), pts in per_key.items():
+        sid = school_of.get(uid)
+        if (uid, g, s) in have:
+            bumps.append({"k_uid": uid, "k_game": g, "k_stream": s, "delta": pts})
+        else:
+            new_rows.append({"UID4": uid, "GameID": g, "Stream": s, "SchoolID": sid, "Points": pts})
+            if sid is not None:
+                new_students[(sid, g, s)] = new_students.get((sid, g, s), 0) + 1
+        if sid is not None:
+            per_school[(sid, g, s)] = per_school.get((sid, g, s), 0) + pts
+    if new_rows:
+        db.execute(insert(StudentTotal.__table__), new_rows)
+    if bumps:
+        t = StudentTotal.__table__
+        db.execute(
+            update(t)
+            .where(t.c.UID4 == bindparam("k_uid"), t.c.GameID == bindparam("k_game"), t.c.Stream == bindparam("k_stream"))
+            .values(Points=t.c.Points + bindparam("delta")),
+            bumps,
+        )
+
+    # --- schools
+    if not per_school:
+        return
+    have = set(_in_chunks(db, lambda ch: select(SchoolTotal.SchoolID, SchoolTotal.GameID, SchoolTotal.Stream).where(
+        SchoolTotal.SchoolID.in_(ch), SchoolTotal.GameID.in_(games), SchoolTotal.Stream.in_(streams),
+    ), {sid for sid, _, _ in per_school}))
+    new_rows, bumps = [], []
+    for (sid, g, s), pts in per_school.items():
+        added = new_students.get((sid, g, s), 0)
+        if (sid, g, s) in have:
+            bumps.append({"k_sid": sid, "k_game": g, "k_stream": s, "delta": pts, "added": added})
+        else:
+            new_rows.append({"SchoolID": sid, "GameID": g, "Stream": s, "Points": pts, "Students": added})
+    if new_rows:
+        db.execute(insert(SchoolTotal.__table__), new_rows)
+    if bumps:
+        t = SchoolTotal.__table__
+        db.execute(
+            update(t)
+            .where(t.c.SchoolID == bindparam("k_sid"), t.c.GameID == bindparam("k_game"), t.c.Stream == bindparam("k_stream"))
+            .values(Points=t.c.Points + bindparam("delta"), Students=t.c.Students + bindparam("added")),
+            bumps,
+        )
+
+
+def top_students(db: Session, game_id: Optional[int] = None, stream: Optional[str] = None, limit: int = 30) -> list[dict]:
+    """Top `limit` students for a scope, read straight off the totals index."""
+    g = int(game_id) if game_id else ALL_GAMES
+    s = _stream_key(stream) if stream else ALL_STREAMS
+    rows = db.execute(
+        select(StudentTotal.UID4, School.SchoolName, StudentTotal.Points)
+        .join(School, School.SchoolID == StudentTotal.SchoolID, isouter=True)
+        .where(StudentTotal.GameID == g, StudentTotal.Stream == s)
+        .order_by(StudentTotal.Points.desc(), StudentTotal.UID4)
+        .limit(limit)
+    ).all()
+    return [{"uid": uid, "school": name or "", "pts": int(pts or 0)} for uid, name, pts in rows]
+
+
+def top_schools(db: Session, game_id: Optional[int] = None, stream: Optional[str] = None, limit: int = 50) -> list[dict]:
+    """Schools ranked by total points for a scope."""
+    g = int(game_id) if game_id else ALL_GAMES
+    s = _stream_key(stream) if stream else ALL_STREAMS
+    rows = db.execute(
+        select(School.SchoolName, SchoolTotal.Points)
+        .join(School, School.SchoolID == SchoolTotal.SchoolID)
+        .where(SchoolTotal.GameID == g, SchoolTotal.Stream == s)
+        .order_by(SchoolTotal.Points.desc(), School.SchoolName)
+        .limit(limit)
+    ).all()
+    return [{"school": name, "points": int(pts or 0)} for name, pts in rows]
+
+
+def schools_cup_average(db: Session, limit: int = 50) -> list[dict]:
+    """Schools Cup ranking: points per unique participating student x100, computed in SQL."""
+    avg = (SchoolTotal.Points * 100.0 / SchoolTotal.Students).label("avgx100")
+    rows = db.execute(
+        select(School.SchoolName, avg)
+        .join(School, School.SchoolID == SchoolTotal.SchoolID)
+        .where(
+            SchoolTotal.GameID == ALL_GAMES,
+            SchoolTotal.Stream == StreamEnum.SchoolsCup.value,
+            SchoolTotal.Students > 0,
+        )
+        .order_by(avg.desc(), School.SchoolName)
+        .limit(limit)
+    ).all()
+    return [{"school": name, "avgx100": float(a or 0)} for name, a in rows]
+
+
+def clear_totals(db: Session) -> None:
+    """Empty both totals tables (caller commits)."""
+    db.execute(delete(StudentTotal))
+    db.execute(delete(SchoolTotal))
+
+
+# --- rebuild / consistency check against MatchParticipants
+
+def _student_rollups():
+    """One SELECT per rollup shape, columns matching StudentTotal insert order."""
+    pts = func.coalesce(func.sum(MatchParticipant.PointsAwarded), 0)
+    out = []
+    for by_game in (True, False):
+        for by_stream in (True, False):
+            g = Event.GameID if by_game else literal(ALL_GAMES)
+            s = Event.Stream if by_stream else literal(ALL_STREAMS)
+            group = [MatchParticipant.UID4, Student.SchoolID]
+            if by_game:
+                group.append(Event.GameID)
+            if by_stream:
+                group.append(Event.Stream)
+            out.append(
+                select(MatchParticipant.UID4, g, s, Student.SchoolID, pts)
+                .join(Match, Match.MatchID == MatchParticipant.MatchID)
+                .join(Event, Event.EventID == Match.EventID)
+                .join(Student, Student.UID4 == MatchParticipant.UID4, isouter=True)
+                .group_by(*group)
+            )
+    return out
+
+
+def _school_rollups():
+    pts = func.coalesce(func.sum(MatchParticipant.PointsAwarded), 0)
+    out = []
+    for by_game in (True, False):
+        for by_stream in (True, False):
+            g = Event.GameID if by_game else literal(ALL_GAMES)
+            s = Event.Stream if by_stream else literal(ALL_STREAMS)
+            group = [Student.SchoolID]
+            if by_game:
+                group.append(Event.GameID)
+            if by_stream:
+                group.append(Event.Stream)
+            out.append(
+                select(Student.SchoolID, g, s, pts, func.count(distinct(MatchParticipant.UID4)))
+                .join(Match, Match.MatchID == MatchParticipant.MatchID)
+                .join(Event, Event.EventID == Match.EventID)
+                .join(Student, Student.UID4 == MatchParticipant.UID4)
+                .group_by(*group)
+            )
+    return out
+
+
+def rebuild_totals(db: Session) -> None:
+    """Recompute both totals tables from MatchParticipants and commit."""
+    clear_totals(db)
+    st = StudentTotal.__table__
+    for q in _student_rollups():
+        db.execute(insert(st).from_select(["UID4", "GameID", "Stream", "SchoolID", "Points"], q))
+    sc = SchoolTotal.__table__
+    for q in _school_rollups():
+        db.execute(insert(sc).from_select(["SchoolID", "GameID", "Stream", "Points", "Students"], q))
+    db.commit()
+
+
+def check_totals(db: Session) -> list[str]:
+    """
+    Return a list of human-readable differences between the stored totals and
+    a fresh aggregate of MatchParticipants. Empty list means consistent.
+    """
+    problems: list[str] = []
+
+    expected = {}
+    for q in _student_rollups():
+        for uid, g, s, _sid, pts in db.execute(q).all():
+            expected[(uid, int(g), _stream_key(s))] = int(pts)
+    stored = {
+        (uid, g, s): int(p)
+        for uid, g, s, p in db.execute(
+            select(StudentTotal.UID4, StudentTotal.GameID, StudentTotal.Stream, StudentTotal.Points)
+        ).all()
+    }
+    for key in sorted(set(expected) | set(stored), key=str):
+        if expected.get(key) != stored.get(key):
+            problems.append(f"student {key}: stored={stored.get(key)} expected={expected.get(key)}")
+
+    expected = {}
+    for q in _school_rollups():
+        for sid, g, s, pts, n in db.execute(q).all():
+            expected[(sid, int(g), _stream_key(s))] = (int(pts), int(n))
+    stored = {
+        (sid, g, s): (int(p), int(n))
+        for sid, g, s, p, n in db.execute(
+            select(SchoolTotal.SchoolID, SchoolTotal.GameID, SchoolTotal.Stream, SchoolTotal.Points, SchoolTotal.Students)
+        ).all()
+    }
+    for key in sorted(set(expected) | set(stored), key=str):
+        if expected.get(key) != stored.get(key):
+            problems.append(f"school {key}: stored={stored.get(key)} expected={expected.get(key)}")
+
+    return problems
+
+
+def check_rankings(db: Session, limit: int = 30) -> list[str]:
+    """Compare the top `limit` from the totals with the raw-table ranking for every game/stream filter."""
+    problems: list[str] = []
+    game_ids = [None] + list(db.execute(select(Game.GameID).order_by(Game.GameID)).scalars())
+    for g in game_ids:
+        for s in (None, StreamEnum.SchoolsCup, StreamEnum.Competition):
+            want = student_ranking(db, game_id=g, stream=s, limit=limit)
+            got = top_students(db, game_id=g, stream=s, limit=limit)
+            if want != got:
+                problems.append(f"ranking game={g or 'all'} stream={s.value if s else 'all'} differs from raw table")
+    return problems
+
+
+def main(argv: list[str]) -> int:
+    cmd = argv[0] if argv else ""
+    if cmd not in ("rebuild", "check"):
+        print("usage: python -m app.totals rebuild|check")
+        return 2
+    db = SessionLocal()
+    try:
+        if cmd == "rebuild":
+            rebuild_totals(db)
+            print("totals rebuilt")
+            return 0
+        problems = check_totals(db) + check_rankings(db)
+        for p in problems:
+            print(p)
+        print("totals OK" if not problems else f"{len(problems)} mismatches")
+        return 0 if not problems else 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
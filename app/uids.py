@@ -0,0 +1,130 @@
+"""
+4-digit UID allocator for Students and Schools.
+
+Each pool window keeps a high-water mark in UIDPools and a free-list of
+gaps/released UIDs in UIDFree, so allocating N IDs costs a handful of
+statements instead of loading every existing UID. The pool row is
+write-locked first (a no-op UPDATE), which serializes concurrent
+allocators on both SQLite and SQL Server until the caller commits; a
+rolled-back transaction therefore also returns its UIDs.
+
+Students keep 1000..1999 as a reserved "guest" window that is only handed
+out on request (window="guest").
+"""
+from __future__ import annotations
+
+from typing import Iterable, Union
+
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .db import UIDPool, UIDFree, Student, School
+
+Executor = Union[Session, Connection]
+
+# pool -> window -> inclusive (low, high)
+POOLS: dict[str, dict[str, tuple[int, int]]] = {
+    "Students": {"main": (2000, 9999), "guest": (1000, 1999)},
+    "Schools": {"main": (2000, 9999)},
+}
+
+COLUMNS = {
+    "Students": Student.UID4,
+    "Schools": School.SchoolUID4,
+}
+
+
+def _key(pool: str, window: str) -> str:
+    return pool if window == "main" else f"{pool}:{window}"
+
+
+def _init_window(db: Executor, pool: str, window: str) -> None:
+    """Create the pool row from the table's current UIDs: high-water above the max, gaps below it free."""
+    lo, hi = POOLS[pool][window]
+    col = COLUMNS[pool]
+    used = set(db.execute(select(col).where(col >= lo, col <= hi)).scalars())
+    top = max(used) if used else lo - 1
+    gaps = [{"Pool": _key(pool, window), "UID": u} for u in range(lo, top + 1) if u not in used]
+    db.execute(insert(UIDPool).values(Pool=_key(pool, window), NextUID=top + 1))
+    if gaps:
+        db.execute(insert(UIDFree), gaps)
+
+
+def _lock(db: Executor, pool: str, window: str) -> None:
+    key = _key(pool, window)
+    res = db.execute(update(UIDPool).where(UIDPool.Pool == key).values(NextUID=UIDPool.NextUID))
+    if res.rowcount == 0:
+        _init_window(db, pool, window)
+
+
+def reserve_uids(db: Executor, pool: str, n: int = 1, window: str = "main") -> list[int]:
+    """
+    Reserve `n` unused UIDs from a pool window in the caller's transaction.
+    Free-list entries are used first (lowest first), then the high-water mark.
+    Raises RuntimeError when the window is exhausted.
+    """
+    if n <= 0:
+        return []
+    if window not in POOLS[pool]:
+        raise ValueError(f"Unknown UID window {window!r} for {pool}")
+    key = _key(pool, window)
+    hi = POOLS[pool][window][1]
+    col = COLUMNS[pool]
+    _lock(db, pool, window)
+
+    out: list[int] = []
+    while len(out) < n:
+        want = n - len(out)
+        batch = list(
+            db.execute(
+                select(UIDFree.UID).where(UIDFree.Pool == key).order_by(UIDFree.UID).limit(want)
+            ).scalars()
+        )
+        if batch:
+            db.execute(delete(UIDFree).where(UIDFree.Pool == key, UIDFree.UID >= batch[0], UIDFree.UID <= batch[-1]))
+        if len(batch) < want:
+            next_uid = db.execute(select(UIDPool.NextUID).where(UIDPool.Pool == key)).scalar_one()
+            k = min(want - len(batch), hi - next_uid + 1)
+            if k <= 0 and not batch:
+                raise RuntimeError("UID pool exhausted")
+            if k > 0:
+                db.execute(update(UIDPool).where(UIDPool.Pool == key).values(NextUID=next_uid + k))
+                batch.extend(range(next_uid, next_uid + k))
+        # rows inserted with explicit UIDs bypass the pool: skip those (one range scan) and top up
+        taken = set(db.execute(select(col).where(col >= min(batch), col <= max(batch))).scalars())
+        out.extend(u for u in batch if u not in taken)
+    return sorted(out)
+
+
+def reserve_uid(db: Executor, pool: str, window: str = "main") -> int:
+    return reserve_uids(db, pool, 1, window)[0]
+
+
+def release_uids(db: Executor, pool: str, uids: Iterable[int]) -> None:
+    """Return UIDs (e.g. of deleted rows) to their window's free-list."""
+    uids = [int(u) for u in uids]
+    for window, (lo, hi) in POOLS[pool].items():
+        key = _key(pool, window)
+        mine = sorted({u for u in uids if lo <= u <= hi})
+        if not mine:
+            continue
+        _lock(db, pool, window)
+        have = set(
+            db.execute(select(UIDFree.UID).where(UIDFree.Pool == key, UIDFree.UID >= mine[0], UIDFree.UID <= mine[-1])).scalars()
+        )
+        next_uid = db.execute(select(UIDPool.NextUID).where(UIDPool.Pool == key)).scalar_one()
+        rows = [{"Pool": key, "UID": u} for u in mine if u not in have and u < next_uid]
+        if rows:
+            db.execute(insert(UIDFree), rows)
+
+
+def sync_uid_pools(db: Session) -> None:
+    """Create any missing pool rows from the current tables (run at startup) and commit."""
+    have = set(db.execute(select(UIDPool.Pool)).scalars())
+    for pool, windows in POOLS.items():
+        for window in windows:
+            if _key(pool, window) not in have:
+                _init_window(db, pool, window)
+    db.commit()
+
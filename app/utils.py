@@ -1,74 +1,71 @@
 from __future__ import annotations
 
-from typing import Optional, Iterable, Tuple, Set, Union
+import threading
+from typing import Optional, Tuple
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from .db import Points, GamePoints
 
 
-def points_lookup(db: Session, game_id: int, code: str) -> Optional[int]:
-    """
-    Return the points value for an outcome `code`, preferring per-game overrides.
-    Falls back to global Points table if no override exists.
-    """
-    # Per-game override?
-    gp = db.execute(
-        select(GamePoints.Value).where(
-            GamePoints.GameID == game_id,
-            GamePoints.Code == code,
-        )
-    ).scalar_one_or_none()
-    if gp is not None:
-        return int(gp)
-
-    # Global default
-    pv = db.execute(
-        select(Points.Value).where(Points.Code == code)
-    ).scalar_one_or_none()
-    return int(pv) if pv is not None else None
+# Process-wide copy of Points + GamePoints. Loaded on first use (two queries),
+# dropped by invalidate_points_cache() whenever an admin edits either table.
+_points_lock = threading.Lock()
+_points_generation = 0
+_points_defaults: Optional[dict[str, int]] = None
+_points_overrides: dict[Tuple[int, str], int] = {}
 
 
-def allocate_uid4(
-    db_or_taken: Union[Session, Set[int]],
-    taken: Optional[Set[int]] = None,
-    avoid_range: Tuple[int, int] = (1000, 2000),
-    search_range: Tuple[int, int] = (1000, 9999),
-) -> Optional[int]:
-    """
-    Allocate a free 4-digit UID in search_range while skipping avoid_range and any already-taken values.
+def invalidate_points_cache() -> None:
+    """Forget the cached points tables; the next lookup reloads them."""
+    global _points_defaults, _points_overrides, _points_generation
+    with _points_lock:
+        _points_generation += 1
+        _points_defaults = None
+        _points_overrides = {}
 
-    Flexible call signature so it works with existing code:
-      - allocate_uid4(taken_set)                                  # simplest
-      - allocate_uid4(taken_set, avoid_range=(1000,1999))         # custom avoid block
-      - allocate_uid4(db_session, taken_set, avoid_range=(...))   # if you previously passed a db first
 
-    Returns:
-        int UID in [search_range[0]..search_range[1]] or None if pool exhausted.
-    """
-    # Support both calling styles: (taken_set) OR (db, taken_set)
-    if isinstance(db_or_taken, set):
-        taken_set = set(db_or_taken)
-    else:
-        # First param was likely a Session; use the explicit `taken` set
-        taken_set = set(taken or ())
+def _points_tables(db: Session) -> Tuple[dict[str, int], dict[Tuple[int, str], int]]:
+    global _points_defaults, _points_overrides
+    with _points_lock:
+        if _points_defaults is not None:
+            return _points_defaults, _points_overrides
+        generation = _points_generation
+    defaults = {code: int(v) for code, v in db.execute(select(Points.Code, Points.Value)).all()}
+    overrides = {
+        (gid, code): int(v)
+        for gid, code, v in db.execute(select(GamePoints.GameID, GamePoints.Code, GamePoints.Value)).all()
+    }
+    with _points_lock:
+        # an invalidation while we were loading means these rows may be stale: use once, don't keep
+        if generation == _points_generation:
+            _points_defaults, _points_overrides = defaults, overrides
+    return defaults, overrides
 
-    low, high = search_range
-    avoid_lo, avoid_hi = avoid_range
 
-    # First pass: outside avoid_range
-    for candidate in range(low, high + 1):
-        if avoid_lo <= candidate <= avoid_hi:
-            continue
-        if candidate not in taken_set:
-            return candidate
+def points_for_game(db: Session, game_id: int) -> dict[str, int]:
+    """
+    Return {code: value} for every outcome code of a game, with per-game
+    overrides applied over the global Points values.
+    """
+    defaults, overrides = _points_tables(db)
+    table = dict(defaults)
+    for (gid, code), value in overrides.items():
+        if gid == game_id:
+            table[code] = value
+    return table
 
-    # Second pass (if we truly must): include avoid_range too
-    for candidate in range(low, high + 1):
-        if candidate not in taken_set:
-            return candidate
 
-    return None  # exhausted
+def points_lookup(db: Session, game_id: int, code: str) -> Optional[int]:
+    """
+    Return the points value for an outcome `code`, preferring per-game overrides.
+    Falls back to global Points table if no override exists.
+    """
+    defaults, overrides = _points_tables(db)
+    value = overrides.get((game_id, code))
+    if value is not None:
+        return value
+    return defaults.get(code)
 
 
 def normalize_cohort(value: str) -> str:
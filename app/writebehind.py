@@ -0,0 +1,263 @@
+"""
+Write-behind queue with group commit (optional, see LOGGER_WRITE_BEHIND).
+
+`put()` appends an entry to a JSON-lines journal and fsyncs it before the
+caller is acknowledged. A worker thread hands waiting entries to
+`commit(entries)` in groups, LOGGER_FLUSH_MS after the first one arrives
+or as soon as LOGGER_FLUSH_MAX are waiting. A burst of submissions then
+shares one transaction instead of queueing on the database log one by one.
+
+The journal is emptied whenever everything in it has been committed. On
+`start()`, whatever a crash left behind is replayed first, and a torn last
+line (never acknowledged) is cut off so new entries start on a line of
+their own. Entries carry an idempotency key, so replaying one that did
+commit is harmless. A failed commit keeps its entries at the head of the
+queue and is retried. If it failed with one of the `permanent` errors (a
+constraint violation, not a lost connection), the group is retried entry
+by entry instead, and an entry that still fails is moved to the
+`dead_letter` file so it cannot hold up the ones behind it. `commit` may
+also return [(entry, reason), ...] for entries it rejected without
+failing; those are dead-lettered too.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from typing import Callable, Iterable, Optional, Type
+
+Rejected = Optional[Iterable[tuple[dict, str]]]
+
+
+class WriteBehindQueue:
+    def __init__(self, path: str, commit: Callable[[list[dict]], Rejected], flush_ms: int = 200, flush_max: int = 100,
+                 dead_letter: Optional[str] = None, permanent: tuple[Type[BaseException], ...] = ()):
+        self.path = path
+        self.commit = commit
+        self.dead_letter = dead_letter or path + ".dead"
+        self.permanent = permanent
+        self.flush_ms = flush_ms
+        self.flush_max = flush_max
+        self._cond = threading.Condition()
+        self._pending: list[dict] = []
+        self._in_flight = 0
+        self._file = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        # reporting
+        self.accepted = 0
+        self.committed = 0
+        self.batches = 0
+        self.commit_ms_total = 0.0
+        self.commit_ms_max = 0.0
+        self.last_commit_ms = 0.0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.replayed = 0
+        self.dead = 0
+        self.last_dead: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ---- lifecycle
+
+    def start(self) -> int:
+        """Replay the journal left by the last run, then start the worker. Returns entries replayed."""
+        with self._cond:
+            if self.running:
+                return 0
+            replay = []
+            if os.path.exists(self.path):
+                good = 0   # bytes of whole, readable lines
+                with open(self.path, "rb") as f:
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break   # torn last line from a crash mid-write: never acknowledged
+                        try:
+                            replay.append(json.loads(line))
+                        except ValueError:
+                            break
+                        good += len(line)
+                if good < os.path.getsize(self.path):
+                    os.truncate(self.path, good)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._pending[:0] = replay
+            self.replayed = len(replay)
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="logger-write-behind", daemon=True)
+            self._thread.start()
+            self._cond.notify_all()
+            return len(replay)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Commit what is queued (within `timeout`) and stop the worker; leftovers stay in the journal."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._cond:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # ---- producers
+
+    def put(self, entry: dict) -> None:
+        """Journal `entry` durably and queue it for the next group commit."""
+        self.put_many([entry])
+
+    def put_many(self, entries: list[dict]) -> None:
+        """Journal `entries` with one fsync and queue them for the next group commit."""
+        if not entries:
+            return
+        lines = "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in entries)
+        with self._cond:
+            if self._file is None:
+                raise RuntimeError("write-behind queue is not running")
+            self._file.write(lines)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending.extend(entries)
+            self.accepted += len(entries)
+            self._cond.notify_all()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until everything accepted so far is committed. False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify_all()
+            while self._pending or self._in_flight:
+                left = deadline - time.monotonic()
+                if left <= 0 or not self.running:
+                    return False
+                self._cond.wait(left)
+            return True
+
+    # ---- worker
+
+    def _take(self) -> Optional[list[dict]]:
+        with self._cond:
+            while not self._pending and not self._stopping:
+                self._cond.wait()
+            if not self._pending:
+                return None
+            # group: give the burst flush_ms to fill up, unless already full or shutting down
+            deadline = time.monotonic() + self.flush_ms / 1000
+            while len(self._pending) < self.flush_max and not self._stopping:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                self._cond.wait(left)
+            batch = self._pending[:self.flush_max]
+            del self._pending[:len(batch)]
+            self._in_flight = len(batch)
+            return batch
+
+    def _commit(self, batch: list[dict]) -> int:
+        """Commit `batch`, burying the entries `commit` reports as rejected. Returns entries committed."""
+        rejected = list(self.commit(batch) or ())
+        for entry, reason in rejected:
+            self._bury(entry, reason)
+        return len(batch) - len(rejected)
+
+    def _bury(self, entry: dict, error: BaseException | str) -> None:
+        """Append an entry that can never commit to the dead-letter file."""
+        with open(self.dead_letter, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"entry": entry, "error": str(error), "at": time.time()}, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        with self._cond:
+            self.dead += 1
+            self.last_dead = str(error)
+
+    def _commit_one_by_one(self, batch: list[dict]) -> tuple[int, list[dict]]:
+        """
+        Commit `batch` entry by entry after a permanent error, burying the
+        entries that fail the same way. Returns (entries committed, entries
+        to retry from the first other failure on).
+        """
+        done = 0
+        for i, entry in enumerate(batch):
+            try:
+                done += self._commit([entry])
+            except self.permanent as e:
+                self._bury(entry, e)
+                continue
+            except Exception as e:
+                with self._cond:
+                    self.errors += 1
+                    self.last_error = str(e)
+                return done, batch[i:]
+        return done, []
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            retry = []
+            try:
+                done = self._commit(batch)
+            except self.permanent as e:   # a bad entry somewhere in the group: isolate it
+                with self._cond:
+                    self.errors += 1
+                    self.last_error = str(e)
+                done, retry = self._commit_one_by_one(batch)
+            except Exception as e:  # database unavailable: keep the entries and retry
+                with self._cond:
+                    self.errors += 1
+                    self.last_error = str(e)
+                done, retry = 0, batch
+            if retry:
+                with self._cond:
+                    self.committed += done
+                    self._pending[:0] = retry
+                    self._in_flight = 0
+                    self._cond.notify_all()
+                    if self._stopping:
+                        return
+                    self._cond.wait(1.0)
+                continue
+            ms = (time.perf_counter() - started) * 1000
+            with self._cond:
+                self._in_flight = 0
+                self.committed += done
+                self.batches += 1
+                self.commit_ms_total += ms
+                self.commit_ms_max = max(self.commit_ms_max, ms)
+                self.last_commit_ms = ms
+                if not self._pending and self._file is not None:
+                    # everything journaled is committed
+                    self._file.seek(0)
+                    self._file.truncate()
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                self._cond.notify_all()
+
+    # ---- reporting
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "running": self.running,
+                "depth": len(self._pending) + self._in_flight,
+                "accepted": self.accepted,
+                "committed": self.committed,
+                "replayed": self.replayed,
+                "batches": self.batches,
+                "avg_batch": round(self.committed / self.batches, 1) if self.batches else 0.0,
+                "commit_ms_avg": round(self.commit_ms_total / self.batches, 1) if self.batches else 0.0,
+                "commit_ms_max": round(self.commit_ms_max, 1),
+                "commit_ms_last": round(self.last_commit_ms, 1),
+                "commit_ms_total": self.commit_ms_total,
+                "errors": self.errors,
+                "last_error": self.last_error,
+                "dead": self.dead,
+                "last_dead": self.last_dead,
+            }
@@ -1,5 +1,73 @@
 import os
 import sys
+import tempfile
+from contextlib import contextmanager
 
 # Add the project root directory to Python path
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
\ No newline at end of file
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Never point the suite at the committed seqel.db or a SQL Server from app/.env
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="seqel-test-"), "test.db")
+
+import pytest
+
+
+@pytest.fixture
+def db():
+    from app.db import init_db, SessionLocal, Base, Match, MatchParticipant, Student, School
+    from app.seed import seed_all
+
+    init_db()
+    s = SessionLocal()
+    seed_all(s)
+    yield s
+    s.rollback()
+    # wipe event data between tests; master lists are re-seeded idempotently
+    for table in reversed(Base.metadata.sorted_tables):
+        if table.name not in ("Points", "Games", "Rounds", "Events", "Areas", "Settings"):
+            s.execute(table.delete())
+    s.commit()
+    s.close()
+    from app.utils import invalidate_points_cache
+    from app.admin.schools import invalidate_school_options
+    from app.refdata import invalidate_refdata
+    from app.stats import invalidate_stats
+    invalidate_points_cache()
+    invalidate_refdata()
+    invalidate_stats()
+    invalidate_school_options()
+
+
+@pytest.fixture
+def make_school(db):
+    """make_school(name, uid4, student_uids, session=db): a committed school whose students are named by UID."""
+    from app.db import School, Student
+
+    def make(name, uid4, student_uids=(), session=None):
+        s = session or db
+        sch = School(SchoolName=name, SchoolUID4=uid4)
+        s.add(sch); s.flush()
+        s.add_all([Student(UID4=uid, FirstName=name[0], LastName=str(uid), SchoolID=sch.SchoolID, Cohort="High")
+                   for uid in student_uids])
+        s.commit()
+        return sch
+    return make
+
+
+@pytest.fixture
+def count_queries():
+    """`with count_queries() as seen:` collects the SQL sent on the write engine inside the block."""
+    from sqlalchemy import event
+    from app.db import engine
+
+    @contextmanager
+    def counting():
+        seen: list[str] = []
+        def record(conn, cursor, statement, *args):
+            seen.append(statement)
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            yield seen
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+    return counting
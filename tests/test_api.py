@@ -0,0 +1,50 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.main import app
+from app.cache import TTLCache
+from app.db import Game, Area, Round, StreamEnum
+
+
+def _submit(client, game, area, rnd, winner, loser):
+    return client.post("/logger/submit", data={
+        "GameID": game.GameID, "Stream": area.Stream.value, "RoundID": rnd.RoundID, "AreaID": area.AreaID,
+        "Mode": "WIN_LOSE", "UID1": winner, "UID2": loser, "WinnerUID": winner,
+    }, follow_redirects=False)
+
+
+def test_api_endpoints_etag_and_invalidation(db, make_school):
+    make_school("Api North", 4101, (6001, 6002))
+    make_school("Api South", 4102, (6003,))
+    game = db.execute(select(Game).where(Game.GameName == "NBA")).scalar_one()
+    area = db.execute(select(Area).where(Area.GameID == game.GameID, Area.Stream == StreamEnum.SchoolsCup)).scalar_one()
+    rnd = db.execute(select(Round).where(Round.Label == "Round 2")).scalar_one()
+
+    client = TestClient(app)
+    _submit(client, game, area, rnd, 6003, 6001)
+
+    r = client.get("/api/top30")
+    assert r.status_code == 200
+    assert r.json()[0] == {"uid": 6003, "school": "Api South", "points": 50}
+    etag = r.headers["etag"]
+    assert client.get("/api/top30", headers={"If-None-Match": etag}).status_code == 304
+
+    _submit(client, game, area, rnd, 6003, 6002)
+    r = client.get("/api/top30", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.json()[0]["points"] == 100
+
+    # South: 100 pts / 1 student; North: 50 pts / 2 students
+    avg = client.get("/api/schools_cup_avg").json()
+    assert avg == [{"school": "Api South", "avgx100": 10000.0}, {"school": "Api North", "avgx100": 2500.0}]
+    assert client.get("/api/overall").json() == [{"school": "Api South", "points": 100}, {"school": "Api North", "points": 50}]
+    assert client.get("/api/top30", params={"stream": "Competition"}).json() == []
+
+
+def test_cache_drops_a_body_computed_before_clear():
+    cache = TTLCache(ttl=60)
+    generation = cache.generation
+    cache.clear()                                   # results changed while the body was computed
+    assert cache.put("k", b"stale", generation)[0] == b"stale"
+    assert cache.get("k") is None
+    cache.put("k", b"fresh", cache.generation)
+    assert cache.get("k")[0] == b"fresh"
@@ -0,0 +1,31 @@
+import asyncio
+
+from sqlalchemy import select, func
+
+from app.bench import generate_tournament, _request_factory, run_load, count_statements, _percentile, SUBMIT, POLLS
+from app.db import Match, Student
+from app.main import app
+from app.refdata import refdata
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert (_percentile(values, 50), _percentile(values, 95), _percentile(values, 99)) == (50.0, 95.0, 99.0)
+    assert _percentile([], 95) == 0.0
+
+
+def test_small_tournament_load_and_statement_counts(db):
+    scale = generate_tournament(db, schools=3, students=40, matches_per_area=1)
+    ref = refdata(db)
+    assert scale["matches"] == len(ref.rounds) * len(ref.areas)
+    assert db.execute(select(func.count()).select_from(Match)).scalar() == scale["matches"]
+
+    uids = list(db.execute(select(Student.UID4)).scalars())
+    make = _request_factory(db, uids, seed=2)
+    load = asyncio.run(run_load(app, make, submitters=2, pollers=4, requests=3))
+    assert set(load["routes"]) == {SUBMIT, *POLLS}
+    assert all(r["errors"] == 0 for r in load["routes"].values())
+    assert load["routes"][SUBMIT]["count"] == 6
+
+    sql = asyncio.run(count_statements(app, make, per_route=2))
+    assert sql[SUBMIT] > 0
@@ -0,0 +1,62 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+
+from app.main import app
+from app.db import Game, MatchParticipant
+from app.finals import evaluate_finals
+from app.refdata import refdata
+from app.totals import check_totals, top_students
+
+
+def _setup(db, make_school, name):
+    make_school("Finals High", 4401, (5401, 5402, 5403, 5404, 5405))
+    return db.execute(select(Game).where(Game.GameName == name)).scalar_one()
+
+
+def _log(client, ref, game, entries, prefix):
+    area = ref.areas_for(game.GameID, "Competition")[0].AreaID
+    r = client.post("/logger/batch", json={"matches": [
+        {"key": f"{prefix}{i}", "GameID": game.GameID, "Stream": "Competition", "RoundID": ref.rounds[-1].RoundID,
+         "AreaID": area, "Mode": "FINALS", "FinalsUID": uid, "FinalsMetricValue": metric}
+        for i, (uid, metric) in enumerate(entries)
+    ]})
+    assert all(x["status"] == "created" for x in r.json()["results"])
+
+
+def _outcomes(db):
+    rows = db.execute(select(MatchParticipant.UID4, MatchParticipant.Outcome, MatchParticipant.PointsAwarded)
+                      .where(MatchParticipant.Outcome.isnot(None))).all()
+    return {uid: (code, pts) for uid, code, pts in rows}
+
+
+def test_lower_is_better_best_attempt_counts(db, make_school):
+    game = _setup(db, make_school, "Velocity Drone")   # LowerIsBetter
+    ref, client = refdata(db), TestClient(app)
+    _log(client, ref, game, [(5401, 40.0), (5402, 38.5), (5403, 45.0), (5401, 37.0), (5404, 50.0), (5405, 52.0)], "a")
+    assert _outcomes(db) == {5401: ("1st", 50), 5402: ("2nd", 20), 5403: ("3rd", 15), 5404: ("4th", 10)}
+    assert top_students(db, game_id=game.GameID, stream="Competition", limit=1)[0] == {"uid": 5401, "school": "Finals High", "pts": 50}
+
+    # a later, faster run moves everyone down and the totals follow
+    _log(client, ref, game, [(5405, 30.0)], "b")
+    assert _outcomes(db)[5405] == ("1st", 50)
+    assert 5404 not in _outcomes(db)
+    assert check_totals(db) == []
+
+    # nothing changed: nothing to do
+    assert evaluate_finals(db) == 0
+
+    # a corrected entry that swaps two times keeps the sum but is still re-ranked
+    times = dict(db.execute(select(MatchParticipant.UID4, MatchParticipant.MetricValueMs)
+                            .where(MatchParticipant.UID4.in_([5402, 5403]))).all())
+    for uid, other in ((5402, 5403), (5403, 5402)):
+        db.execute(update(MatchParticipant).where(MatchParticipant.UID4 == uid).values(MetricValueMs=times[other]))
+    assert evaluate_finals(db) == 1
+    assert _outcomes(db)[5403] == ("3rd", 15) and _outcomes(db)[5402] == ("4th", 10)
+    assert check_totals(db) == []
+
+
+def test_higher_is_better(db, make_school):
+    game = _setup(db, make_school, "Rocket League")    # HigherIsBetter
+    _log(TestClient(app), refdata(db), game, [(5401, 3), (5402, 7), (5403, 5)], "c")
+    assert _outcomes(db) == {5402: ("1st", 50), 5403: ("2nd", 20), 5401: ("3rd", 15)}
+    assert check_totals(db) == []
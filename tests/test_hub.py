@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from app.hub import Hub, diff_rows
+
+
+def test_diff_rows():
+    assert diff_rows([1, 2], [1, 2]) is None
+    assert diff_rows([1, 2], [1, 3]) == [[1, 3]]
+    assert diff_rows([1, 2], [1]) == []
+
+
+@pytest.mark.asyncio
+async def test_hub_pushes_snapshot_then_diffs_once_per_burst():
+    data = {"top30": [{"uid": 1, "points": 10}, {"uid": 2, "points": 5}]}
+    calls = []
+
+    def compute(key):
+        calls.append(key)
+        return list(data[key])
+
+    hub = Hub(compute, debounce=0.01)
+    a = await hub.subscribe("top30")
+    b = await hub.subscribe("top30")
+    first = await a.get()
+    assert first["size"] == 2 and len(first["changed"]) == 2
+    await b.get()
+
+    data["top30"] = [{"uid": 2, "points": 15}, {"uid": 1, "points": 10}]
+    for _ in range(5):
+        hub.publish()
+    msg = await asyncio.wait_for(a.get(), 1)
+    assert msg["changed"] == [[0, {"uid": 2, "points": 15}], [1, {"uid": 1, "points": 10}]]
+    assert (await asyncio.wait_for(b.get(), 1)) == msg
+    assert calls == ["top30", "top30"]  # one snapshot, one recompute shared by both screens
+
+    hub.publish()
+    await asyncio.sleep(0.05)
+    assert a.empty()  # unchanged rankings push nothing
+
+    hub.unsubscribe("top30", a)
+    hub.unsubscribe("top30", b)
+    assert hub.subscriber_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_hub_survives_a_failed_compute():
+    state = {"fail": False, "rows": [1]}
+
+    def compute(key):
+        if state["fail"]:
+            raise RuntimeError("database unavailable")
+        return list(state["rows"])
+
+    hub = Hub(compute, debounce=0.01)
+    state["fail"] = True
+    with pytest.raises(RuntimeError):
+        await hub.subscribe("other")
+    assert hub.subscriber_count() == 0        # failed subscribe leaves nothing behind
+
+    state["fail"] = False
+    q = await hub.subscribe("top30")
+    await q.get()
+    state.update(fail=True, rows=[2])
+    hub.publish()
+    await asyncio.sleep(0.05)
+    state["fail"] = False
+    hub.publish()
+    msg = await asyncio.wait_for(q.get(), 1)   # the push loop is still running
+    assert msg["changed"] == [[0, 2]]
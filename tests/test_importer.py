@@ -0,0 +1,49 @@
+import io
+
+from sqlalchemy import func, select
+
+from app.db import School, Student
+from app.importer import import_roster
+
+CSV = (
+    "﻿First_Name,Last_Name,School,Cohort\n"
+    "Ada,Lovelace,Import High,high\n"
+    "Alan,Turing,Import High,High\n"
+    "ada,lovelace,Import High,High\n"      # duplicate in file
+    "Grace,Hopper,Import Primary,primary\n"
+    "Nobody,,Import High,High\n"           # incomplete
+)
+
+
+def test_dry_run_reports_without_writing(db):
+    report = import_roster(db, io.BytesIO(CSV.encode()), dry_run=True, batch_size=2)
+    assert (report.rows, report.created_schools, report.created_students, report.duplicates, report.skipped) == (5, 2, 3, 1, 1)
+    assert {"parse", "resolve"} <= set(report.timings_ms)
+    assert db.execute(select(func.count()).select_from(Student)).scalar_one() == 0
+
+
+def test_import_in_batches_and_reimport_is_all_duplicates(db):
+    report = import_roster(db, io.BytesIO(CSV.encode()), batch_size=2)
+    assert (report.created_schools, report.created_students) == (2, 3)
+    uids = sorted(db.execute(select(Student.UID4)).scalars())
+    assert len(set(uids)) == 3 and all(u >= 2000 for u in uids)
+    assert db.execute(select(func.count()).select_from(School)).scalar_one() == 2
+    cohorts = dict(db.execute(select(Student.FirstName, Student.Cohort)).all())
+    assert cohorts["Grace"] == "Primary"
+
+    again = import_roster(db, io.BytesIO(CSV.encode()), batch_size=2)
+    assert (again.created_schools, again.created_students, again.duplicates) == (0, 0, 4)
+
+
+def test_school_names_match_case_insensitively(db):
+    import_roster(db, io.BytesIO(CSV.encode()))
+    other = (
+        "First_Name,Last_Name,School,Cohort\n"
+        "ADA,LOVELACE,IMPORT HIGH,High\n"      # registered already, different case
+        "Edsger,Dijkstra,import high,High\n"
+        "Barbara,Liskov,New School,High\n"
+        "Ken,Thompson,NEW SCHOOL,High\n"
+    )
+    report = import_roster(db, io.BytesIO(other.encode()), batch_size=1)
+    assert (report.created_schools, report.created_students, report.duplicates) == (1, 3, 1)
+    assert sorted(db.execute(select(School.SchoolName)).scalars()) == ["Import High", "Import Primary", "New School"]
@@ -0,0 +1,97 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import select, func
+
+from app import logger
+from app.main import app
+from app.db import Game, Area, Round, Match, MatchParticipant, StreamEnum
+from app.totals import check_totals, top_students
+
+
+def _setup(db, make_school):
+    make_school("Batch High", 4101, (5101, 5102, 5103, 5104))
+    game = db.execute(select(Game).where(Game.GameName == "Rocket League")).scalar_one()
+    area = db.execute(select(Area).where(Area.GameID == game.GameID, Area.Stream == StreamEnum.SchoolsCup)).scalar_one()
+    rnd = db.execute(select(Round).where(Round.Label == "Round 1")).scalar_one()
+    return game, area, rnd
+
+
+def test_batch_is_idempotent_and_reports_per_item(db, make_school):
+    game, area, rnd = _setup(db, make_school)
+    base = {"GameID": game.GameID, "Stream": "SchoolsCup", "RoundID": rnd.RoundID, "AreaID": area.AreaID}
+    matches = [
+        {**base, "key": "k1", "Mode": "WIN_LOSE", "UID1": 5101, "UID2": 5102, "WinnerUID": 5101},
+        {**base, "key": "k2", "Mode": "TOP4", "Place1": 5103, "Place2": 5104, "Place3": 5102},
+        {**base, "key": "k3", "Mode": "WIN_LOSE", "UID1": 5101, "UID2": 5102, "WinnerUID": 5104},
+        {**base, "key": "k1", "Mode": "WIN_LOSE", "UID1": 5101, "UID2": 5102, "WinnerUID": 5101},
+    ]
+    client = TestClient(app)
+    r = client.post("/logger/batch", json={"matches": matches})
+    assert r.status_code == 200
+    res = r.json()["results"]
+    assert [x["status"] for x in res] == ["created", "created", "error", "duplicate"]
+    assert res[2]["error"] == "WinnerMismatch"
+    assert res[3]["match_id"] == res[0]["match_id"]
+
+    # replaying the whole queue after a lost response changes nothing
+    again = client.post("/logger/batch", json={"matches": matches[:2]}).json()["results"]
+    assert [x["status"] for x in again] == ["duplicate", "duplicate"]
+    assert [x["match_id"] for x in again] == [res[0]["match_id"], res[1]["match_id"]]
+
+    assert db.execute(select(func.count()).select_from(Match)).scalar() == 2
+    assert db.execute(select(func.count()).select_from(MatchParticipant)).scalar() == 5
+    assert top_students(db, limit=1)[0]["uid"] == 5101
+    assert check_totals(db) == []
+
+
+def test_batch_rejects_unknown_event(db, make_school):
+    game, area, rnd = _setup(db, make_school)
+    r = TestClient(app).post("/logger/batch", json={"matches": [{
+        "key": "x", "GameID": game.GameID, "Stream": "Nope", "RoundID": rnd.RoundID, "AreaID": area.AreaID,
+        "Mode": "FINALS", "FinalsUID": 5101, "FinalsMetricValue": 12.5,
+    }]})
+    assert r.json()["results"] == [{"key": "x", "status": "error", "error": "UnknownEvent"}]
+    assert db.execute(select(func.count()).select_from(Match)).scalar() == 0
+
+
+def test_batch_reports_bad_items_next_to_good_ones(db, make_school):
+    game, area, rnd = _setup(db, make_school)
+    other = db.execute(select(Area).where(Area.GameID != game.GameID)).scalars().first()
+    base = {"GameID": game.GameID, "Stream": "SchoolsCup", "RoundID": rnd.RoundID, "AreaID": area.AreaID}
+    matches = [
+        {**base, "key": "ok1", "Mode": "WIN_LOSE", "UID1": 5101, "UID2": 5102, "WinnerUID": 5101},
+        {**base, "key": "miss", "Mode": "WIN_LOSE", "UID1": 5101, "WinnerUID": 5101},
+        {**base, "key": "same", "Mode": "WIN_LOSE", "UID1": 5103, "UID2": 5103, "WinnerUID": 5103},
+        {**base, "key": "area", "AreaID": other.AreaID, "Mode": "WIN_LOSE", "UID1": 5101, "UID2": 5102, "WinnerUID": 5101},
+        {**base, "key": "ok2", "Mode": "WIN_LOSE", "UID1": 5103, "UID2": 5104, "WinnerUID": 5104},
+    ]
+    r = TestClient(app).post("/logger/batch", json={"matches": matches})
+    assert r.status_code == 200
+    assert [(x["status"], x.get("error")) for x in r.json()["results"]] == [
+        ("created", None), ("error", "MissingPlayer"), ("error", "SamePlayer"), ("error", "UnknownArea"), ("created", None),
+    ]
+    assert db.execute(select(func.count()).select_from(Match)).scalar() == 2
+    assert check_totals(db) == []
+
+
+def test_key_stored_by_a_concurrent_request_reads_as_duplicate(db, make_school, monkeypatch):
+    game, area, rnd = _setup(db, make_school)
+    base = {"GameID": game.GameID, "Stream": "SchoolsCup", "RoundID": rnd.RoundID, "AreaID": area.AreaID,
+            "Mode": "WIN_LOSE", "UID1": 5101, "UID2": 5102, "WinnerUID": 5101}
+    client = TestClient(app)
+    created = client.post("/logger/batch", json={"matches": [{**base, "key": "race"}]}).json()["results"][0]
+
+    # the second request looked before the first one committed
+    lookups = []
+    real = logger._stored_keys
+
+    def stale_once(db, keys):
+        lookups.append(keys)
+        return real(db, keys) if len(lookups) > 1 else {}
+    monkeypatch.setattr(logger, "_stored_keys", stale_once)
+    r = client.post("/logger/batch", json={"matches": [{**base, "key": "race"}, {**base, "key": "after"}]})
+    assert r.status_code == 200 and len(lookups) == 2
+    assert [(x["status"], x.get("match_id") == created["match_id"]) for x in r.json()["results"]] == [
+        ("duplicate", True), ("created", False),
+    ]
+    assert db.execute(select(func.count()).select_from(Match)).scalar() == 2
+    assert check_totals(db) == []
@@ -0,0 +1,84 @@
+import time
+from datetime import date
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select, func
+
+from app.main import app
+from app.db import Game, Match, MatchHistory, MatchParticipantHistory
+from app.maintenance import reset_results
+from app.refdata import refdata
+from app.totals import check_totals, top_students
+
+
+def _log_two_games(db, make_school):
+    make_school("Reset High", 4601, (5601, 5602))
+    ref = refdata(db)
+    games = db.execute(select(Game).where(Game.GameName.in_(["NBA", "FC25"])).order_by(Game.GameName)).scalars().all()
+    matches = []
+    for g in games:
+        for i in range(3):
+            matches.append({
+                "key": f"m{g.GameID}-{i}", "GameID": g.GameID, "Stream": "SchoolsCup", "RoundID": ref.rounds[i].RoundID,
+                "AreaID": ref.areas_for(g.GameID, "SchoolsCup")[0].AreaID,
+                "Mode": "WIN_LOSE", "UID1": 5601, "UID2": 5602, "WinnerUID": 5601,
+            })
+    TestClient(app).post("/logger/batch", json={"matches": matches})
+    return games
+
+
+def test_game_scope_archives_in_batches_and_rebuilds_totals(db, make_school):
+    fc25, nba = _log_two_games(db, make_school)
+    steps = []
+    removed = reset_results(db, "game", archive=True, batch_size=2, progress=steps.append, game_id=nba.GameID)
+    assert removed == 3 and steps == [2, 3]
+    assert db.execute(select(func.count()).select_from(Match)).scalar() == 3
+    assert db.execute(select(func.count()).select_from(MatchHistory)).scalar() == 3
+    assert db.execute(select(func.count()).select_from(MatchParticipantHistory)).scalar() == 6
+    assert check_totals(db) == []
+    assert top_students(db, game_id=nba.GameID, limit=5) == []
+    assert top_students(db, game_id=fc25.GameID, limit=1)[0]["pts"] == 150
+
+    csv = TestClient(app).get("/admin/maintenance/archive.csv").text.splitlines()
+    assert len(csv) == 1 + 6
+
+
+def test_reset_route_runs_as_job(db, make_school):
+    _log_two_games(db, make_school)
+    client = TestClient(app)
+    r = client.post("/admin/maintenance/reset", data={"scope": "day", "day": "18/10/2026"}, follow_redirects=False)
+    assert r.status_code == 303 and r.headers["location"].endswith("error=BadDate")
+    assert "Reset not started: BadDate" in client.get(r.headers["location"]).text
+    client.post("/admin/maintenance/reset", data={"scope": "day", "day": date.today().isoformat()}, follow_redirects=False)
+    for _ in range(100):
+        job = client.get("/admin/maintenance/job").json()
+        if job["status"] != "running":
+            break
+        time.sleep(0.05)
+    assert job["status"] == "finished", job
+    assert db.execute(select(func.count()).select_from(Match)).scalar() == job["total"] - job["done"]
+    assert client.get("/admin/maintenance").status_code == 200
+
+
+def test_day_scope_uses_the_local_calendar_day(db, make_school, monkeypatch):
+    from datetime import datetime
+    from sqlalchemy import update
+    from app.db import day_window
+    from app.maintenance import count_matches
+
+    monkeypatch.setenv("TZ", "Australia/Brisbane")   # UTC+10, no daylight saving
+    time.tzset()
+    try:
+        start, end = day_window(db, date(2026, 3, 2))
+        assert (start, end) == (datetime(2026, 3, 1, 14), datetime(2026, 3, 2, 14))   # SQLite stores UTC
+        _log_two_games(db, make_school)
+        ids = db.execute(select(Match.MatchID).order_by(Match.MatchID)).scalars().all()
+        # 08:00 local on 2 March, and 23:00 local the evening before
+        db.execute(update(Match).where(Match.MatchID.in_(ids[:4])).values(CreatedAt=datetime(2026, 3, 1, 22)))
+        db.execute(update(Match).where(Match.MatchID.in_(ids[4:])).values(CreatedAt=datetime(2026, 3, 1, 13)))
+        db.commit()
+        assert count_matches(db, "day", day=date(2026, 3, 2)) == 4
+        assert count_matches(db, "day", day=date(2026, 3, 1)) == 2
+    finally:
+        monkeypatch.undo()
+        time.tzset()
@@ -0,0 +1,48 @@
+from collections import Counter
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app import metrics
+from app.main import app
+from app.db import Game
+from app.refdata import refdata
+
+
+def test_route_latency_and_sql_per_request(db, make_school, monkeypatch):
+    metrics.reset_metrics()
+    make_school("Metrics High", 4801, (5801, 5802))
+    game = db.execute(select(Game).where(Game.GameName == "NBA")).scalar_one()
+    ref = refdata(db)
+    client = TestClient(app)
+    monkeypatch.setattr(metrics, "SLOW_QUERY_MS", 0.0)   # every statement counts as slow
+    client.post("/logger/submit", data={
+        "GameID": game.GameID, "Stream": "SchoolsCup", "RoundID": ref.rounds[0].RoundID,
+        "AreaID": ref.areas_for(game.GameID, "SchoolsCup")[0].AreaID,
+        "Mode": "WIN_LOSE", "UID1": 5801, "UID2": 5802, "WinnerUID": 5801,
+    }, follow_redirects=False)
+    monkeypatch.setattr(metrics, "SLOW_QUERY_MS", 250.0)
+
+    rows = {(r["method"], r["route"]): r for r in metrics.route_summary()}
+    submit = rows[("POST", "/logger/submit")]
+    assert submit["count"] == 1 and submit["sql_per_request"] > 0   # counted on the logger write pool
+    assert any(q["path"] == "/logger/submit" for q in metrics.slow_queries)
+
+    client.get("/api/top30", params={"game_id": game.GameID})
+    text = client.get("/metrics").text
+    assert 'seqel_http_request_duration_seconds_bucket{method="GET",route="/api/top30",le="+Inf"} 1' in text
+    assert 'seqel_http_requests_total{method="POST",route="/logger/submit",status="303"} 1' in text
+    assert client.get("/admin/metrics").status_code == 200
+
+
+def test_repeated_statement_flagged_once_per_route():
+    metrics.reset_metrics()
+    stmt = 'SELECT "Students"."UID4" FROM "Students" WHERE "Students"."SchoolID" = ?'
+    for n in (3, 12, 8):
+        req = metrics.RequestStats(path="/boards/x", statements=n, shapes=Counter({stmt: n}))
+        metrics._record("GET", "/boards/x", 0.02, 200, req)
+    assert list(metrics.n_plus_one.values()) == [
+        {"route": "GET /boards/x", "statement": stmt, "max_repeats": 12, "requests": 2}
+    ]
+    (row,) = metrics.route_summary()
+    assert row["n_plus_one"] == 2 and row["p95_ms"] == 25.0
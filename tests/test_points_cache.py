@@ -0,0 +1,25 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.main import app
+from app.db import Game
+from app.utils import points_for_game, points_lookup, invalidate_points_cache
+
+
+def test_points_cached_and_invalidated_by_override(db, count_queries):
+    game = db.execute(select(Game).where(Game.GameName == "Asphalt 9")).scalar_one()
+    invalidate_points_cache()
+    assert points_for_game(db, game.GameID)["1st"] == 50
+
+    with count_queries() as statements:
+        for code in ("1st", "2nd", "3rd", "4th"):
+            points_lookup(db, game.GameID, code)
+        table = points_for_game(db, game.GameID)
+    assert statements == []
+    assert [table[c] for c in ("1st", "2nd", "3rd", "4th")] == [50, 20, 15, 10]
+
+    r = TestClient(app).post("/admin/points/override", data={"GameID": game.GameID, "Code": "1st", "Value": 75},
+                             follow_redirects=False)
+    assert r.status_code == 303
+    assert points_lookup(db, game.GameID, "1st") == 75
+    assert points_lookup(db, game.GameID + 1, "1st") == 50
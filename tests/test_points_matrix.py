@@ -0,0 +1,38 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.main import app
+from app.db import Game, GamePoints
+from app.utils import points_lookup
+
+
+def _game(db, name):
+    return db.execute(select(Game).where(Game.GameName == name)).scalar_one()
+
+
+def test_matrix_bulk_edit_and_single_query_page(db, count_queries):
+    nba, fc = _game(db, "NBA"), _game(db, "FC25")
+    db.add(GamePoints(GameID=nba.GameID, Code="Win", Value=60))
+    db.add(GamePoints(GameID=nba.GameID, Code="Tie", Value=5))
+    db.commit()
+    assert points_lookup(db, nba.GameID, "Win") == 60
+
+    client = TestClient(app)
+    r = client.post("/admin/points/matrix", json={"cells": [
+        {"GameID": nba.GameID, "Code": "Win", "Value": 70},      # update
+        {"GameID": nba.GameID, "Code": "Tie", "Value": None},    # delete
+        {"GameID": fc.GameID, "Code": "Win", "Value": 55},       # insert
+        {"GameID": fc.GameID, "Code": "Lose", "Value": None},    # nothing to delete
+    ]})
+    assert r.json() == {"inserted": 1, "updated": 1, "deleted": 1}
+    rows = set(db.execute(select(GamePoints.GameID, GamePoints.Code, GamePoints.Value)).all())
+    assert rows == {(nba.GameID, "Win", 70), (fc.GameID, "Win", 55)}
+    assert points_lookup(db, nba.GameID, "Win") == 70   # cache invalidated
+
+    assert client.post("/admin/points/matrix", json={"cells": [
+        {"GameID": nba.GameID, "Code": "Nope", "Value": 1}]}).status_code == 400
+
+    with count_queries() as seen:
+        page = client.get("/admin/points")
+    assert page.status_code == 200 and 'data-orig="55"' in page.text
+    assert len([s for s in seen if "GamePoints" in s]) == 1
@@ -0,0 +1,72 @@
+import io
+import time
+import zipfile
+
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+from app.main import app
+from app.db import Student
+from app import printing
+from app.printing import school_docs, _cached
+from app.refdata import refdata
+
+
+def test_pdfs_are_cached_until_data_changes(db, make_school):
+    sch = make_school("Print High", 4501, (5501,))
+    client = TestClient(app)
+    ref = refdata(db)
+    area_id = min(ref.areas)
+    other_game = next(g for g in ref.games if g != ref.areas[area_id].GameID)
+    assert client.get("/admin/print/area.pdf", params={"area_id": area_id, "game_id": other_game}).status_code == 404
+    r = client.get("/admin/print/area.pdf", params={"area_id": area_id, "game_id": ref.areas[area_id].GameID})
+    assert r.status_code == 200 and r.content.startswith(b"%PDF")
+
+    r = client.get("/admin/print/school.pdf", params={"school_id": sch.SchoolID})
+    assert r.status_code == 200 and r.content.startswith(b"%PDF")
+    doc = school_docs(db, [sch.SchoolID])[0]
+    assert _cached(doc) == r.content
+
+    db.add(Student(UID4=5502, FirstName="P", LastName="Two", SchoolID=sch.SchoolID, Cohort="High"))
+    db.commit()
+    assert _cached(school_docs(db, [sch.SchoolID])[0]) is None
+
+    # same-length name fixes and cohort moves still change what is printed
+    before = school_docs(db, [sch.SchoolID])[0].version
+    db.execute(update(Student).where(Student.UID4 == 5501).values(LastName="Uno"))
+    db.commit()
+    renamed = school_docs(db, [sch.SchoolID])[0].version
+    db.execute(update(Student).where(Student.UID4 == 5501).values(Cohort="Primary"))
+    db.commit()
+    assert len({before, renamed, school_docs(db, [sch.SchoolID])[0].version}) == 3
+    assert client.get("/admin/print/school.pdf", params={"school_id": 999999}).status_code == 404
+
+
+def test_render_all_and_zip(db, make_school):
+    make_school("Print High", 4501, (5501,))
+    client = TestClient(app)
+    client.post("/admin/print/render_all", follow_redirects=False)
+    for _ in range(100):
+        job = client.get("/admin/print/job").json()
+        if job["status"] != "running":
+            break
+        time.sleep(0.1)
+    assert job["status"] == "finished" and job["done"] == job["total"] > 0
+
+    r = client.get("/admin/print/all.zip")
+    names = zipfile.ZipFile(io.BytesIO(r.content)).namelist()
+    assert "schools/print-high-4501.pdf" in names
+    assert len([n for n in names if n.startswith("areas/")]) == len(refdata(db).areas)
+    page = client.get("/admin/print")
+    assert page.status_code == 200 and "NBA: " in page.text and 'name="game_id"' not in page.text
+
+
+def test_pool_is_shut_down_and_recreated(monkeypatch):
+    monkeypatch.setattr(printing, "PRINT_WORKERS", 1)
+    pool = printing._executor()
+    assert pool is not None and printing._executor() is pool
+    printing.shutdown_pool()
+    assert printing._pool is None
+    again = printing._executor()
+    assert again is not pool
+    printing.shutdown_pool()
@@ -0,0 +1,93 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import select, func
+
+from app.main import app
+from app.db import Game, Match, MatchParticipant
+from app.refdata import refdata
+from app.qualifiers import qualifier_seeds, generate_brackets, knockout_matches
+from app.totals import check_totals
+
+
+def _setup(db, make_school):
+    make_school("Seed A", 4301, (5301, 5302))
+    make_school("Seed B", 4302, (5303, 5304, 5305))
+    return db.execute(select(Game).where(Game.GameName == "Rocket League")).scalar_one()
+
+
+def _log(client, ref, game, matches):
+    area = ref.areas_for(game.GameID, "Competition")[0].AreaID
+    rounds = {r.Label: r.RoundID for r in ref.rounds}
+    r = client.post("/logger/batch", json={"matches": [
+        {"key": f"q{i}", "GameID": game.GameID, "Stream": "Competition", "RoundID": rounds[rnd], "AreaID": area,
+         "Mode": "WIN_LOSE", "UID1": w, "UID2": l, "WinnerUID": w}
+        for i, (rnd, w, l) in enumerate(matches)
+    ]})
+    assert all(x["status"] == "created" for x in r.json()["results"])
+
+
+def test_seeds_use_school_tiebreak_and_cutoff(db, make_school):
+    game = _setup(db, make_school)
+    ref = refdata(db)
+    _log(TestClient(app), ref, game, [
+        ("Round 1", 5301, 5302),    # 5301: 50, 5302: 25
+        ("Round 2", 5303, 5304),    # 5303: 50, 5304: 25 -> school B ahead on the tiebreak
+        ("Round 3", 5305, 5304),    # 5305: 50, 5304: 50 (school B: 150, school A: 75)
+        ("Quarter 1", 5302, 5301),  # after the cutoff: ignored
+    ])
+    seeds = qualifier_seeds(db, [game.GameID])[game.GameID]
+    assert [s.uid for s in seeds] == [5303, 5304, 5305, 5301]
+    assert seeds[0].school_points == 150 and seeds[3].school_points == 75
+    assert seeds[0].tied and seeds[2].tied and not seeds[3].tied
+
+    # all games in one go
+    assert set(qualifier_seeds(db)) == set(ref.games)
+
+
+def test_generate_brackets_is_bulk_and_once(db, make_school):
+    game = _setup(db, make_school)
+    ref = refdata(db)
+    _log(TestClient(app), ref, game, [("Round 1", 5301, 5302), ("Round 2", 5303, 5304)])
+    seeds = qualifier_seeds(db, [game.GameID])
+    assert generate_brackets(db, seeds, size=4) == {game.GameID: 3}
+    assert generate_brackets(db, seeds, size=4) == {game.GameID: 0}
+
+    stages = dict(db.execute(select(Match.Stage, func.count()).group_by(Match.Stage)).all())
+    assert stages == {"Group": 2, "Semi": 2, "Final": 1}
+    semis = db.execute(
+        select(MatchParticipant.UID4).join(Match, Match.MatchID == MatchParticipant.MatchID)
+        .where(Match.Stage == "Semi").order_by(Match.MatchID, MatchParticipant.Slot)
+    ).scalars().all()
+    s = [x.uid for x in seeds[game.GameID]]
+    assert semis == [s[0], s[3], s[1], s[2]]
+
+
+def test_qualifier_pages(db):
+    client = TestClient(app)
+    assert client.get("/admin/qualifiers").status_code == 200
+    r = client.get("/admin/qualifiers/run", params={"game_id": "all"})
+    assert r.status_code == 200 and "Rocket League" in r.text
+    assert client.get("/admin/qualifiers/run", params={"game_id": "999999"}).status_code == 404
+
+
+def test_knockout_results_advance_winners(db, make_school):
+    game = _setup(db, make_school)
+    client = TestClient(app)
+    _log(client, refdata(db), game, [("Round 1", 5301, 5302), ("Round 2", 5303, 5304)])
+    generate_brackets(db, qualifier_seeds(db, [game.GameID]), size=4)
+    semi1, semi2, final = knockout_matches(db)
+    assert final["players"] == []
+
+    for k in (semi1, semi2):
+        r = client.post("/admin/qualifiers/result", data={"match_id": k["MatchID"], "winner_uid": k["players"][1]},
+                        follow_redirects=False)
+        assert r.headers["location"] == "/admin/qualifiers"
+    r = client.post("/admin/qualifiers/result", data={"match_id": semi1["MatchID"], "winner_uid": semi1["players"][0]},
+                    follow_redirects=False)
+    assert r.headers["location"].endswith("error=AlreadyRecorded")
+
+    final = knockout_matches(db)[2]
+    assert final["players"] == [semi1["players"][1], semi2["players"][1]]
+    client.post("/admin/qualifiers/result", data={"match_id": final["MatchID"], "winner_uid": final["players"][0]})
+    assert knockout_matches(db)[2]["winner"] == semi1["players"][1]
+    assert check_totals(db) == []
+    assert "Knockout results" in client.get("/admin/qualifiers").text
@@ -0,0 +1,27 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+
+from app.db import ReadSessionLocal, Game
+from app.db_async import read_db
+
+
+def test_read_engine_is_read_only(db):
+    rs = ReadSessionLocal()
+    try:
+        assert rs.execute(select(Game.GameName).where(Game.GameName == "FC25")).scalar_one() == "FC25"
+        with pytest.raises(OperationalError):
+            rs.execute(text("DELETE FROM Games"))
+    finally:
+        rs.close()
+
+
+def test_read_db_runs_sync_query_functions(db):
+    def names(s, prefix):
+        return [n for n in s.execute(select(Game.GameName).order_by(Game.GameName)).scalars() if n.startswith(prefix)]
+
+    assert asyncio.run(read_db(names, "Ro")) == ["Rocket League"]
+    with pytest.raises(OperationalError):
+        asyncio.run(read_db(lambda s: s.execute(text("DELETE FROM Games"))))
@@ -0,0 +1,40 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.main import app
+from app.db import Game
+from app.refdata import refdata
+
+
+def test_submit_does_no_reference_reads(db, make_school, count_queries):
+    make_school("Ref High", 4201, (5201, 5202))
+    game = db.execute(select(Game).where(Game.GameName == "Velocity Drone")).scalar_one()
+    ref = refdata(db)
+    area = ref.areas_for(game.GameID, "SchoolsCup")[0]
+    rnd = ref.rounds[0]
+
+    client = TestClient(app)
+    form = {"GameID": game.GameID, "Stream": "SchoolsCup", "RoundID": rnd.RoundID, "AreaID": area.AreaID,
+            "Mode": "WIN_LOSE", "UID1": 5201, "UID2": 5202, "WinnerUID": 5201, "FinalsMetricValue": 41.5}
+    client.post("/logger/submit", data=form, follow_redirects=False)  # warms the points cache
+
+    with count_queries() as seen:
+        r = client.post("/logger/submit", data=form, follow_redirects=False)
+    assert r.status_code == 303 and "ok=1" in r.headers["location"]
+    for table in ("Games", "Rounds", "Events", "Areas", "Settings", "Points"):
+        assert not any(f'FROM "{table}"' in s for s in seen), table
+
+
+def test_settings_save_invalidates(db):
+    before = refdata(db)
+    assert before.flag("DRONE_TIMELAP_BONUS")
+    client = TestClient(app)
+    client.post("/admin/settings", data={
+        "SponsorPath": "x", "PIN_Logger": "0000", "PIN_Admin": "9999", "DRONE_TIMELAP_BONUS": "No",
+    }, follow_redirects=False)
+    after = refdata(db)
+    assert after.version != before.version
+    assert not after.flag("DRONE_TIMELAP_BONUS")
+    client.post("/admin/settings", data={
+        "SponsorPath": "x", "PIN_Logger": "0000", "PIN_Admin": "9999", "DRONE_TIMELAP_BONUS": "Yes",
+    }, follow_redirects=False)
@@ -0,0 +1,51 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.main import app
+from app.db import Game, GamePoints, MatchParticipant
+from app.logger import MatchIn, record_batch
+from app.refdata import refdata
+from app.rescore import rescore, rescore_preview
+from app.totals import check_totals, top_students
+from app.utils import invalidate_points_cache
+
+
+def _setup(db, make_school):
+    make_school("Rescore High", 4901, (5901, 5902, 5903))
+    ref = refdata(db)
+    nba = db.execute(select(Game).where(Game.GameName == "NBA")).scalar_one()
+    fc = db.execute(select(Game).where(Game.GameName == "FC25")).scalar_one()
+    items = []
+    for i, (game, a, b, w) in enumerate([(nba, 5901, 5902, 5901), (nba, 5901, 5903, 5901), (fc, 5902, 5903, 5903)]):
+        items.append(MatchIn(
+            key=f"rs{i}", GameID=game.GameID, Stream="SchoolsCup", RoundID=ref.rounds[0].RoundID,
+            AreaID=ref.areas_for(game.GameID, "SchoolsCup")[0].AreaID,
+            Mode="WIN_LOSE", UID1=a, UID2=b, WinnerUID=w,
+        ))
+    record_batch(db, items)
+    return nba, fc
+
+
+def test_rescore_applies_new_override_and_previews_rank_changes(db, make_school):
+    nba, fc = _setup(db, make_school)
+    # 5901: 50+50, 5902: 25+25, 5903: 25+50
+    assert [r["uid"] for r in top_students(db)] == [5901, 5903, 5902]
+    assert rescore_preview(db)["rows"] == 0
+
+    # NBA losses now worth 80: 5903 130, 5902 105, 5901 100
+    db.add(GamePoints(GameID=nba.GameID, Code="Lose", Value=80)); db.commit()
+    invalidate_points_cache()
+    pv = rescore_preview(db, fc.GameID)
+    assert pv["rows"] == 0                              # scoped to a game without changes
+    pv = rescore_preview(db)
+    assert (pv["rows"], pv["students"], pv["points_delta"]) == (2, 2, 110)
+    assert [(m["uid"], m["before_rank"], m["after_rank"]) for m in pv["moves"]] == [(5903, 2, 1), (5902, 3, 2), (5901, 1, 3)]
+    # nothing written by the preview
+    assert sorted(db.execute(select(MatchParticipant.PointsAwarded)).scalars()) == [25, 25, 25, 50, 50, 50]
+
+    r = TestClient(app).post("/admin/points/recalculate", data={"game_id": str(nba.GameID)}, follow_redirects=False)
+    assert r.status_code == 303 and r.headers["location"].endswith("rescored=2")
+    assert sorted(db.execute(select(MatchParticipant.PointsAwarded)).scalars()) == [25, 50, 50, 50, 80, 80]
+    assert check_totals(db) == []
+    assert [r["uid"] for r in top_students(db)] == [5903, 5902, 5901]
+    assert rescore(db) == 0
@@ -0,0 +1,45 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.db import engine, School, Student
+from app.search import install_search_index, search_students
+
+
+def _roster(db):
+    a = School(SchoolName="Search Valley", SchoolUID4=4201)
+    b = School(SchoolName="Harbour College", SchoolUID4=4202)
+    db.add_all([a, b]); db.flush()
+    people = [("Mia", "Wong", a), ("Miles", "Davis", b), ("Ava", "Miller", a), ("Noah", "Smith", b)]
+    for i, (f, l, sch) in enumerate(people):
+        db.add(Student(UID4=3100 + i, FirstName=f, LastName=l, SchoolID=sch.SchoolID, Cohort="High"))
+    db.commit()
+
+
+def test_prefix_search_and_keyset_pages(db):
+    install_search_index(engine)
+    _roster(db)
+
+    rows, nxt = search_students(db, "mi")
+    assert [s.UID4 for s in rows] == [3100, 3101, 3102] and nxt is None
+    assert [s.UID4 for s in search_students(db, "harbour")[0]] == [3101, 3103]
+    assert [s.UID4 for s in search_students(db, "mi valley")[0]] == [3100, 3102]
+    assert [s.UID4 for s in search_students(db, "310")[0]] == [3100, 3101, 3102, 3103]
+
+    page1, nxt = search_students(db, None, limit=3)
+    assert [s.UID4 for s in page1] == [3100, 3101, 3102] and nxt == 3102
+    page2, nxt = search_students(db, None, after=3102, limit=3)
+    assert [s.UID4 for s in page2] == [3103] and nxt is None
+    assert page1[0].school.SchoolName == "Search Valley"
+
+
+def test_typeahead_and_lookup(db):
+    install_search_index(engine)
+    _roster(db)
+    client = TestClient(app)
+    assert client.get("/logger/typeahead", params={"q": "smi"}).json() == [
+        {"uid": 3103, "name": "Noah Smith", "school": "Harbour College"}
+    ]
+    assert client.get("/lookup/3100").json()["school"] == "Search Valley"
+    assert client.get("/lookup/3999").status_code == 404
+    r = client.get("/admin/students", params={"q": "wong"})
+    assert r.status_code == 200 and "Mia Wong" in r.text and "Noah Smith" not in r.text
@@ -0,0 +1,22 @@
+from sqlalchemy import select, func
+
+from app.db import Game, Event, Area, Round, Points, Setting
+from app.seed import seed_all, SEED_VERSION, SEED_VERSION_KEY, GAMES, ROUNDS, POINTS
+
+
+def test_seed_is_complete_and_skips_when_current(db, count_queries):
+    # the fixture has already seeded
+    assert db.get(Setting, SEED_VERSION_KEY).Value == SEED_VERSION
+    assert db.execute(select(func.count()).select_from(Game)).scalar() == len(GAMES)
+    assert db.execute(select(func.count()).select_from(Round)).scalar() == len(ROUNDS)
+    assert db.execute(select(func.count()).select_from(Points)).scalar() == len(POINTS)
+    assert db.execute(select(func.count()).select_from(Event)).scalar() == 2 * len(GAMES)
+    assert db.execute(select(func.count()).select_from(Area)).scalar() == 2 * len(GAMES)
+
+    with count_queries() as seen:
+        assert seed_all(db) is False
+    assert len(seen) <= 1
+
+    # forced re-run finds everything present and adds nothing
+    assert seed_all(db, force=True) is True
+    assert db.execute(select(func.count()).select_from(Area)).scalar() == 2 * len(GAMES)
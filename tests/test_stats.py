@@ -0,0 +1,34 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.main import app
+from app.db import Game
+from app.refdata import refdata
+from app.seed import GAMES, ROUNDS
+from app.stats import admin_stats
+
+
+def test_stats_one_query_cached_and_refreshed_on_results(db, make_school, count_queries):
+    refdata(db)  # round labels come from the reference cache
+    with count_queries() as seen:
+        first = admin_stats(db)
+        admin_stats(db)
+    assert len(seen) == 1
+    assert first["counts"]["games"] == len(GAMES) and first["counts"]["rounds"] == len(ROUNDS)
+    assert first["matches_today"] == 0
+
+    make_school("Stats High", 4701, (5701, 5702))
+    game = db.execute(select(Game).where(Game.GameName == "NBA")).scalar_one()
+    ref = refdata(db)
+    client = TestClient(app)
+    client.post("/logger/submit", data={
+        "GameID": game.GameID, "Stream": "SchoolsCup", "RoundID": ref.rounds[0].RoundID,
+        "AreaID": ref.areas_for(game.GameID, "SchoolsCup")[0].AreaID,
+        "Mode": "WIN_LOSE", "UID1": 5701, "UID2": 5702, "WinnerUID": 5701,
+    }, follow_redirects=False)
+
+    stats = client.get("/admin/stats").json()
+    assert stats["counts"]["matches"] == 1 and stats["matches_today"] == 1
+    assert stats["active_areas"] == 1 and stats["per_minute"] == 0.2
+    assert stats["per_round"] == [{"round": ref.rounds[0].Label, "matches": 1}]
+    assert client.get("/admin/").status_code == 200
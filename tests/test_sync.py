@@ -0,0 +1,190 @@
+import os
+import tempfile
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select, delete, update, func
+
+from app import sync
+from app.main import app
+from app.db import Base, Game, Area, School, Student, GamePoints, Match, MatchParticipant, Setting, SubmissionKey, SyncSent
+from app.logger import MatchIn, record_batch, record_match
+from app.refdata import refdata
+from app.seed import seed_all
+from app.sync import DatabaseCentral, SyncService, collect_push, DIGEST_KEY
+from app.totals import check_totals, top_students
+
+
+def _central(make_school):
+    url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="seqel-central-"), "central.db")
+    central = DatabaseCentral(url)
+    Base.metadata.create_all(central.engine)
+    with central.Session() as c:
+        seed_all(c)
+        make_school("Central High", 4801, (6101, 6102, 6103, 6104), session=c)
+        nba = c.execute(select(Game).where(Game.GameName == "NBA")).scalar_one()
+        c.add(GamePoints(GameID=nba.GameID, Code="Lose", Value=30))
+        c.commit()
+    return central
+
+
+def _cleanup(db, central):
+    db.execute(delete(Setting).where(Setting.Key == DIGEST_KEY))
+    db.commit()
+    central.engine.dispose()
+
+
+def _nba(db):
+    ref = refdata(db)
+    nba = db.execute(select(Game).where(Game.GameName == "NBA")).scalar_one()
+    return nba.GameID, ref.areas_for(nba.GameID, "SchoolsCup")[0].AreaID, ref.rounds[0].RoundID
+
+
+def test_venue_pulls_master_data_and_pushes_what_central_lacks(db, make_school):
+    central = _central(make_school)
+    service = SyncService(central, "venue-a", batch=2)
+    try:
+        st = service.run_once()
+        assert st["last_error"] is None and st["pushed"] == 0
+        assert st["pulled"]["Students"] == 4 and st["pulled"]["GamePoints"] == 1
+        assert set(db.execute(select(Student.UID4)).scalars()) == {6101, 6102, 6103, 6104}
+        assert service.pull(db) == {}                       # digest unchanged: nothing resent
+
+        # log on the venue: batch API (own keys) and the form path (no key)
+        game, area, rnd = _nba(db)
+        record_batch(db, [
+            MatchIn(key=f"v{i}", GameID=game, Stream="SchoolsCup", RoundID=rnd, AreaID=area,
+                    Mode="WIN_LOSE", UID1=a, UID2=b, WinnerUID=a)
+            for i, (a, b) in enumerate([(6101, 6102), (6101, 6103), (6104, 6102)])
+        ])
+        record_match(db, game, "SchoolsCup", rnd, area, "WIN_LOSE", 6103, 6104, 6103,
+                     None, None, None, None, None, None)
+        assert collect_push(db, "venue-a", 10)[0][:2] == b"\x1f\x8b"   # gzip
+
+        st = service.run_once()
+        assert (st["pushed"], st["batches"], st["pending"], st["last_error"]) == (4, 2, 0, None)
+        with central.Session() as c:
+            assert c.execute(select(func.count()).select_from(Match)).scalar_one() == 4
+            assert sorted(c.execute(select(MatchParticipant.PointsAwarded)).scalars()) == [30, 30, 30, 30, 50, 50, 50, 50]
+            assert check_totals(c) == []
+            assert top_students(c) == top_students(db)
+
+        # nothing new: nothing sent; lost bookkeeping only replays duplicates
+        assert service.run_once()["batches"] == 2
+        db.execute(delete(SyncSent)); db.commit()
+        st = service.run_once()
+        assert (st["pushed"], st["duplicates"]) == (4, 4)
+        with central.Session() as c:
+            assert c.execute(select(func.count()).select_from(Match)).scalar_one() == 4
+    finally:
+        _cleanup(db, central)
+
+
+def test_master_rows_match_on_natural_keys_and_central_points_win(db, make_school):
+    # a venue row created before the node joined: same StudentID as a central student, different UID4
+    make_school("Venue Only", 4802, (6200,))
+    central = _central(make_school)
+    service = SyncService(central, "venue-a")
+    try:
+        assert service.run_once()["last_error"] is None
+        assert db.execute(select(Student.LastName).where(Student.UID4 == 6200)).scalar_one() == "6200"
+        assert db.execute(select(func.count()).select_from(Student)).scalar_one() == 5
+
+        # the central box drops the override and renames a student: both arrive
+        with central.Session() as c:
+            c.execute(delete(GamePoints))
+            c.execute(update(Student).where(Student.UID4 == 6101).values(LastName="Renamed"))
+            c.commit()
+        assert service.run_once()["pulled"]["GamePoints"] == 1
+        assert db.execute(select(func.count()).select_from(GamePoints)).scalar_one() == 0
+        assert db.execute(select(Student.LastName).where(Student.UID4 == 6101)).scalar_one() == "Renamed"
+
+        # the central points table decides, even when the venue has not pulled yet
+        with central.Session() as c:
+            nba = c.execute(select(Game).where(Game.GameName == "NBA")).scalar_one()
+            c.add(GamePoints(GameID=nba.GameID, Code="Lose", Value=40)); c.commit()
+        game, area, rnd = _nba(db)
+        record_batch(db, [MatchIn(key="p1", GameID=game, Stream="SchoolsCup", RoundID=rnd, AreaID=area,
+                                  Mode="WIN_LOSE", UID1=6101, UID2=6102, WinnerUID=6101)])
+        assert sorted(db.execute(select(MatchParticipant.PointsAwarded)).scalars()) == [25, 50]
+        service.run_once(pull=False)
+        with central.Session() as c:
+            assert sorted(c.execute(select(MatchParticipant.PointsAwarded)).scalars()) == [40, 50]
+            assert check_totals(c) == []
+
+        # a student moved school centrally: the venue's school boards follow
+        with central.Session() as c:
+            east = make_school("Central East", 4803, session=c).SchoolID
+            c.execute(update(Student).where(Student.UID4 == 6101).values(SchoolID=east))
+            c.commit()
+        assert service.pull(db)["Students"] == 1
+        assert check_totals(db) == []
+        assert top_students(db, limit=1)[0]["school"] == "Central East"
+    finally:
+        _cleanup(db, central)
+
+
+def test_failed_pull_still_pushes_and_node_refuses_local_students(db, make_school, monkeypatch):
+    central = _central(make_school)
+    service = SyncService(central, "venue-a")
+    try:
+        service.run_once()
+        game, area, rnd = _nba(db)
+        record_batch(db, [MatchIn(key="f1", GameID=game, Stream="SchoolsCup", RoundID=rnd, AreaID=area,
+                                  Mode="WIN_LOSE", UID1=6101, UID2=6102, WinnerUID=6101)])
+
+        def broken(digest):
+            raise OSError("master snapshot unavailable")
+        monkeypatch.setattr(central, "master", broken)
+        st = service.run_once()
+        assert st["pushed"] == 1 and st["last_error"].startswith("pull:")
+
+        monkeypatch.setattr(sync, "SYNC_NODE_ID", "venue-a")
+        monkeypatch.setattr(sync, "SYNC_CENTRAL", "https://central.example")
+        r = TestClient(app).post("/admin/schools/add", data={"SchoolName": "Pop-up School"}, follow_redirects=False)
+        assert r.status_code == 409
+        assert db.execute(select(School).where(School.SchoolName == "Pop-up School")).first() is None
+    finally:
+        _cleanup(db, central)
+
+
+def test_refused_matches_do_not_block_and_cancellations_follow(db, make_school):
+    central = _central(make_school)
+    service = SyncService(central, "venue-a")
+    try:
+        service.run_once()
+        game, area, rnd = _nba(db)
+        base = dict(GameID=game, Stream="SchoolsCup", RoundID=rnd, AreaID=area, Mode="WIN_LOSE")
+        record_batch(db, [MatchIn(key="c1", UID1=6101, UID2=6102, WinnerUID=6101, **base)])
+        assert service.run_once(pull=False)["pushed"] == 1
+
+        # the central box renamed the court: that match is refused, the one behind it still goes up
+        with central.Session() as c:
+            c.execute(update(Area).where(Area.GameID == c.execute(select(Game.GameID).where(Game.GameName == "NBA")).scalar_one())
+                      .values(AreaName="Renamed Court"))
+            c.commit()
+        record_batch(db, [MatchIn(key="c2", UID1=6103, UID2=6104, WinnerUID=6103, **base)])
+        st = service.run_once(pull=False)
+        assert (st["pushed"], st["rejected"], st["pending"], st["last_error"]) == (1, 1, 0, None)
+        assert st["last_rejected"] == "c2: UnknownArea"
+        assert db.get(SyncSent, "c2").Error == "UnknownArea"
+
+        # a cancellation made on the venue after the push reaches the central totals, and so does undoing it
+        mid = db.execute(select(SubmissionKey.MatchID).where(SubmissionKey.Key == "c1")).scalar_one()
+        db.execute(update(Match).where(Match.MatchID == mid).values(Cancelled=True, CancelReason="Safety"))
+        db.commit()
+        assert service.run_once(pull=False)["updated"] == 1
+        with central.Session() as c:
+            m = c.execute(select(Match).join(SubmissionKey, SubmissionKey.MatchID == Match.MatchID)
+                          .where(SubmissionKey.Key == "c1")).scalar_one()
+            assert (m.Cancelled, m.CancelReason) == (True, "Safety")
+            assert c.execute(select(func.sum(MatchParticipant.PointsAwarded))).scalar_one() == 0
+            assert check_totals(c) == []
+        db.execute(update(Match).where(Match.MatchID == mid).values(Cancelled=False, CancelReason=None))
+        db.commit()
+        st = service.run_once(pull=False)
+        assert (st["updated"], st["pending"]) == (2, 0)
+        with central.Session() as c:
+            assert sorted(c.execute(select(MatchParticipant.PointsAwarded)).scalars()) == [30, 50]
+            assert check_totals(c) == []
+    finally:
+        _cleanup(db, central)
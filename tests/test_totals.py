@@ -0,0 +1,56 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.main import app
+from app.db import Game, Area, Round, StreamEnum
+from app.totals import check_totals, rebuild_totals, top_students
+
+
+def _setup(db, make_school):
+    make_school("Totals High", 4001, (5001, 5002, 5003, 5004))
+    game = db.execute(select(Game).where(Game.GameName == "Rocket League")).scalar_one()
+    area = db.execute(select(Area).where(Area.GameID == game.GameID, Area.Stream == StreamEnum.SchoolsCup)).scalar_one()
+    rnd = db.execute(select(Round).where(Round.Label == "Round 1")).scalar_one()
+    return game, area, rnd
+
+
+def test_submit_updates_totals_and_matches_raw(db, make_school):
+    game, area, rnd = _setup(db, make_school)
+    client = TestClient(app)
+    for winner, loser in ((5001, 5002), (5001, 5003), (5004, 5002)):
+        r = client.post("/logger/submit", data={
+            "GameID": game.GameID, "Stream": "SchoolsCup", "RoundID": rnd.RoundID, "AreaID": area.AreaID,
+            "Mode": "WIN_LOSE", "UID1": winner, "UID2": loser, "WinnerUID": winner,
+        }, follow_redirects=False)
+        assert r.status_code == 303
+
+    top = top_students(db, limit=3)
+    assert top[0] == {"uid": 5001, "school": "Totals High", "pts": 100}
+    assert check_totals(db) == []
+
+    rebuild_totals(db)
+    assert check_totals(db) == []
+    assert top_students(db, game_id=game.GameID, stream="SchoolsCup", limit=1)[0]["pts"] == 100
+
+
+def test_filtered_ranking_matches_totals(db, make_school):
+    from app.leaderboard import student_ranking
+    from app.totals import check_rankings
+
+    game, area, rnd = _setup(db, make_school)
+    client = TestClient(app)
+    for stream in ("SchoolsCup", "Competition"):
+        ar = db.execute(select(Area).where(Area.GameID == game.GameID, Area.Stream == StreamEnum(stream))).scalar_one()
+        client.post("/logger/submit", data={
+            "GameID": game.GameID, "Stream": stream, "RoundID": rnd.RoundID, "AreaID": ar.AreaID,
+            "Mode": "WIN_LOSE", "UID1": 5001, "UID2": 5002, "WinnerUID": 5001 if stream == "SchoolsCup" else 5002,
+        }, follow_redirects=False)
+
+    comp = student_ranking(db, game_id=game.GameID, stream=StreamEnum.Competition)
+    assert [r["uid"] for r in comp] == [5002, 5001]
+    assert student_ranking(db, game_id=game.GameID + 1) == []
+    assert check_rankings(db) == []
+
+    r = client.get("/boards/students", params={"game_id": game.GameID, "stream": "Competition"})
+    assert r.status_code == 200
+    assert r.text.index("UID 5002") < r.text.index("UID 5001")
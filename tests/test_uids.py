@@ -0,0 +1,33 @@
+import pytest
+
+from app.db import School, Student
+from app.uids import reserve_uid, reserve_uids, release_uids
+
+
+def test_batch_reservation_skips_taken_and_guest_window(db):
+    sch = School(SchoolName="UID School")
+    db.add(sch); db.flush()
+    assert 2000 <= sch.SchoolUID4 <= 9999
+    db.add(Student(UID4=2001, FirstName="X", LastName="Explicit", SchoolID=sch.SchoolID, Cohort="High"))
+    db.flush()
+
+    uids = reserve_uids(db, "Students", 5)
+    assert uids == [2000, 2002, 2003, 2004, 2005]
+    assert reserve_uid(db, "Students") == 2006
+    assert reserve_uid(db, "Students", window="guest") == 1000
+
+    release_uids(db, "Students", [2003, 1000])
+    assert reserve_uid(db, "Students") == 2003
+    assert reserve_uid(db, "Students", window="guest") == 1000
+    db.rollback()
+
+
+def test_listener_allocates_and_exhaustion_raises(db):
+    sch = School(SchoolName="UID School 2")
+    db.add(sch); db.flush()
+    st = Student(FirstName="Auto", LastName="Uid", SchoolID=sch.SchoolID, Cohort="Primary")
+    db.add(st); db.flush()
+    assert st.UID4 == 2000
+    with pytest.raises(RuntimeError):
+        reserve_uids(db, "Students", 8000)
+    db.rollback()
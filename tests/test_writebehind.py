@@ -0,0 +1,141 @@
+import json
+import threading
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select, func
+
+from app import logger
+from app.main import app
+from app.db import Game, Match, SubmissionKey
+from app.refdata import refdata
+from app.totals import top_students
+from app.writebehind import WriteBehindQueue
+
+
+def test_group_commit_and_journal_replay(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    batches: list[list[dict]] = []
+    gate = threading.Event()
+
+    def commit(entries):
+        gate.wait(5)
+        batches.append([e["key"] for e in entries])
+
+    # a journal left behind by a crash: two whole entries and a torn line
+    with open(path, "w") as f:
+        f.write(json.dumps({"key": "old1"}) + "\n" + json.dumps({"key": "old2"}) + "\n" + '{"key": "to')
+    q = WriteBehindQueue(path, commit, flush_ms=50, flush_max=3)
+    assert q.start() == 2
+    for i in range(4):
+        q.put({"key": f"k{i}"})
+    assert q.stats()["depth"] == 6
+    gate.set()
+    assert q.flush(5)
+    assert [k for b in batches for k in b] == ["old1", "old2", "k0", "k1", "k2", "k3"]
+    assert all(len(b) <= 3 for b in batches)
+    st = q.stats()
+    assert (st["depth"], st["committed"], st["batches"]) == (0, 6, len(batches))
+    q.stop()
+    assert open(path).read() == ""          # everything committed: journal emptied
+
+    # torn line, then two acknowledged entries and another crash: the torn tail was cut, both replay
+    with open(path, "w") as f:
+        f.write(json.dumps({"key": "old3"}) + "\n" + '{"key": "to')
+    stuck = WriteBehindQueue(path, lambda entries: 1 / 0, flush_ms=10)
+    assert stuck.start() == 1
+    stuck.put({"key": "acked1"})
+    stuck.put({"key": "acked2"})
+    stuck.stop(timeout=2)
+    seen = len(batches)
+    again = WriteBehindQueue(path, commit, flush_ms=10)
+    assert again.start() == 3
+    assert again.flush(5)
+    assert [k for b in batches[seen:] for k in b] == ["old3", "acked1", "acked2"]
+    again.stop()
+
+
+def test_failed_commit_is_retried_and_survives_restart(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    q = WriteBehindQueue(path, lambda entries: 1 / 0, flush_ms=10)
+    q.start()
+    q.put({"key": "a"})
+    assert not q.flush(0.3)
+    q.stop(timeout=2)
+    assert q.stats()["errors"] >= 1
+    seen = []
+    q2 = WriteBehindQueue(path, seen.extend, flush_ms=10)
+    assert q2.start() == 1
+    assert q2.flush(5) and seen == [{"key": "a"}]
+    q2.stop()
+
+
+def test_bad_entry_is_dead_lettered_without_blocking_the_queue(tmp_path):
+    from sqlalchemy.exc import IntegrityError
+    path = str(tmp_path / "journal.jsonl")
+    seen = []
+
+    def commit(entries):
+        if any(e["key"] == "bad" for e in entries):
+            raise IntegrityError("INSERT", {}, Exception("NOT NULL constraint failed"))
+        seen.extend(e["key"] for e in entries if e["key"] != "gone")
+        return [(e, "UnknownArea") for e in entries if e["key"] == "gone"]   # rejected without failing
+
+    q = WriteBehindQueue(path, commit, flush_ms=50, dead_letter=str(tmp_path / "dead.jsonl"), permanent=(IntegrityError,))
+    q.start()
+    for key in ("a", "bad", "b", "gone"):
+        q.put({"key": key})
+    assert q.flush(5)
+    st = q.stats()
+    assert (seen, st["committed"], st["dead"], st["depth"]) == (["a", "b"], 2, 2, 0)
+    dead = [json.loads(line) for line in open(tmp_path / "dead.jsonl")]
+    assert [d["entry"] for d in dead] == [{"key": "bad"}, {"key": "gone"}]
+    assert "NOT NULL" in dead[0]["error"] and dead[1]["error"] == "UnknownArea"
+    q.stop()
+    assert open(path).read() == ""
+
+
+def test_submit_acknowledged_then_group_committed(db, make_school, tmp_path, monkeypatch):
+    make_school("Queue High", 4951, (5951, 5952))
+    game = db.execute(select(Game).where(Game.GameName == "NBA")).scalar_one()
+    ref = refdata(db)
+    q = WriteBehindQueue(str(tmp_path / "journal.jsonl"), logger._commit_queued, flush_ms=20,
+                         dead_letter=str(tmp_path / "dead.jsonl"))
+    monkeypatch.setattr(logger, "WRITE_BEHIND", True)
+    monkeypatch.setattr(logger, "write_behind", q)
+    q.start()
+    try:
+        client = TestClient(app)
+        form = {"GameID": game.GameID, "Stream": "SchoolsCup", "RoundID": ref.rounds[0].RoundID,
+                "AreaID": ref.areas_for(game.GameID, "SchoolsCup")[0].AreaID,
+                "Mode": "WIN_LOSE", "UID1": 5951, "UID2": 5952, "WinnerUID": 5951}
+        for _ in range(3):
+            r = client.post("/logger/submit", data=form, follow_redirects=False)
+            assert "ok=1" in r.headers["location"]
+        r = client.post("/logger/submit", data={**form, "WinnerUID": 1234}, follow_redirects=False)
+        assert "error=WinnerMismatch" in r.headers["location"]   # rejected before it is acknowledged
+        one_player = {k: v for k, v in form.items() if k != "UID2"}
+        r = client.post("/logger/submit", data=one_player, follow_redirects=False)
+        assert "error=MissingPlayer" in r.headers["location"]
+
+        # the logger page posts to /logger/batch: journaled and answered "queued"
+        item = dict(form)
+        r = client.post("/logger/batch", json={"matches": [
+            {**item, "key": "b1"}, {**item, "key": "b1"}, {**item, "key": "b2", "WinnerUID": 1234},
+        ]})
+        assert [(x["status"], x.get("error")) for x in r.json()["results"]] == [
+            ("queued", None), ("queued", None), ("error", "WinnerMismatch"),
+        ]
+        assert q.flush(5)
+        r = client.post("/logger/batch", json={"matches": [{**item, "key": "b1"}]})
+        assert r.json()["results"][0]["status"] == "duplicate"
+
+        # acknowledged, then rejected at commit time (the area went away): dead-lettered, not dropped
+        q.put({**item, "key": "gone", "AreaID": 999999})
+        assert q.flush(5)
+    finally:
+        q.stop()
+    assert db.execute(select(func.count()).select_from(Match)).scalar() == 4
+    assert db.execute(select(func.count()).select_from(SubmissionKey)).scalar() == 4
+    assert top_students(db)[0] == {"uid": 5951, "school": "Queue High", "pts": 200}
+    assert q.stats()["dead"] == 1
+    assert json.loads(open(tmp_path / "dead.jsonl").read())["entry"]["key"] == "gone"